@@ -83,3 +83,62 @@ export const getDiseaseSolution = async (req, res) => {
         });
     }
 };
+
+
+/**
+ * Stream the disease solution as server-sent events
+ * The Python response is piped through chunk by chunk without buffering
+ */
+export const streamDiseaseSolution = async (req, res) => {
+    try {
+        const { disease_name, api_key } = req.body;
+
+        if (!disease_name) {
+            return res.status(400).json({
+                success: false,
+                error: 'disease_name is required'
+            });
+        }
+
+        const response = await axios.post(
+            `${PYTHON_SERVER_URL}/get_disease_solution?stream=1`,
+            {
+                disease_name,
+                api_key
+            },
+            {
+                responseType: 'stream',
+                headers: {
+                    Accept: 'text/event-stream',
+                    ...(api_key ? { 'X-Gemini-API-Key': api_key } : {})
+                }
+            }
+        );
+
+        res.status(response.status);
+        res.set({
+            'Content-Type': response.headers['content-type'] || 'text/event-stream',
+            'Cache-Control': 'no-cache',
+            'Connection': 'keep-alive',
+            'X-Accel-Buffering': 'no'
+        });
+        res.flushHeaders();
+
+        // Stop reading from Python when the browser goes away
+        res.on('close', () => response.data.destroy());
+        response.data.pipe(res);
+    } catch (error) {
+        console.error('Disease solution stream error:', error);
+
+        if (error.response) {
+            res.status(error.response.status);
+            res.set('Content-Type', error.response.headers['content-type'] || 'application/json');
+            return error.response.data.pipe(res);
+        }
+
+        res.status(500).json({
+            success: false,
+            error: 'Failed to get disease solution. Please ensure the Python server is running.'
+        });
+    }
+};
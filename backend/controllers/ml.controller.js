@@ -41,6 +41,42 @@ export const predictCrop = async (req, res) => {
     }
 };
 
+/**
+ * Proxy batch crop prediction request to Python ML server
+ * Accepts an array of samples (or { samples: [...] }) and returns per-row results in order
+ */
+export const predictCropBatch = async (req, res) => {
+    try {
+        const samples = Array.isArray(req.body) ? req.body : req.body?.samples;
+
+        if (!Array.isArray(samples) || samples.length === 0) {
+            return res.status(400).json({
+                success: false,
+                error: 'Request body must be a non-empty array of samples'
+            });
+        }
+
+        // Forward the whole batch in a single request to Python server
+        const response = await axios.post(
+            `${PYTHON_SERVER_URL}/predict_crop/batch`,
+            samples
+        );
+
+        res.json(response.data);
+    } catch (error) {
+        console.error('Batch crop prediction error:', error);
+
+        if (error.response) {
+            return res.status(error.response.status).json(error.response.data);
+        }
+
+        res.status(500).json({
+            success: false,
+            error: 'Failed to predict crops. Please ensure the Python server is running.'
+        });
+    }
+};
+
 /**
  * Proxy fertilizer prediction request to Python ML server
  */
@@ -115,3 +151,40 @@ export const predictPrice = async (req, res) => {
         });
     }
 };
+
+/**
+ * Proxy price forecast series request to Python ML server
+ * Returns a whole commodity-by-month forecast in one call
+ */
+export const predictPriceSeries = async (req, res) => {
+    try {
+        const { commodities, start_date, end_date } = req.body;
+
+        // Validate required fields
+        if (!commodities || !start_date || !end_date) {
+            return res.status(400).json({
+                success: false,
+                error: 'Missing required fields: commodities, start_date and end_date'
+            });
+        }
+
+        // Forward request to Python server
+        const response = await axios.post(
+            `${PYTHON_SERVER_URL}/predict_price/series`,
+            { commodities, start_date, end_date }
+        );
+
+        res.json(response.data);
+    } catch (error) {
+        console.error('Price series prediction error:', error);
+
+        if (error.response) {
+            return res.status(error.response.status).json(error.response.data);
+        }
+
+        res.status(500).json({
+            success: false,
+            error: 'Failed to predict price series. Please ensure the Python server is running.'
+        });
+    }
+};
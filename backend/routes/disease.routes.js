@@ -1,6 +1,6 @@
 import express from 'express';
 import multer from 'multer';
-import { predictDisease, getDiseaseSolution } from '../controllers/disease.controller.js';
+import { predictDisease, getDiseaseSolution, streamDiseaseSolution } from '../controllers/disease.controller.js';
 
 const router = express.Router();
 
@@ -26,4 +26,7 @@ router.post('/predict', upload.single('image'), predictDisease);
 // POST /api/disease/solution - Get AI-generated solution for disease
 router.post('/solution', getDiseaseSolution);
 
+// POST /api/disease/solution/stream - Stream the solution as server-sent events
+router.post('/solution/stream', streamDiseaseSolution);
+
 export default router;
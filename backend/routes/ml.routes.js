@@ -1,15 +1,21 @@
 import express from 'express';
-import { predictCrop, predictFertilizer, predictPrice } from '../controllers/ml.controller.js';
+import { predictCrop, predictCropBatch, predictFertilizer, predictPrice, predictPriceSeries } from '../controllers/ml.controller.js';
 
 const router = express.Router();
 
 // POST /api/v1/ml/predict-crop - Predict crop recommendation
 router.post('/predict-crop', predictCrop);
 
+// POST /api/v1/ml/predict-crop/batch - Predict crop recommendations for many samples
+router.post('/predict-crop/batch', predictCropBatch);
+
 // POST /api/v1/ml/predict-fertilizer - Predict fertilizer recommendation
 router.post('/predict-fertilizer', predictFertilizer);
 
 // POST /api/v1/ml/predict-price - Predict commodity price
 router.post('/predict-price', predictPrice);
 
+// POST /api/v1/ml/predict-price/series - Predict monthly prices for several commodities
+router.post('/predict-price/series', predictPriceSeries);
+
 export default router;
@@ -22,7 +22,7 @@ app.use(cors({
     origin: true, // Allow any origin for development purposes
     credentials: true,
 }));
-app.use(express.json());
+app.use(express.json({ limit: "10mb" })); // Batch ML requests carry thousands of rows
 app.use(cookieParser());
 
 configurePassport();
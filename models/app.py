@@ -1,17 +1,209 @@
-from flask import Flask, request, jsonify
+import json
+import os
+import threading
+import time
+from flask import Flask, Response, g, has_request_context, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+import metrics
+import profiling
+import structured_logging
 from services import (
-    predict_crop, validate_input_data, 
+    predict_crop, predict_crop_batch, validate_input_data, 
     predict_fertilizer, validate_fertilizer_input_data,
-    predict_disease, get_disease_solution,
-    predict_price
+    predict_disease, get_disease_solution, stream_disease_solution,
+    get_disease_batching_metrics, get_disease_pool_metrics, DiseaseQueueFullError,
+    predict_price, predict_price_series, validate_price_series_input,
+    warm_up_models, MODEL_WARM_UP_TASKS, model_registry, get_response_cache_stats, MissingApiKeyError
 )
 from dotenv import load_dotenv
 load_dotenv()
 
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """jsonify() that records its encoding time as the serialize stage"""
+
+    def response(self, *args, **kwargs):
+        with metrics.stage(endpoint_label(), 'serialize'):
+            return super().response(*args, **kwargs)
+
+
+def endpoint_label():
+    """Route pattern of the current request; unmatched paths share one label"""
+    if not has_request_context() or request.url_rule is None:
+        return 'unmatched'
+    return request.url_rule.rule
+
+
 app = Flask(__name__)
+app.json = TimedJSONProvider(app)
 CORS(app)
 
+# Upper bound on rows accepted by a single batch request
+MAX_BATCH_ROWS = int(os.getenv('MAX_BATCH_ROWS', '100000'))
+
+# Load and warm up every model in the background at startup instead of on first request
+PRELOAD_MODELS = os.getenv('PRELOAD_MODELS', '').lower() in ('1', 'true', 'yes')
+
+# Warmed models that must be ready for /ready to pass; empty means all of them
+READY_REQUIRED_MODELS = [name.strip() for name in os.getenv('READY_REQUIRED_MODELS', '').split(',') if name.strip()]
+_unknown_required_models = sorted(set(READY_REQUIRED_MODELS) - set(MODEL_WARM_UP_TASKS))
+if _unknown_required_models:
+    raise ValueError(
+        f"READY_REQUIRED_MODELS names unknown models: {', '.join(_unknown_required_models)} "
+        f"(known: {', '.join(MODEL_WARM_UP_TASKS)})"
+    )
+
+_warm_up_state = {
+    'done': not PRELOAD_MODELS,
+    'models': {}
+}
+
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+
+def read_batch_samples():
+    """
+    Read batch samples from the request body
+    Accepts a JSON array, a JSON object with a "samples" array, or an
+    NDJSON stream with one sample per line
+
+    Returns:
+        tuple: (samples, parse_errors, error_message)
+        parse_errors maps a sample position to the reason its line was rejected
+    """
+    samples = []
+    parse_errors = {}
+
+    if request.mimetype in NDJSON_MIMETYPES:
+        for line_number, line in enumerate(request.stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            if len(samples) >= MAX_BATCH_ROWS:
+                return None, None, f'Batch exceeds the limit of {MAX_BATCH_ROWS} rows'
+            try:
+                samples.append(json.loads(line))
+            except ValueError:
+                parse_errors[len(samples)] = f'Invalid JSON on line {line_number}'
+                samples.append(None)
+        return samples, parse_errors, None
+
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('samples')
+    if not isinstance(data, list):
+        return None, None, 'Request body must be a JSON array of samples or an NDJSON stream'
+    if len(data) > MAX_BATCH_ROWS:
+        return None, None, f'Batch exceeds the limit of {MAX_BATCH_ROWS} rows'
+
+    return data, parse_errors, None
+
+
+def wants_event_stream(data):
+    """
+    Whether the caller asked for a streamed (server-sent events) response
+    via ?stream=1, "stream": true in the body or an Accept: text/event-stream header
+    """
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return True
+    if data.get('stream') is True:
+        return True
+    return request.accept_mimetypes.best == 'text/event-stream'
+
+
+def sse_event(data, event=None):
+    """Format one server-sent event with a JSON payload"""
+    prefix = f'event: {event}\n' if event else ''
+    return f'{prefix}data: {json.dumps(data)}\n\n'
+
+
+def solution_events(disease, chunks):
+    """Server-sent events for a streamed solution: start, text chunks, then done or error"""
+    yield sse_event({'disease': disease}, event='start')
+    try:
+        for chunk in chunks:
+            yield sse_event({'text': chunk})
+    except MissingApiKeyError as e:
+        yield sse_event({'success': False, 'error': str(e)}, event='error')
+        return
+    except Exception as e:
+        yield sse_event({'success': False, 'error': f'Error generating solution: {str(e)}'}, event='error')
+        return
+    yield sse_event({'success': True, 'disease': disease}, event='done')
+
+
+def readiness():
+    """
+    Readiness for load balancers: warm-up has finished and every required
+    model warmed up, so the worker can serve all of them
+
+    Returns:
+        tuple: (response body, HTTP status code)
+    """
+    models = _warm_up_state['models']
+    if not _warm_up_state['done']:
+        return {'status': 'warming_up', 'models': models}, 503
+
+    # A required model without a warm-up result was never warmed, so it is not ready either
+    required = READY_REQUIRED_MODELS or list(models)
+    failed = [name for name in required if not models.get(name, {}).get('ready')]
+    if failed:
+        return {
+            'status': 'unavailable',
+            'error': f"Models not warmed up: {', '.join(failed)}",
+            'models': models
+        }, 503
+
+    return {'status': 'ready', 'models': models}, 200
+
+
+def start_model_warm_up():
+    """Warm up all models on a background thread and flip readiness when done"""
+    def run():
+        _warm_up_state['models'] = warm_up_models()
+        _warm_up_state['done'] = True
+
+    _warm_up_state['done'] = False
+    threading.Thread(target=run, name='model-warm-up', daemon=True).start()
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    # Every log record written while serving the request carries its ID
+    g.request_id, g.log_context = structured_logging.begin_request(
+        request.headers.get(structured_logging.REQUEST_ID_HEADER)
+    )
+
+
+@app.after_request
+def record_request_metrics(response):
+    start = g.get('request_start')
+    if start is not None:
+        metrics.observe_request(endpoint_label(), request.method, response.status_code, time.perf_counter() - start)
+    if 'request_id' in g:
+        response.headers[structured_logging.REQUEST_ID_HEADER] = g.request_id
+    return response
+
+
+@app.teardown_request
+def end_request_log_context(exc):
+    log_context = g.pop('log_context', None)
+    if log_context is not None:
+        structured_logging.end_request(log_context)
+
+
+# Per-request profiles for callers sending the PROFILE_TOKEN admin header;
+# no hooks are registered when the token is unset
+profiling.install(app, endpoint_label)
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    # Prometheus text format: stage histograms plus cache, model and queue counters
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
 
 @app.route('/', methods=['GET'])
 def health_check():
@@ -21,12 +213,34 @@ def health_check():
     })
 
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    body, status = readiness()
+    return jsonify(body), status
+
+
+@app.route('/models', methods=['GET'])
+def models_info():
+    return jsonify({
+        'success': True,
+        'models': model_registry.info()
+    })
+
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify({
+        'success': True,
+        'caches': get_response_cache_stats()
+    })
+
+
 @app.route('/predict_crop', methods=['POST'])
 def predict_crop_endpoint():
     try:
-        data = request.get_json()
-        
-        is_valid, error_message = validate_input_data(data)
+        with metrics.stage('/predict_crop', 'parse'):
+            data = request.get_json()
+            is_valid, error_message = validate_input_data(data)
         if not is_valid:
             return jsonify({
                 'success': False,
@@ -60,12 +274,49 @@ def predict_crop_endpoint():
         }), 500
 
 
+@app.route('/predict_crop/batch', methods=['POST'])
+def predict_crop_batch_endpoint():
+    try:
+        with metrics.stage('/predict_crop/batch', 'parse'):
+            samples, parse_errors, error_message = read_batch_samples()
+        if error_message:
+            return jsonify({
+                'success': False,
+                'error': error_message
+            }), 400
+
+        results = predict_crop_batch(samples)
+        for index, parse_error in parse_errors.items():
+            results[index] = {
+                'success': False,
+                'error': parse_error
+            }
+
+        return jsonify({
+            'success': True,
+            'count': len(results),
+            'failed': sum(1 for result in results if not result['success']),
+            'results': results
+        })
+
+    except FileNotFoundError:
+        return jsonify({
+            'success': False,
+            'error': 'Model file not found. Please train and save the model first.'
+        }), 500
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
 @app.route('/predict_fertilizer', methods=['POST'])
 def predict_fertilizer_endpoint():
     try:
-        data = request.get_json()
-        
-        is_valid, error_message, converted_data = validate_fertilizer_input_data(data)
+        with metrics.stage('/predict_fertilizer', 'parse'):
+            data = request.get_json()
+            is_valid, error_message, converted_data = validate_fertilizer_input_data(data)
         if not is_valid:
             return jsonify({
                 'success': False,
@@ -105,13 +356,15 @@ def predict_fertilizer_endpoint():
 def predict_disease_endpoint():
     try:
         # Check if image file is present
-        if 'image' not in request.files:
+        with metrics.stage('/predict_disease', 'parse'):
+            files = request.files
+        if 'image' not in files:
             return jsonify({
                 'success': False,
                 'error': 'No image file provided'
             }), 400
         
-        image_file = request.files['image']
+        image_file = files['image']
         
         if image_file.filename == '':
             return jsonify({
@@ -130,6 +383,14 @@ def predict_disease_endpoint():
             **result
         })
     
+    except DiseaseQueueFullError as e:
+        # Shed load instead of queueing without bound; clients retry later
+        response = jsonify({
+            'success': False,
+            'error': str(e)
+        })
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 503
     except FileNotFoundError:
         return jsonify({
             'success': False,
@@ -142,10 +403,20 @@ def predict_disease_endpoint():
         }), 500
 
 
+@app.route('/predict_disease/metrics', methods=['GET'])
+def predict_disease_metrics_endpoint():
+    return jsonify({
+        'success': True,
+        'batching': get_disease_batching_metrics(),
+        'pool': get_disease_pool_metrics()
+    })
+
+
 @app.route('/get_disease_solution', methods=['POST'])
 def get_disease_solution_endpoint():
     try:
-        data = request.get_json()
+        with metrics.stage('/get_disease_solution', 'parse'):
+            data = request.get_json()
         
         if 'disease_name' not in data:
             return jsonify({
@@ -155,6 +426,9 @@ def get_disease_solution_endpoint():
         
         # Extract API key from request body or headers
         api_key = data.get('api_key') or request.headers.get('X-Gemini-API-Key')
+
+        if wants_event_stream(data):
+            return stream_disease_solution_response(data['disease_name'], api_key)
         
         result = get_disease_solution(
             disease_name=data['disease_name'],
@@ -170,11 +444,30 @@ def get_disease_solution_endpoint():
         }), 500
 
 
+def stream_disease_solution_response(disease_name, api_key):
+    """
+    Stream a disease solution as server-sent events
+    Events: "start" with the disease name, unnamed events with {"text": chunk}
+    as the answer is generated, then "done" or "error"
+    """
+    disease, chunks = stream_disease_solution(disease_name, api_key)
+
+    return Response(
+        stream_with_context(solution_events(disease, chunks)),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            # Stop nginx and similar proxies from buffering the stream
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
 
 @app.route('/predict_price', methods=['POST'])
 def predict_price_endpoint():
     try:
-        data = request.get_json()
+        with metrics.stage('/predict_price', 'parse'):
+            data = request.get_json()
         if 'commodity' not in data or 'date' not in data:
             return jsonify({
                 'success': False,
@@ -197,6 +490,42 @@ def predict_price_endpoint():
         }), 500
 
 
+@app.route('/predict_price/series', methods=['POST'])
+def predict_price_series_endpoint():
+    try:
+        with metrics.stage('/predict_price/series', 'parse'):
+            data = request.get_json(silent=True)
+            is_valid, error_message, converted_data = validate_price_series_input(data)
+        if not is_valid:
+            return jsonify({
+                'success': False,
+                'error': error_message
+            }), 400
+
+        result = predict_price_series(
+            commodities=converted_data['commodities'],
+            start_year=converted_data['start_year'],
+            start_month=converted_data['start_month'],
+            months=converted_data['months']
+        )
+        return jsonify({
+            'success': True,
+            **result
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+# Disease inference pool processes re-import the main module as __mp_main__;
+# they load only the disease model themselves
+if PRELOAD_MODELS and __name__ != '__mp_main__':
+    start_model_warm_up()
+
+
 if __name__ == '__main__':
 
     app.run(debug=True, port=5000)
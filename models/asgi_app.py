@@ -0,0 +1,549 @@
+"""
+ASGI variant of the prediction API, with the same routes and JSON contracts as app.py
+Request bodies and uploads are read without blocking the event loop,
+CPU-bound model calls run on a bounded thread pool and Gemini calls are
+awaited, so one process can hold thousands of slow mobile connections open
+without a thread per connection:
+
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+
+verify_asgi_compat.py sends the same requests to both apps and compares the answers.
+"""
+import asyncio
+import contextvars
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+
+from starlette.applications import Starlette
+from starlette.datastructures import Headers, MutableHeaders, UploadFile
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.exceptions import BadRequest, UnsupportedMediaType
+from werkzeug.http import parse_accept_header
+
+import metrics
+import structured_logging
+# app.py owns the shared settings, the warm-up state and the JSON encoding
+from app import (
+    MAX_BATCH_ROWS, NDJSON_MIMETYPES, app as flask_app, readiness, solution_events
+)
+from services import (
+    predict_crop, predict_crop_batch, validate_input_data,
+    predict_fertilizer, validate_fertilizer_input_data,
+    predict_disease, get_disease_solution_async, stream_disease_solution,
+    get_disease_batching_metrics, get_disease_pool_metrics, DiseaseQueueFullError,
+    predict_price, predict_price_series, validate_price_series_input,
+    model_registry, get_response_cache_stats, shutdown_disease_inference
+)
+
+# Threads running model calls; requests waiting on I/O hold none
+ASGI_MODEL_THREADS = int(os.getenv('ASGI_MODEL_THREADS', str(os.cpu_count() or 1)))
+
+# Bodies larger than this are JSON-decoded on the model pool instead of the event loop
+ASGI_INLINE_JSON_BYTES = int(os.getenv('ASGI_INLINE_JSON_BYTES', '65536'))
+
+_model_executor = ThreadPoolExecutor(max_workers=max(1, ASGI_MODEL_THREADS), thread_name_prefix='asgi-model')
+
+
+# Route of the request being served, for the serialize stage
+_current_endpoint = contextvars.ContextVar('endpoint', default='unmatched')
+
+
+async def run_model(function, *args, **kwargs):
+    """Run a CPU-bound call on the model thread pool"""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_model_executor, context.run, partial(function, *args, **kwargs))
+
+
+def encode_json(payload):
+    """Encode a payload byte-for-byte like Flask's jsonify"""
+    with metrics.stage(_current_endpoint.get(), 'serialize'):
+        return f"{flask_app.json.dumps(payload, separators=(',', ':'))}\n"
+
+
+def jsonify(payload, status_code=200, headers=None):
+    """JSON response encoded exactly like Flask's jsonify"""
+    return Response(
+        encode_json(payload),
+        status_code=status_code,
+        headers=headers,
+        media_type='application/json'
+    )
+
+
+def _is_json(request):
+    mimetype = request.headers.get('content-type', '').split(';')[0].strip().lower()
+    return mimetype == 'application/json' or (mimetype.startswith('application/') and mimetype.endswith('+json'))
+
+
+async def get_json(request, silent=False):
+    """
+    Read and decode a JSON body the way Flask's request.get_json() does,
+    raising the same werkzeug errors
+    """
+    if not _is_json(request):
+        if silent:
+            return None
+        raise UnsupportedMediaType(
+            "Did not attempt to load JSON data because the request Content-Type was not 'application/json'."
+        )
+
+    body = await request.body()
+    try:
+        if len(body) > ASGI_INLINE_JSON_BYTES:
+            return await run_model(json.loads, body)
+        return json.loads(body)
+    except ValueError:
+        if silent:
+            return None
+        raise BadRequest()
+
+
+def _decode_ndjson(lines):
+    samples = []
+    parse_errors = {}
+    for line_number, line in lines:
+        try:
+            samples.append(json.loads(line))
+        except ValueError:
+            parse_errors[len(samples)] = f'Invalid JSON on line {line_number}'
+            samples.append(None)
+    return samples, parse_errors
+
+
+async def read_batch_samples(request):
+    """
+    Read batch samples like app.read_batch_samples: a JSON array, a JSON
+    object with a "samples" array, or an NDJSON stream with one sample per line
+
+    Returns:
+        tuple: (samples, parse_errors, error_message)
+    """
+    mimetype = request.headers.get('content-type', '').split(';')[0].strip().lower()
+
+    if mimetype in NDJSON_MIMETYPES:
+        # Split lines as the body arrives so oversized batches are refused early
+        lines = []
+        line_number = 0
+        pending = b''
+        async for chunk in request.stream():
+            pending += chunk
+            *complete, pending = pending.split(b'\n')
+            for line in complete:
+                line_number += 1
+                line = line.strip()
+                if line:
+                    if len(lines) >= MAX_BATCH_ROWS:
+                        return None, None, f'Batch exceeds the limit of {MAX_BATCH_ROWS} rows'
+                    lines.append((line_number, line))
+        if pending.strip():
+            if len(lines) >= MAX_BATCH_ROWS:
+                return None, None, f'Batch exceeds the limit of {MAX_BATCH_ROWS} rows'
+            lines.append((line_number + 1, pending.strip()))
+
+        samples, parse_errors = await run_model(_decode_ndjson, lines)
+        return samples, parse_errors, None
+
+    data = await get_json(request, silent=True)
+    if isinstance(data, dict):
+        data = data.get('samples')
+    if not isinstance(data, list):
+        return None, None, 'Request body must be a JSON array of samples or an NDJSON stream'
+    if len(data) > MAX_BATCH_ROWS:
+        return None, None, f'Batch exceeds the limit of {MAX_BATCH_ROWS} rows'
+
+    return data, {}, None
+
+
+def wants_event_stream(request, data):
+    """Same negotiation as app.wants_event_stream"""
+    if request.query_params.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return True
+    if data.get('stream') is True:
+        return True
+    return parse_accept_header(request.headers.get('accept'), MIMEAccept).best == 'text/event-stream'
+
+
+async def metrics_endpoint(request):
+    # Prometheus text format: stage histograms plus cache, model and queue counters
+    return Response(metrics.registry.render(), headers={'Content-Type': metrics.CONTENT_TYPE})
+
+
+async def health_check(request):
+    return jsonify({
+        'status': 'running',
+        'message': 'ML Prediction API is running'
+    })
+
+
+async def readiness_check(request):
+    body, status = readiness()
+    return jsonify(body, status)
+
+
+async def models_info(request):
+    return jsonify({
+        'success': True,
+        'models': model_registry.info()
+    })
+
+
+async def cache_stats(request):
+    return jsonify({
+        'success': True,
+        'caches': get_response_cache_stats()
+    })
+
+
+async def predict_crop_endpoint(request):
+    try:
+        with metrics.stage('/predict_crop', 'parse'):
+            data = await get_json(request)
+            is_valid, error_message = validate_input_data(data)
+        if not is_valid:
+            return jsonify({
+                'success': False,
+                'error': error_message
+            }, 400)
+
+        result = await run_model(
+            predict_crop,
+            n=data['n'],
+            p=data['p'],
+            k=data['k'],
+            temp=data['temp'],
+            humidity=data['humidity'],
+            ph=data['ph'],
+            rainfall=data['rainfall']
+        )
+
+        return jsonify({
+            'success': True,
+            **result
+        })
+
+    except FileNotFoundError:
+        return jsonify({
+            'success': False,
+            'error': 'Model file not found. Please train and save the model first.'
+        }, 500)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }, 500)
+
+
+async def predict_crop_batch_endpoint(request):
+    try:
+        with metrics.stage('/predict_crop/batch', 'parse'):
+            samples, parse_errors, error_message = await read_batch_samples(request)
+        if error_message:
+            return jsonify({
+                'success': False,
+                'error': error_message
+            }, 400)
+
+        results = await run_model(predict_crop_batch, samples)
+        for index, parse_error in parse_errors.items():
+            results[index] = {
+                'success': False,
+                'error': parse_error
+            }
+
+        payload = {
+            'success': True,
+            'count': len(results),
+            'failed': sum(1 for result in results if not result['success']),
+            'results': results
+        }
+        # Encoding a large batch is CPU work too
+        return Response(await run_model(encode_json, payload), media_type='application/json')
+
+    except FileNotFoundError:
+        return jsonify({
+            'success': False,
+            'error': 'Model file not found. Please train and save the model first.'
+        }, 500)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }, 500)
+
+
+async def predict_fertilizer_endpoint(request):
+    try:
+        with metrics.stage('/predict_fertilizer', 'parse'):
+            data = await get_json(request)
+            is_valid, error_message, converted_data = validate_fertilizer_input_data(data)
+        if not is_valid:
+            return jsonify({
+                'success': False,
+                'error': error_message
+            }, 400)
+
+        result = await run_model(
+            predict_fertilizer,
+            temp=converted_data['temp'],
+            humidity=converted_data['humidity'],
+            moisture=converted_data['moisture'],
+            soil_type=converted_data['soil_type'],
+            crop_type=converted_data['crop_type'],
+            nitrogen=converted_data['nitrogen'],
+            potassium=converted_data['potassium'],
+            phosphorus=converted_data['phosphorus']
+        )
+
+        return jsonify({
+            'success': True,
+            **result
+        })
+
+    except FileNotFoundError:
+        return jsonify({
+            'success': False,
+            'error': 'Model or scaler file not found. Please ensure both files are available.'
+        }, 500)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }, 500)
+
+
+async def predict_disease_endpoint(request):
+    try:
+        # The upload is received chunk by chunk without holding a thread
+        with metrics.stage('/predict_disease', 'parse'):
+            form = await request.form()
+        image_file = form.get('image')
+
+        # Check if image file is present
+        if not isinstance(image_file, UploadFile):
+            return jsonify({
+                'success': False,
+                'error': 'No image file provided'
+            }, 400)
+
+        if not image_file.filename:
+            return jsonify({
+                'success': False,
+                'error': 'No image file selected'
+            }, 400)
+
+        image_bytes = await image_file.read()
+
+        result = await run_model(predict_disease, image_bytes)
+
+        return jsonify({
+            'success': True,
+            **result
+        })
+
+    except DiseaseQueueFullError as e:
+        # Shed load instead of queueing without bound; clients retry later
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }, 503, headers={'Retry-After': str(e.retry_after)})
+    except FileNotFoundError:
+        return jsonify({
+            'success': False,
+            'error': 'Disease detection model file not found.'
+        }, 500)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }, 500)
+
+
+async def predict_disease_metrics_endpoint(request):
+    return jsonify({
+        'success': True,
+        'batching': get_disease_batching_metrics(),
+        'pool': get_disease_pool_metrics()
+    })
+
+
+async def get_disease_solution_endpoint(request):
+    try:
+        with metrics.stage('/get_disease_solution', 'parse'):
+            data = await get_json(request)
+
+        if 'disease_name' not in data:
+            return jsonify({
+                'success': False,
+                'error': 'disease_name is required'
+            }, 400)
+
+        # Extract API key from request body or headers
+        api_key = data.get('api_key') or request.headers.get('X-Gemini-API-Key')
+
+        if wants_event_stream(request, data):
+            # The upstream stream is read on Starlette's thread pool, chunk by chunk
+            disease, chunks = stream_disease_solution(data['disease_name'], api_key)
+            return StreamingResponse(
+                solution_events(disease, chunks),
+                media_type='text/event-stream',
+                headers={
+                    'Cache-Control': 'no-cache',
+                    'X-Accel-Buffering': 'no'
+                }
+            )
+
+        result = await get_disease_solution_async(
+            disease_name=data['disease_name'],
+            api_key=api_key
+        )
+
+        return jsonify(result)
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }, 500)
+
+
+async def predict_price_endpoint(request):
+    try:
+        with metrics.stage('/predict_price', 'parse'):
+            data = await get_json(request)
+        if 'commodity' not in data or 'date' not in data:
+            return jsonify({
+                'success': False,
+                'error': 'Missing required fields: commodity, date'
+            }, 400)
+
+        result = await run_model(
+            predict_price,
+            commodity=data['commodity'],
+            date_str=data['date']
+        )
+        return jsonify({
+            'success': True,
+            **result
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }, 500)
+
+
+async def predict_price_series_endpoint(request):
+    try:
+        with metrics.stage('/predict_price/series', 'parse'):
+            data = await get_json(request, silent=True)
+            is_valid, error_message, converted_data = validate_price_series_input(data)
+        if not is_valid:
+            return jsonify({
+                'success': False,
+                'error': error_message
+            }, 400)
+
+        result = await run_model(
+            predict_price_series,
+            commodities=converted_data['commodities'],
+            start_year=converted_data['start_year'],
+            start_month=converted_data['start_month'],
+            months=converted_data['months']
+        )
+        return jsonify({
+            'success': True,
+            **result
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }, 500)
+
+
+class RequestMetricsMiddleware:
+    """
+    Times every HTTP request by route and status and tags it with a request
+    ID for the logs, like app.py's request hooks
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        endpoint = scope['path'] if scope['path'] in ROUTE_PATHS else 'unmatched'
+        _current_endpoint.set(endpoint)
+        request_id, log_context = structured_logging.begin_request(
+            Headers(scope=scope).get(structured_logging.REQUEST_ID_HEADER)
+        )
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                MutableHeaders(scope=message)[structured_logging.REQUEST_ID_HEADER] = request_id
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            metrics.observe_request(endpoint, scope['method'], status, time.perf_counter() - start)
+            structured_logging.end_request(log_context)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    # Answer queued disease images, then stop the model threads
+    await asyncio.get_running_loop().run_in_executor(None, shutdown_disease_inference)
+    _model_executor.shutdown(wait=True)
+
+
+routes = [
+    Route('/metrics', metrics_endpoint, methods=['GET']),
+    Route('/', health_check, methods=['GET']),
+    Route('/ready', readiness_check, methods=['GET']),
+    Route('/models', models_info, methods=['GET']),
+    Route('/cache/stats', cache_stats, methods=['GET']),
+    Route('/predict_crop', predict_crop_endpoint, methods=['POST']),
+    Route('/predict_crop/batch', predict_crop_batch_endpoint, methods=['POST']),
+    Route('/predict_fertilizer', predict_fertilizer_endpoint, methods=['POST']),
+    Route('/predict_disease', predict_disease_endpoint, methods=['POST']),
+    Route('/predict_disease/metrics', predict_disease_metrics_endpoint, methods=['GET']),
+    Route('/get_disease_solution', get_disease_solution_endpoint, methods=['POST']),
+    Route('/predict_price', predict_price_endpoint, methods=['POST']),
+    Route('/predict_price/series', predict_price_series_endpoint, methods=['POST']),
+]
+ROUTE_PATHS = {route.path for route in routes}
+
+app = Starlette(
+    routes=routes,
+    middleware=[
+        Middleware(RequestMetricsMiddleware),
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])
+    ],
+    lifespan=lifespan
+)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run(app, port=5000)
@@ -0,0 +1,469 @@
+"""
+Offline benchmark suite for the prediction endpoints
+Drives services.py in-process and app.py through Flask's test client with
+inputs derived from the training CSVs plus seeded synthetic rows and images.
+Each scenario runs in a fresh process so its peak RSS and caches are its own.
+
+    python benchmark.py                              # run everything, compare with benchmarks/baseline.json
+    python benchmark.py --save-baseline              # record a new baseline on this machine
+    python benchmark.py --scenarios services.crop --quick --output results.json
+
+Results are JSON: p50/p95/p99/mean latency in ms, throughput in calls/s and
+items/s, and peak RSS in MB per scenario. A scenario whose p50 or p95 latency
+grows, or whose throughput drops, by more than --tolerance against the baseline
+(or whose peak RSS grows by more than --rss-tolerance) is a regression and the
+run exits with status 1.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(BASE_DIR)
+
+CROP_CSV = os.path.join(BASE_DIR, 'Crop Recomendation', 'Crop_recommendation.csv')
+FERTILIZER_CSV = os.path.join(BASE_DIR, 'Fertilizer Recomendation', 'fertilizer_dataset.csv')
+DEFAULT_BASELINE = os.path.join(BASE_DIR, 'benchmarks', 'baseline.json')
+
+# Response caches are off unless a scenario measures them: repeated inputs
+# would otherwise time the cache instead of the model
+UNCACHED_ENV = {'RESPONSE_CACHE_MAX_ENTRIES': '0', 'DISEASE_CACHE_MAX_ENTRIES': '0', 'DISEASE_CACHE_DB': ''}
+
+
+def crop_rows(count, seed):
+    """
+    Crop inputs: the CSV rows, then the CSV rows with seeded noise
+
+    Returns:
+        list: predict_crop keyword dictionaries
+    """
+    import pandas as pd
+
+    frame = pd.read_csv(CROP_CSV)
+    columns = {'N': 'n', 'P': 'p', 'K': 'k', 'temperature': 'temp', 'humidity': 'humidity', 'ph': 'ph', 'rainfall': 'rainfall'}
+    base = frame[list(columns)].rename(columns=columns).to_dict('records')
+    rng = np.random.default_rng(seed)
+    rows = []
+    while len(rows) < count:
+        noisy = len(rows) >= len(base)
+        for row in base[:count - len(rows)]:
+            rows.append({field: float(value) * rng.uniform(0.95, 1.05) if noisy else float(value)
+                         for field, value in row.items()})
+    return rows
+
+
+def fertilizer_rows(count, seed):
+    """
+    Fertilizer inputs: CSV rows converted by validate_fertilizer_input_data,
+    with seeded noise on the continuous fields
+
+    Returns:
+        list: predict_fertilizer keyword dictionaries
+    """
+    import pandas as pd
+    from services import validate_fertilizer_input_data
+
+    frame = pd.read_csv(FERTILIZER_CSV)
+    frame.columns = [column.strip() for column in frame.columns]
+    base = []
+    for record in frame.to_dict('records'):
+        is_valid, _, converted = validate_fertilizer_input_data({
+            'temp': record['Temparature'], 'humidity': record['Humidity'], 'moisture': record['Moisture'],
+            'soil_type': record['Soil Type'], 'crop_type': record['Crop Type'],
+            'nitrogen': record['Nitrogen'], 'potassium': record['Potassium'], 'phosphorus': record['Phosphorous']
+        })
+        if is_valid:
+            base.append(converted)
+
+    rng = np.random.default_rng(seed)
+    rows = []
+    while len(rows) < count:
+        for row in base[:count - len(rows)]:
+            row = dict(row)
+            for field in ('temp', 'humidity', 'moisture'):
+                row[field] = round(float(row[field]) * rng.uniform(0.9, 1.1), 2)
+            rows.append(row)
+    return rows
+
+
+def price_rows(count, seed, in_table=True):
+    """
+    Price inputs over the commodities the encoder knows; dates inside the
+    precomputed forecast table, or past it so the live model runs
+
+    Returns:
+        list: (commodity, date string) tuples
+    """
+    from price_forecast import known_commodities
+    from services import PRICE_TABLE_END_YEAR, PRICE_TABLE_START_YEAR, load_price_model
+
+    _, encoder = load_price_model()
+    commodities = known_commodities(encoder)
+    rng = np.random.default_rng(seed)
+    if in_table:
+        years = rng.integers(PRICE_TABLE_START_YEAR, PRICE_TABLE_END_YEAR + 1, count)
+    else:
+        years = rng.integers(PRICE_TABLE_END_YEAR + 1, PRICE_TABLE_END_YEAR + 20, count)
+    months = rng.integers(1, 13, count)
+    picks = rng.integers(0, len(commodities), count)
+    return [(commodities[pick], f'{year}-{month:02d}-15') for pick, year, month in zip(picks, years, months)]
+
+
+def leaf_images(count, seed, size=(800, 600)):
+    """Seeded synthetic JPEG uploads, each distinct"""
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(count):
+        # Smooth gradients plus noise compress like photos, unlike pure noise
+        gradient = np.linspace(0, 255, size[0], dtype=np.float32)[None, :, None]
+        pixels = gradient * rng.uniform(0.3, 1.0, 3) + rng.normal(0, 20, (size[1], size[0], 3))
+        buffer = io.BytesIO()
+        Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(buffer, 'JPEG', quality=85)
+        images.append(buffer.getvalue())
+    return images
+
+
+def _services_crop(count, seed):
+    from services import predict_crop
+    return lambda row: predict_crop(**row), crop_rows(count, seed), 1
+
+
+def _services_crop_cached(count, seed, distinct=100):
+    # A small working set repeated, so nearly every call is a cache hit
+    from services import predict_crop
+    rows = crop_rows(distinct, seed)
+    return lambda row: predict_crop(**row), [rows[index % distinct] for index in range(count)], 1
+
+
+def _services_crop_batch(count, seed, batch_size=1000):
+    from services import predict_crop_batch
+    rows = crop_rows(batch_size, seed)
+    return lambda _: predict_crop_batch(rows), [None] * count, batch_size
+
+
+def _services_fertilizer(count, seed):
+    from services import predict_fertilizer
+    fields = ('temp', 'humidity', 'moisture', 'soil_type', 'crop_type', 'nitrogen', 'potassium', 'phosphorus')
+    return lambda row: predict_fertilizer(**{field: row[field] for field in fields}), fertilizer_rows(count, seed), 1
+
+
+def _services_price(count, seed, in_table=True):
+    from services import predict_price
+    return lambda row: predict_price(*row), price_rows(count, seed, in_table), 1
+
+
+def _services_price_series(count, seed, commodities=20, months=24):
+    from price_forecast import known_commodities
+    from services import load_price_model, predict_price_series
+    names = known_commodities(load_price_model()[1])[:commodities]
+    return lambda _: predict_price_series(names, 2025, 1, months), [None] * count, len(names) * months
+
+
+def _services_disease(count, seed):
+    from services import load_disease_model, predict_disease
+    load_disease_model()
+    return predict_disease, leaf_images(count, seed), 1
+
+
+def _app_client():
+    from app import app
+    return app.test_client()
+
+
+def _checked(response):
+    if response.status_code != 200:
+        raise RuntimeError(f'HTTP {response.status_code}: {response.get_data(as_text=True)[:200]}')
+    return response
+
+
+def _app_crop(count, seed):
+    client = _app_client()
+    return lambda row: _checked(client.post('/predict_crop', json=row)), crop_rows(count, seed), 1
+
+
+def _app_crop_batch(count, seed, batch_size=1000):
+    client = _app_client()
+    body = json.dumps(crop_rows(batch_size, seed))
+    call = lambda _: _checked(client.post('/predict_crop/batch', data=body, content_type='application/json'))
+    return call, [None] * count, batch_size
+
+
+def _app_fertilizer(count, seed):
+    client = _app_client()
+    return lambda row: _checked(client.post('/predict_fertilizer', json=row)), fertilizer_rows(count, seed), 1
+
+
+def _app_price(count, seed):
+    client = _app_client()
+    call = lambda row: _checked(client.post('/predict_price', json={'commodity': row[0], 'date': row[1]}))
+    return call, price_rows(count, seed), 1
+
+
+def _app_disease(count, seed):
+    from services import load_disease_model
+    load_disease_model()
+    client = _app_client()
+    call = lambda image: _checked(client.post(
+        '/predict_disease', data={'image': (io.BytesIO(image), 'leaf.jpg')}, content_type='multipart/form-data'
+    ))
+    return call, leaf_images(count, seed), 1
+
+
+# name -> (input builder, calls, warm-up calls, concurrent threads, extra environment)
+SCENARIOS = {
+    'services.crop.single': (_services_crop, 2000, 100, 1, UNCACHED_ENV),
+    'services.crop.cached': (_services_crop_cached, 2000, 100, 1, {}),
+    'services.crop.batch': (_services_crop_batch, 50, 3, 1, UNCACHED_ENV),
+    'services.crop.concurrent': (_services_crop, 4000, 100, 8, UNCACHED_ENV),
+    'services.fertilizer.single': (_services_fertilizer, 2000, 100, 1, UNCACHED_ENV),
+    'services.fertilizer.concurrent': (_services_fertilizer, 4000, 100, 8, UNCACHED_ENV),
+    'services.price.table': (_services_price, 2000, 100, 1, UNCACHED_ENV),
+    'services.price.live': (lambda count, seed: _services_price(count, seed, in_table=False), 2000, 100, 1, UNCACHED_ENV),
+    'services.price.series': (_services_price_series, 200, 10, 1, UNCACHED_ENV),
+    'services.disease.single': (_services_disease, 100, 5, 1, UNCACHED_ENV),
+    'services.disease.concurrent': (_services_disease, 200, 8, 8, UNCACHED_ENV),
+    'app.crop.single': (_app_crop, 2000, 100, 1, UNCACHED_ENV),
+    'app.crop.batch': (_app_crop_batch, 30, 3, 1, UNCACHED_ENV),
+    'app.crop.concurrent': (_app_crop, 4000, 100, 8, UNCACHED_ENV),
+    'app.fertilizer.single': (_app_fertilizer, 2000, 100, 1, UNCACHED_ENV),
+    'app.price.single': (_app_price, 2000, 100, 1, UNCACHED_ENV),
+    'app.disease.single': (_app_disease, 100, 5, 1, UNCACHED_ENV),
+    'app.disease.concurrent': (_app_disease, 200, 8, 8, UNCACHED_ENV),
+}
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_scenario(name, scale, seed):
+    """
+    Run one scenario in this process
+
+    Returns:
+        dict: Latency percentiles, throughput and peak RSS, or the skip reason
+    """
+    build, calls, warm_up, threads, _ = SCENARIOS[name]
+    calls = max(threads, int(calls * scale))
+    warm_up = max(1, int(warm_up * scale))
+
+    try:
+        call, inputs, items_per_call = build(calls + warm_up, seed)
+        for item in inputs[:warm_up]:
+            call(item)
+    except FileNotFoundError as e:
+        return {'skipped': f'Model file not found: {e}'}
+    inputs = inputs[warm_up:warm_up + calls]
+
+    latencies = [0.0] * len(inputs)
+    errors = []
+
+    def worker(offset):
+        for index in range(offset, len(inputs), threads):
+            start = time.perf_counter()
+            try:
+                call(inputs[index])
+            except Exception as e:
+                errors.append(str(e))
+            latencies[index] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(offset,)) for offset in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = np.asarray(latencies) * 1000
+    return {
+        'calls': len(inputs),
+        'threads': threads,
+        'items_per_call': items_per_call,
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'p50_ms': round(float(np.percentile(latencies_ms, 50)), 4),
+        'p95_ms': round(float(np.percentile(latencies_ms, 95)), 4),
+        'p99_ms': round(float(np.percentile(latencies_ms, 99)), 4),
+        'mean_ms': round(float(latencies_ms.mean()), 4),
+        'throughput_per_s': round(len(inputs) / elapsed, 2),
+        'items_per_s': round(len(inputs) * items_per_call / elapsed, 2),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+
+
+def environment_info():
+    import torch
+    import sklearn
+    import xgboost
+
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': cpus,
+        'torch': torch.__version__,
+        'sklearn': sklearn.__version__,
+        'xgboost': xgboost.__version__,
+        'numpy': np.__version__,
+    }
+
+
+def run_in_subprocess(name, scale, seed):
+    env = dict(os.environ, PYTHONWARNINGS='ignore', PRELOAD_MODELS='0', GEMINI_CLIENT='stub')
+    env.update(SCENARIOS[name][4])
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--run-scenario', name, '--scale', str(scale), '--seed', str(seed)],
+        env=env, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        return {'failed': completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else 'exit code '
+                f'{completed.returncode}'}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def compare(results, baseline, tolerance, rss_tolerance):
+    """
+    Compare results with a baseline
+
+    Returns:
+        list: Regression messages, empty when nothing regressed
+    """
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get('scenarios', {}).get(name)
+        if not reference or 'p50_ms' not in reference or 'p50_ms' not in result:
+            continue
+        for metric in ('p50_ms', 'p95_ms'):
+            if result[metric] > reference[metric] * (1 + tolerance):
+                regressions.append(f'{name}: {metric} {reference[metric]:.3f} -> {result[metric]:.3f}')
+        if result['throughput_per_s'] < reference['throughput_per_s'] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {reference['throughput_per_s']:.1f}/s -> {result['throughput_per_s']:.1f}/s"
+            )
+        if result['peak_rss_mb'] > reference['peak_rss_mb'] * (1 + rss_tolerance):
+            regressions.append(f"{name}: peak RSS {reference['peak_rss_mb']:.0f} MB -> {result['peak_rss_mb']:.0f} MB")
+        if result['errors']:
+            regressions.append(f"{name}: {result['errors']} failed calls ({result['first_error']})")
+    return regressions
+
+
+def print_table(results, baseline):
+    reference = baseline.get('scenarios', {}) if baseline else {}
+    print(f"{'scenario':<32}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'calls/s':>11}{'items/s':>12}{'RSS MB':>9}{'vs base p50':>13}")
+    for name, result in results.items():
+        if 'p50_ms' not in result:
+            print(f"{name:<32}  {result.get('skipped') or result.get('failed')}")
+            continue
+        change = ''
+        if 'p50_ms' in reference.get(name, {}):
+            change = f"{result['p50_ms'] / reference[name]['p50_ms'] - 1:+.0%}"
+        print(f"{name:<32}{result['p50_ms']:>10.3f}{result['p95_ms']:>10.3f}{result['p99_ms']:>10.3f}"
+              f"{result['throughput_per_s']:>11.1f}{result['items_per_s']:>12.1f}{result['peak_rss_mb']:>9.0f}{change:>13}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the prediction endpoints offline')
+    parser.add_argument('--scenarios', nargs='*', help='Scenario names or prefixes (default: all)')
+    parser.add_argument('--list', action='store_true', help='List scenario names and exit')
+    parser.add_argument('--quick', action='store_true', help='Run a tenth of the calls')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the results JSON here')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline JSON to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='Write the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed fractional latency growth / throughput drop')
+    parser.add_argument('--rss-tolerance', type=float, default=0.15, help='Allowed fractional peak RSS growth')
+    parser.add_argument('--disease-checkpoint', help='Disease checkpoint (default: DISEASE_MODEL_PATH)')
+    parser.add_argument('--run-scenario', help=argparse.SUPPRESS)
+    parser.add_argument('--scale', type=float, default=1.0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_scenario:
+        print(json.dumps(run_scenario(args.run_scenario, args.scale, args.seed)))
+        return
+
+    if args.list:
+        print('\n'.join(SCENARIOS))
+        return
+
+    if args.disease_checkpoint:
+        os.environ['DISEASE_MODEL_PATH'] = os.path.abspath(args.disease_checkpoint)
+
+    names = [
+        name for name in SCENARIOS
+        if not args.scenarios or any(name == prefix or name.startswith(prefix + '.') for prefix in args.scenarios)
+    ]
+    if not names:
+        print(f"✗ No scenario matches {args.scenarios}; see --list")
+        sys.exit(2)
+
+    scale = 0.1 if args.quick else 1.0
+    results = {}
+    for name in names:
+        print(f"Running {name}...", flush=True)
+        results[name] = run_in_subprocess(name, scale, args.seed)
+
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'scale': scale,
+        'seed': args.seed,
+        'environment': environment_info(),
+        'scenarios': results,
+    }
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    print()
+    print_table(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✓ Results written to {args.output}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✓ Baseline written to {args.baseline}")
+        return
+
+    if baseline is None:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to record one")
+        return
+
+    if baseline.get('environment', {}).get('cpus') != report['environment']['cpus']:
+        print(f"\n✗ Baseline was recorded with {baseline['environment'].get('cpus')} CPUs, "
+              f"this machine has {report['environment']['cpus']}; numbers are not comparable")
+    if baseline.get('scale') != scale:
+        print(f"\n✗ Baseline was recorded with scale {baseline.get('scale')}, this run used {scale}")
+
+    regressions = compare(results, baseline, args.tolerance, args.rss_tolerance)
+    if regressions:
+        print(f"\n✗ {len(regressions)} performance regression(s) against {args.baseline}:")
+        for regression in regressions:
+            print(f"  ✗ {regression}")
+        sys.exit(1)
+    print(f"\n✓ No regressions against {args.baseline} (tolerance {args.tolerance:.0%}, RSS {args.rss_tolerance:.0%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+"""
+Optimized CPU inference backends for the plant disease model
+Selected with DISEASE_BACKEND:
+
+    eager          fp32 model exactly as trained (default)
+    channels_last  fp32 with Conv2d+BatchNorm2d+ReLU fused, NHWC memory format
+    int8           statically quantized INT8 graph produced by quantize_disease_model.py
+    torchscript    exported TorchScript graph, frozen with torch.jit.optimize_for_inference
+    onnx           exported ONNX graph on ONNX Runtime (CPU), needs `pip install onnxruntime`
+
+The exported backends (int8, torchscript, onnx) load without the pickled
+ResNet9 class; export_disease_model.py produces them
+"""
+import copy
+import importlib.util
+import os
+
+import torch
+import torch.nn as nn
+from torch.ao.quantization import fuse_modules, get_default_qconfig_mapping
+from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+
+DISEASE_BACKENDS = ('eager', 'channels_last', 'int8', 'torchscript', 'onnx')
+DISEASE_BACKEND = os.getenv('DISEASE_BACKEND', 'eager').lower()
+
+DISEASE_INT8_MODEL = os.getenv(
+    'DISEASE_INT8_MODEL',
+    os.path.join(MODELS_DIR, "plant-disease-model-int8.pt")
+)
+DISEASE_TORCHSCRIPT_MODEL = os.getenv(
+    'DISEASE_TORCHSCRIPT_MODEL',
+    os.path.join(MODELS_DIR, "plant-disease-model.torchscript.pt")
+)
+DISEASE_ONNX_MODEL = os.getenv(
+    'DISEASE_ONNX_MODEL',
+    os.path.join(MODELS_DIR, "plant-disease-model.onnx")
+)
+
+# Threads used inside one forward pass by the exported backends
+# (0 keeps the library default); torch's setting is process-wide, so
+# services.py applies it once at start-up rather than the loaders
+DISEASE_INTRA_OP_THREADS = int(os.getenv('DISEASE_INTRA_OP_THREADS', '0'))
+
+ONNX_OPSET_VERSION = 17
+
+# x86 (fbgemm + oneDNN) for servers; qnnpack for ARM hosts
+QUANTIZATION_ENGINE = os.getenv('QUANTIZATION_ENGINE', 'x86')
+
+
+class ChannelsLastModel(nn.Module):
+    """Feeds NHWC batches to a model whose weights are stored channels_last"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, x):
+        return self.model(x.contiguous(memory_format=torch.channels_last))
+
+
+def fuse_conv_blocks(model):
+    """
+    Fold every Conv2d -> BatchNorm2d -> ReLU sequence (the conv_block layout)
+    into a single fused conv
+
+    Args:
+        model: fp32 model in eval mode
+
+    Returns:
+        nn.Module: Fused copy of the model
+    """
+    model = copy.deepcopy(model).eval()
+    blocks = [
+        module for module in model.modules()
+        if isinstance(module, nn.Sequential) and len(module) >= 3
+        and isinstance(module[0], nn.Conv2d)
+        and isinstance(module[1], nn.BatchNorm2d)
+        and isinstance(module[2], nn.ReLU)
+    ]
+    for block in blocks:
+        fuse_modules(block, [['0', '1', '2']], inplace=True)
+    return model
+
+
+def to_channels_last(model):
+    """fp32 backend: fused conv blocks with NHWC weights and inputs"""
+    model = fuse_conv_blocks(model).to(memory_format=torch.channels_last)
+    return ChannelsLastModel(model).eval()
+
+
+def quantize_static(model, calibration_batches, engine=QUANTIZATION_ENGINE):
+    """
+    Post-training static INT8 quantization with FX graph mode
+    FX fuses Conv+BN+ReLU and handles the residual additions itself, so the
+    model class needs no QuantStub/FloatFunctional changes
+
+    Args:
+        model: fp32 model in eval mode
+        calibration_batches: Iterable of (N, 3, H, W) float tensors from real images
+        engine: Quantized kernel backend
+
+    Returns:
+        torch.nn.Module: Quantized model
+    """
+    torch.backends.quantized.engine = engine
+    calibration_batches = iter(calibration_batches)
+    first_batch = next(calibration_batches)
+
+    prepared = prepare_fx(
+        copy.deepcopy(model).eval(),
+        get_default_qconfig_mapping(engine),
+        (first_batch,)
+    )
+    with torch.no_grad():
+        prepared(first_batch)
+        for batch in calibration_batches:
+            prepared(batch)
+
+    return convert_fx(prepared)
+
+
+def save_int8(quantized_model, example_batch, path):
+    """
+    Trace the quantized model with channels_last inputs and save it as TorchScript
+    The saved graph loads without the original model class
+    """
+    with torch.no_grad():
+        traced = torch.jit.trace(
+            ChannelsLastModel(quantized_model).eval(),
+            example_batch.contiguous(memory_format=torch.channels_last)
+        )
+        traced = torch.jit.freeze(traced)
+    torch.jit.save(traced, path)
+
+
+def load_int8(path, engine=QUANTIZATION_ENGINE):
+    """Load a quantized TorchScript model written by save_int8"""
+    torch.backends.quantized.engine = engine
+    model = torch.jit.load(path, map_location="cpu")
+    model.eval()
+    return model
+
+
+def export_torchscript(model, example_batch, path):
+    """
+    Trace the eager model and save it as TorchScript
+    The graph is saved unfrozen; optimize_for_inference runs at load time
+    because its fusions depend on the serving CPU
+    """
+    with torch.no_grad():
+        traced = torch.jit.trace(copy.deepcopy(model).eval(), example_batch)
+    torch.jit.save(traced, path)
+
+
+def load_torchscript(path):
+    """Load a TorchScript export and freeze it with inference-only graph optimizations"""
+    model = torch.jit.load(path, map_location="cpu")
+    model.eval()
+    return torch.jit.optimize_for_inference(model)
+
+
+def export_onnx(model, example_batch, path):
+    """Export the eager model to ONNX with a dynamic batch dimension"""
+    with torch.no_grad():
+        torch.onnx.export(
+            copy.deepcopy(model).eval(),
+            example_batch,
+            path,
+            input_names=['image'],
+            output_names=['logits'],
+            dynamic_axes={'image': {0: 'batch'}, 'logits': {0: 'batch'}},
+            opset_version=ONNX_OPSET_VERSION,
+            dynamo=False
+        )
+
+
+def onnxruntime_available():
+    return importlib.util.find_spec('onnxruntime') is not None
+
+
+class OnnxModel:
+    """
+    ONNX Runtime session behind the same call signature as a torch model:
+    takes an (N, 3, H, W) float tensor and returns the logits tensor
+    """
+
+    def __init__(self, path, intra_op_threads=DISEASE_INTRA_OP_THREADS):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.inter_op_num_threads = 1
+        if intra_op_threads > 0:
+            options.intra_op_num_threads = intra_op_threads
+
+        self.path = path
+        self.session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, img_batch):
+        logits = self.session.run(None, {self.input_name: img_batch.contiguous().numpy()})[0]
+        return torch.from_numpy(logits)
+
+    def eval(self):
+        return self
+
+
+def load_onnx(path):
+    """Load an ONNX export on ONNX Runtime"""
+    return OnnxModel(path)
+
+
+# Exported backend -> (default artifact path, loader)
+EXPORTED_BACKENDS = {
+    'int8': (DISEASE_INT8_MODEL, load_int8),
+    'torchscript': (DISEASE_TORCHSCRIPT_MODEL, load_torchscript),
+    'onnx': (DISEASE_ONNX_MODEL, load_onnx),
+}
@@ -0,0 +1,326 @@
+"""
+Process pool for disease inference
+Conv inference holds a core for tens of milliseconds; running it in separate
+processes keeps it off the web workers' threads (and GIL), so the tabular
+endpoints keep their latency while photo uploads spike.
+
+Images are decoded in the web process straight into a slot of a shared-memory
+tensor; only (ticket, slot) pairs cross the process boundary. Inference
+processes micro-batch queued slots, run the model and send back class
+indices. The slot count is the queue limit: when every slot is taken, new
+images are rejected with DiseaseQueueFullError instead of waiting.
+"""
+import itertools
+import os
+import queue
+import signal
+import threading
+import time
+from concurrent.futures import Future
+
+import torch
+import torch.multiprocessing as mp
+
+import structured_logging
+
+
+log = structured_logging.get_logger(__name__)
+
+# Inference processes per web worker process; 0 runs inference on the
+# in-process micro-batcher thread instead
+DISEASE_POOL_PROCESSES = int(os.getenv('DISEASE_POOL_PROCESSES', '0'))
+
+# Torch threads per inference process
+DISEASE_POOL_THREADS = int(os.getenv('DISEASE_POOL_THREADS', '1'))
+
+# Images admitted at once (being decoded, queued or in a forward pass);
+# beyond this requests are shed with 503 + Retry-After
+DISEASE_MAX_QUEUE_DEPTH = int(os.getenv('DISEASE_MAX_QUEUE_DEPTH', '64'))
+DISEASE_RETRY_AFTER_SECONDS = int(os.getenv('DISEASE_RETRY_AFTER_SECONDS', '1'))
+
+# Upper bound on the wait for one image, so a crashed inference process
+# cannot hang a request
+DISEASE_POOL_TIMEOUT_SECONDS = float(os.getenv('DISEASE_POOL_TIMEOUT_SECONDS', '30'))
+
+
+class DiseaseQueueFullError(Exception):
+    """Raised when the disease image queue is at DISEASE_MAX_QUEUE_DEPTH"""
+
+    def __init__(self, retry_after=DISEASE_RETRY_AFTER_SECONDS):
+        super().__init__('Disease detection is busy, please retry shortly')
+        self.retry_after = retry_after
+
+
+def _inference_main(slots, requests, results, parent_pid, max_batch_size, max_wait, threads):
+    """
+    Inference process loop: batch queued slots, run the model, report class indices
+    The model is loaded through the services model registry, so backend
+    selection, memory-mapped weights and hot-swapping work as in-process
+    """
+    # Ctrl+C reaches the whole process group; the parent stops the pool itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    from services import load_disease_model
+
+    # After importing services, whose start-up thread setting is for web workers
+    torch.set_num_threads(max(1, threads))
+
+    try:
+        load_disease_model()
+    except Exception:
+        # Reported to the callers of the first batch instead
+        pass
+
+    stopping = False
+    while not stopping:
+        try:
+            item = requests.get(timeout=1.0)
+        except queue.Empty:
+            # Exit with an orphaned pool if the web process was killed
+            if os.getppid() != parent_pid:
+                break
+            continue
+        if item is None:
+            break
+
+        batch = [item]
+        deadline = time.monotonic() + max_wait
+        while len(batch) < max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = requests.get(timeout=remaining) if remaining > 0 else requests.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                stopping = True
+                break
+            batch.append(item)
+
+        tickets = [ticket for ticket, _ in batch]
+        try:
+            model, _ = load_disease_model()
+            with torch.no_grad():
+                output = model(slots[[slot for _, slot in batch]])
+            results.put(('result', os.getpid(), list(zip(tickets, output.argmax(1).tolist()))))
+        except Exception as e:
+            results.put(('error', os.getpid(), (tickets, isinstance(e, FileNotFoundError), str(e))))
+
+
+class DiseaseInferencePool:
+    """
+    Dedicated inference processes fed through a shared-memory slot tensor
+
+    Args:
+        processes: Inference processes to run
+        image_size: (H, W) of the model input
+        max_queue_depth: Slots, i.e. images admitted at once
+        max_batch_size: Images per forward pass
+        max_wait_ms: How long an inference process waits for a batch to fill
+        threads: Torch threads per inference process
+        retry_after: Seconds suggested to rejected callers
+    """
+
+    def __init__(self, processes, image_size, max_queue_depth=DISEASE_MAX_QUEUE_DEPTH, max_batch_size=16,
+                 max_wait_ms=5.0, threads=DISEASE_POOL_THREADS, retry_after=DISEASE_RETRY_AFTER_SECONDS):
+        self.processes = max(1, int(processes))
+        self.image_size = (int(image_size), int(image_size)) if isinstance(image_size, int) else tuple(image_size)
+        self.max_queue_depth = max(1, int(max_queue_depth))
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.threads = threads
+        self.retry_after = retry_after
+
+        self._lock = threading.Lock()
+        self._pid = None
+        self._stopping = False
+        self._workers = []
+        self._tickets = itertools.count()
+        self._pending = {}
+        self._free_slots = []
+        self._rejected = 0
+        self._images = 0
+        self._restarts = 0
+
+    def _ensure_started(self):
+        # Processes and the collector thread belong to the process that started them
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # spawn, not fork: forking a threaded web worker that holds torch
+            # thread pools is unsafe
+            context = mp.get_context('spawn')
+            height, width = self.image_size
+            self._slots = torch.zeros((self.max_queue_depth, 3, height, width)).share_memory_()
+            self._free_slots = list(range(self.max_queue_depth))
+            self._pending = {}
+            self._context = context
+            self._requests = context.Queue()
+            self._results = context.Queue()
+            self._workers = [self._start_worker() for _ in range(self.processes)]
+            self._pid = os.getpid()
+            self._stopping = False
+            self._collector = threading.Thread(
+                target=self._collect,
+                args=(self._results,),
+                name='disease-pool-collector',
+                daemon=True
+            )
+            self._collector.start()
+
+    def _start_worker(self):
+        worker = self._context.Process(
+            target=_inference_main,
+            args=(self._slots, self._requests, self._results, os.getpid(),
+                  self.max_batch_size, self.max_wait, self.threads),
+            name='disease-inference',
+            daemon=True
+        )
+        worker.start()
+        return worker
+
+    def start(self):
+        """Start the inference processes now instead of on the first image"""
+        self._ensure_started()
+
+    def submit(self, fill):
+        """
+        Admit one image and queue it for inference
+
+        Args:
+            fill: Callable writing the (3, H, W) input tensor into the tensor it
+                is given (the shared-memory slot)
+
+        Returns:
+            Future: Resolves to the predicted class index
+
+        Raises:
+            DiseaseQueueFullError: Every slot is taken
+        """
+        self._ensure_started()
+        with self._lock:
+            if not self._free_slots:
+                self._rejected += 1
+                raise DiseaseQueueFullError(self.retry_after)
+            slot = self._free_slots.pop()
+
+        try:
+            fill(self._slots[slot])
+        except BaseException:
+            with self._lock:
+                self._free_slots.append(slot)
+            raise
+
+        future = Future()
+        ticket = next(self._tickets)
+        with self._lock:
+            self._pending[ticket] = (slot, future, time.monotonic())
+            self._images += 1
+        self._requests.put((ticket, slot))
+        return future
+
+    def _finish(self, ticket, result=None, error=None):
+        with self._lock:
+            entry = self._pending.pop(ticket, None)
+            if entry is None:
+                return
+            slot, future, _ = entry
+            self._free_slots.append(slot)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _collect(self, results):
+        while True:
+            try:
+                kind, pid, payload = results.get(timeout=1.0)
+            except queue.Empty:
+                if self._stopping:
+                    return
+                self._check_workers()
+                continue
+            except (EOFError, OSError):
+                return
+
+            if kind == 'result':
+                for ticket, disease_index in payload:
+                    self._finish(ticket, result=disease_index)
+            elif kind == 'error':
+                tickets, file_not_found, message = payload
+                error_type = FileNotFoundError if file_not_found else RuntimeError
+                for ticket in tickets:
+                    self._finish(ticket, error=error_type(message))
+
+    def _check_workers(self):
+        # Replace crashed inference processes; their in-flight images fail
+        # through the per-image timeout
+        now = time.monotonic()
+        with self._lock:
+            if self._stopping:
+                return
+            for index, worker in enumerate(self._workers):
+                if not worker.is_alive():
+                    log.error('Disease inference process %s exited (%s), restarting', worker.pid, worker.exitcode)
+                    self._workers[index] = self._start_worker()
+                    self._restarts += 1
+            expired = [
+                ticket for ticket, (_, _, queued_at) in self._pending.items()
+                if now - queued_at > DISEASE_POOL_TIMEOUT_SECONDS
+            ]
+        for ticket in expired:
+            self._finish(ticket, error=TimeoutError('Disease inference timed out'))
+
+    def shutdown(self, timeout=None):
+        """
+        Answer the images queued so far, then stop the inference processes
+
+        Args:
+            timeout: Seconds to wait for the processes to finish (None waits until done)
+
+        Returns:
+            bool: True if every process exited within the timeout
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                return True
+            self._pid = None
+            self._stopping = True
+            workers = self._workers
+
+        for _ in workers:
+            self._requests.put(None)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for worker in workers:
+            worker.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        self._collector.join(2.0)
+
+        stopped = not any(worker.is_alive() for worker in workers)
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for _, future, _ in pending.values():
+            future.set_exception(RuntimeError('Disease inference pool shut down'))
+        return stopped
+
+    def metrics(self):
+        """
+        Snapshot of pool metrics
+
+        Returns:
+            dict: Process count, queue depth, slot usage and rejection counts
+        """
+        with self._lock:
+            return {
+                'processes': self.processes,
+                'processes_alive': sum(worker.is_alive() for worker in self._workers) if self._pid else 0,
+                'queue_depth': len(self._pending),
+                'max_queue_depth': self.max_queue_depth,
+                'slots_in_use': self.max_queue_depth - len(self._free_slots) if self._pid else 0,
+                'images': self._images,
+                'rejected': self._rejected,
+                'restarts': self._restarts
+            }
@@ -0,0 +1,363 @@
+"""
+Treatment advice for detected plant diseases
+Generates solutions with Google Gemini and caches them persistently, since
+the prompt only depends on the disease class
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import Future
+
+from disk_cache import SQLiteCache
+from gemini_client import GeminiClient
+from response_cache import TTLCache
+
+
+# Bump whenever SOLUTION_PROMPT_TEMPLATE changes so cached answers to the
+# old prompt are not served
+SOLUTION_PROMPT_VERSION = 1
+
+SOLUTION_PROMPT_TEMPLATE = """You are an agricultural expert. A farmer's plant has: {disease}
+
+Provide ONLY actionable steps in this exact format:
+
+What to do now:
+• [Step 1]
+• [Step 2]
+• [Step 3]
+
+Prevention:
+• [Prevention tip 1]
+• [Prevention tip 2]
+
+Keep it brief, practical, and farmer-friendly. Use bullet points only."""
+
+GEMINI_MODEL_NAME = os.getenv('GEMINI_MODEL', 'gemini-2.5-flash-lite')
+
+# Cached solutions older than this are regenerated; the stale answer is still
+# served if regeneration fails
+SOLUTION_CACHE_TTL_SECONDS = float(os.getenv('SOLUTION_CACHE_TTL_SECONDS', str(30 * 24 * 3600)))
+SOLUTION_CACHE_DB = os.getenv(
+    'SOLUTION_CACHE_DB',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'solutions.db')
+)
+
+
+def offline_solution(prompt):
+    """
+    Canned advice that echoes the disease named in a solution prompt, for
+    running without Gemini (GEMINI_CLIENT=stub and fake_gemini_server.py)
+    """
+    disease = prompt.split("A farmer's plant has: ", 1)[-1].split('\n', 1)[0]
+    return (
+        "What to do now:\n"
+        f"• Remove leaves affected by {disease}\n"
+        "• Apply a recommended fungicide\n"
+        "• Avoid overhead watering\n\n"
+        "Prevention:\n"
+        "• Rotate crops every season\n"
+        "• Use certified disease-free seed"
+    )
+
+
+class MissingApiKeyError(Exception):
+    """Raised when a solution has to be generated but no Gemini API key is available"""
+
+
+class StubGeminiClient:
+    """
+    Offline stand-in for GeminiClient used by tests and load tests
+    Returns a canned answer and counts calls
+    """
+
+    def __init__(self, delay_seconds=0.0):
+        self.delay_seconds = delay_seconds
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate(self, prompt, api_key, model_name):
+        with self._lock:
+            self.calls += 1
+        if self.delay_seconds:
+            threading.Event().wait(self.delay_seconds)
+        return offline_solution(prompt)
+
+    async def generate_async(self, prompt, api_key, model_name):
+        with self._lock:
+            self.calls += 1
+        if self.delay_seconds:
+            await asyncio.sleep(self.delay_seconds)
+        return offline_solution(prompt)
+
+    def stream(self, prompt, api_key, model_name):
+        with self._lock:
+            self.calls += 1
+        for line in offline_solution(prompt).splitlines(keepends=True):
+            if self.delay_seconds:
+                threading.Event().wait(self.delay_seconds)
+            yield line
+
+    def stats(self):
+        return {'calls': self.calls}
+
+
+class SolutionService:
+    """
+    Cached, deduplicating solution generator
+
+    Lookups go memory -> SQLite -> Gemini. Concurrent requests for the same
+    uncached disease share one upstream call.
+    """
+
+    def __init__(self, client, disk_cache=None, model_name=GEMINI_MODEL_NAME,
+                 ttl_seconds=SOLUTION_CACHE_TTL_SECONDS):
+        self.client = client
+        self.disk_cache = disk_cache
+        self.model_name = model_name
+        self.ttl_seconds = ttl_seconds
+        self.memory_cache = TTLCache('solutions', 1024, ttl_seconds)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.upstream_calls = 0
+        self.coalesced = 0
+
+    def cache_key(self, disease):
+        return f'v{SOLUTION_PROMPT_VERSION}|{self.model_name}|{disease}'
+
+    def get_cached(self, disease):
+        """
+        Return a fresh cached solution without calling upstream
+
+        Returns:
+            str: Solution text, or None when not cached or expired
+        """
+        key = self.cache_key(disease)
+        found, solution = self.memory_cache.get(key)
+        if found:
+            return solution
+
+        if self.disk_cache is not None:
+            solution, age = self.disk_cache.get_with_age(key)
+            if solution is not None and age <= self.ttl_seconds:
+                self.memory_cache.put(key, solution)
+                return solution
+
+        return None
+
+    def _disk_lookup(self, disease):
+        """
+        Returns:
+            tuple: (fresh cached solution or None, stale solution or None)
+        """
+        solution = self.get_cached(disease)
+        if solution is not None:
+            return solution, None
+        stale, _ = self.disk_cache.get_with_age(self.cache_key(disease))
+        return None, stale
+
+    def get_solution(self, disease, api_key=None, refresh=False):
+        """
+        Return the treatment advice for a formatted disease name
+
+        Args:
+            disease: Human readable disease name, e.g. "Tomato - Late blight"
+            api_key: Gemini API key, only needed when the answer is not cached
+            refresh: Regenerate even if a fresh answer is cached
+
+        Returns:
+            str: Solution text
+        """
+        key = self.cache_key(disease)
+        stale = None
+
+        if not refresh:
+            solution = self.get_cached(disease)
+            if solution is not None:
+                return solution
+            if self.disk_cache is not None:
+                stale, _ = self.disk_cache.get_with_age(key)
+
+        try:
+            return self._generate_once(key, disease, api_key)
+        except Exception:
+            if stale is not None:
+                return stale
+            raise
+
+    async def get_solution_async(self, disease, api_key=None, refresh=False):
+        """
+        Awaitable get_solution() for asyncio servers
+        The Gemini call is awaited on the event loop, so waiting requests hold
+        no thread; deduplication is shared with the synchronous path
+        """
+        key = self.cache_key(disease)
+        stale = None
+
+        if not refresh:
+            found, solution = self.memory_cache.get(key)
+            if found:
+                return solution
+            if self.disk_cache is not None:
+                # SQLite reads block, so they run off the event loop
+                solution, stale = await asyncio.to_thread(self._disk_lookup, disease)
+                if solution is not None:
+                    return solution
+
+        try:
+            return await self._generate_once_async(key, disease, api_key)
+        except Exception:
+            if stale is not None:
+                return stale
+            raise
+
+    def stream_solution(self, disease, api_key=None):
+        """
+        Yield the treatment advice incrementally
+        A cached answer is replayed immediately as one chunk; otherwise chunks
+        are forwarded as Gemini produces them and the complete answer is
+        cached at the end. Requests for a disease that is already being
+        generated wait for that answer instead of calling upstream again.
+
+        Yields:
+            str: Text chunk
+        """
+        solution = self.get_cached(disease)
+        if solution is not None:
+            yield solution
+            return
+
+        key = self.cache_key(disease)
+        future, leader = self._join_inflight(key)
+        if not leader:
+            try:
+                solution = future.result()
+            except Exception:
+                solution = self.get_solution(disease, api_key)
+            yield solution
+            return
+
+        stale = self.disk_cache.get_with_age(key)[0] if self.disk_cache is not None else None
+        chunks = []
+        try:
+            self._require_api_key(api_key)
+            with self._lock:
+                self.upstream_calls += 1
+
+            try:
+                for chunk in self.client.stream(
+                    SOLUTION_PROMPT_TEMPLATE.format(disease=disease), api_key, self.model_name
+                ):
+                    chunks.append(chunk)
+                    yield chunk
+            except Exception:
+                if chunks or stale is None:
+                    raise
+                chunks = [stale]
+                yield stale
+
+            solution = ''.join(chunks)
+            self._store(key, solution)
+            future.set_result(solution)
+        except BaseException as e:
+            # Includes GeneratorExit when the client disconnects mid-stream
+            if not future.done():
+                future.set_exception(e if isinstance(e, Exception) else RuntimeError('Solution stream aborted'))
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _join_inflight(self, key):
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = Future()
+            self._inflight[key] = future
+            return future, True
+
+    @staticmethod
+    def _require_api_key(api_key):
+        if not api_key:
+            raise MissingApiKeyError(
+                'Google Gemini API key not provided. Please set GEMINI_API_KEY environment variable.'
+            )
+
+    def _store(self, key, solution):
+        self.memory_cache.put(key, solution)
+        if self.disk_cache is not None:
+            self.disk_cache.put(key, solution)
+
+    def _generate_once(self, key, disease, api_key):
+        future, leader = self._join_inflight(key)
+        if not leader:
+            return future.result()
+
+        try:
+            self._require_api_key(api_key)
+
+            with self._lock:
+                self.upstream_calls += 1
+            solution = self.client.generate(
+                SOLUTION_PROMPT_TEMPLATE.format(disease=disease), api_key, self.model_name
+            )
+
+            self._store(key, solution)
+            future.set_result(solution)
+            return solution
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def _generate_once_async(self, key, disease, api_key):
+        future, leader = self._join_inflight(key)
+        if not leader:
+            # shield: a cancelled follower must not cancel the shared future
+            return await asyncio.shield(asyncio.wrap_future(future))
+
+        try:
+            self._require_api_key(api_key)
+
+            with self._lock:
+                self.upstream_calls += 1
+            solution = await self.client.generate_async(
+                SOLUTION_PROMPT_TEMPLATE.format(disease=disease), api_key, self.model_name
+            )
+
+            await asyncio.to_thread(self._store, key, solution)
+            future.set_result(solution)
+            return solution
+        except BaseException as e:
+            # Includes CancelledError when the client disconnects
+            future.set_exception(e if isinstance(e, Exception) else RuntimeError('Solution request cancelled'))
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self):
+        """Cache and upstream call counters"""
+        stats = {
+            'memory': self.memory_cache.stats(),
+            'upstream_calls': self.upstream_calls,
+            'coalesced': self.coalesced,
+            'client': self.client.stats()
+        }
+        if self.disk_cache is not None:
+            stats['disk'] = self.disk_cache.stats()
+        return stats
+
+
+def create_solution_service():
+    """
+    Build the solution service from environment configuration
+    GEMINI_CLIENT=stub swaps in the offline stub client; an empty
+    SOLUTION_CACHE_DB disables the persistent tier
+    """
+    client = StubGeminiClient() if os.getenv('GEMINI_CLIENT', '').lower() == 'stub' else GeminiClient()
+    disk_cache = SQLiteCache(SOLUTION_CACHE_DB, 'disease_solutions') if SOLUTION_CACHE_DB else None
+    return SolutionService(client, disk_cache)
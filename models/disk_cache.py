@@ -0,0 +1,156 @@
+"""
+Persistent key/value cache backed by SQLite
+Values are stored as JSON so cached results survive server restarts
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class SQLiteCache:
+    """
+    Thread-safe JSON key/value store in a single SQLite file
+
+    Entries older than ttl_seconds are treated as missing (None disables
+    expiry). Every prune_every writes, expired rows are deleted and the
+    oldest rows beyond max_rows are evicted (None disables the limit), so the
+    file stays bounded. One connection is shared behind a lock and reopened
+    after fork.
+    """
+
+    def __init__(self, path, table='cache', ttl_seconds=None, max_rows=None, prune_every=100):
+        self.path = path
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self.max_rows = max(1, int(max_rows)) if max_rows is not None else None
+        self.prune_every = max(1, int(prune_every))
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    def _connect(self):
+        if self._connection is not None and self._pid == os.getpid():
+            return self._connection
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+
+        connection = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute(
+            f'CREATE TABLE IF NOT EXISTS {self.table} '
+            '(key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)'
+        )
+        connection.execute(f'CREATE INDEX IF NOT EXISTS {self.table}_created_at ON {self.table} (created_at)')
+        connection.commit()
+
+        self._connection = connection
+        self._pid = os.getpid()
+        return connection
+
+    def get(self, key):
+        """
+        Look up a key
+
+        Returns:
+            The stored value, or None when missing or expired
+        """
+        value, age = self.get_with_age(key)
+        if value is None or (self.ttl_seconds is not None and age > self.ttl_seconds):
+            return None
+        return value
+
+    def get_with_age(self, key):
+        """
+        Look up a key regardless of expiry, so callers can serve stale values
+
+        Returns:
+            tuple: (value, age_seconds), or (None, None) when missing
+        """
+        with self._lock:
+            row = self._connect().execute(
+                f'SELECT value, created_at FROM {self.table} WHERE key = ?', (key,)
+            ).fetchone()
+
+            age = time.time() - row[1] if row is not None else None
+            if row is None or (self.ttl_seconds is not None and age > self.ttl_seconds):
+                self.misses += 1
+            else:
+                self.hits += 1
+
+            if row is None:
+                return None, None
+            return json.loads(row[0]), age
+
+    def put(self, key, value):
+        """Store a JSON-serializable value, replacing any previous one"""
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                f'INSERT OR REPLACE INTO {self.table} (key, value, created_at) VALUES (?, ?, ?)',
+                (key, json.dumps(value), time.time())
+            )
+            self.writes += 1
+            if self.writes % self.prune_every == 0:
+                self._prune(connection)
+            connection.commit()
+
+    def _prune(self, connection):
+        # Caller holds the lock; both deletes walk the created_at index
+        if self.ttl_seconds is not None:
+            cursor = connection.execute(
+                f'DELETE FROM {self.table} WHERE created_at < ?', (time.time() - self.ttl_seconds,)
+            )
+            self.expirations += cursor.rowcount
+        if self.max_rows is not None:
+            cursor = connection.execute(
+                f'DELETE FROM {self.table} WHERE key IN '
+                f'(SELECT key FROM {self.table} ORDER BY created_at DESC LIMIT -1 OFFSET ?)',
+                (self.max_rows,)
+            )
+            self.evictions += cursor.rowcount
+
+    def prune(self):
+        """Delete expired rows and the oldest rows beyond max_rows now"""
+        with self._lock:
+            connection = self._connect()
+            self._prune(connection)
+            connection.commit()
+
+    def delete(self, key):
+        """Remove a key if present"""
+        with self._lock:
+            connection = self._connect()
+            connection.execute(f'DELETE FROM {self.table} WHERE key = ?', (key,))
+            connection.commit()
+
+    def stats(self):
+        """
+        Snapshot of cache counters
+
+        Returns:
+            dict: Entry count and hit/miss/write/eviction counters
+        """
+        with self._lock:
+            size = self._connect().execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                'path': self.path,
+                'size': size,
+                'ttl_seconds': self.ttl_seconds,
+                'max_rows': self.max_rows,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'writes': self.writes,
+                'expirations': self.expirations,
+                'evictions': self.evictions
+            }
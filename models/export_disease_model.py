@@ -0,0 +1,89 @@
+"""
+Export the disease model checkpoint to TorchScript and/or ONNX
+The exports are served with DISEASE_BACKEND=torchscript or DISEASE_BACKEND=onnx
+and load without the pickled ResNet9 class. Each export is checked against
+the eager model before the tool exits:
+
+    python export_disease_model.py --format both
+"""
+import argparse
+import os
+import sys
+import time
+
+import torch
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from disease_backends import (
+    DISEASE_ONNX_MODEL, DISEASE_TORCHSCRIPT_MODEL,
+    export_onnx, export_torchscript, load_onnx, load_torchscript, onnxruntime_available
+)
+from image_preprocess import DISEASE_IMAGE_SIZE
+from services import DISEASE_MODEL_PATH, load_disease_checkpoint
+
+
+def time_per_batch(model, img_batch, repeat=5):
+    with torch.no_grad():
+        model(img_batch)
+        start_time = time.perf_counter()
+        for _ in range(repeat):
+            model(img_batch)
+    return (time.perf_counter() - start_time) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the disease model')
+    parser.add_argument('--checkpoint', default=DISEASE_MODEL_PATH, help='fp32 model checkpoint')
+    parser.add_argument('--format', choices=('torchscript', 'onnx', 'both'), default='both')
+    parser.add_argument('--torchscript-output', default=DISEASE_TORCHSCRIPT_MODEL)
+    parser.add_argument('--onnx-output', default=DISEASE_ONNX_MODEL)
+    parser.add_argument('--batch-size', type=int, default=8, help='Batch used to verify the exports')
+    args = parser.parse_args()
+
+    model = load_disease_checkpoint(args.checkpoint)
+    example_batch = torch.rand(1, 3, DISEASE_IMAGE_SIZE, DISEASE_IMAGE_SIZE)
+    check_batch = torch.rand(args.batch_size, 3, DISEASE_IMAGE_SIZE, DISEASE_IMAGE_SIZE)
+
+    exported = {}
+    if args.format in ('torchscript', 'both'):
+        export_torchscript(model, example_batch, args.torchscript_output)
+        exported['torchscript'] = lambda: load_torchscript(args.torchscript_output)
+        print(f"✓ TorchScript model saved to {args.torchscript_output}")
+
+    if args.format in ('onnx', 'both'):
+        export_onnx(model, example_batch, args.onnx_output)
+        print(f"✓ ONNX model saved to {args.onnx_output}")
+        if onnxruntime_available():
+            exported['onnx'] = lambda: load_onnx(args.onnx_output)
+        else:
+            print("✗ onnxruntime is not installed, skipping ONNX verification")
+
+    with torch.no_grad():
+        reference = model(check_batch)
+    eager_ms = time_per_batch(model, check_batch)
+
+    print("\n" + "=" * 60)
+    print(f" EXPORT CHECK (batch {args.batch_size}, {DISEASE_IMAGE_SIZE}x{DISEASE_IMAGE_SIZE})")
+    print("=" * 60)
+    print(f"{'backend':<14}{'max diff':>12}{'top-1 match':>14}{'ms/batch':>11}")
+    print(f"{'eager':<14}{0.0:>12.2e}{'-':>14}{eager_ms:>11.1f}")
+
+    failed = False
+    for name, load in exported.items():
+        backend = load()
+        with torch.no_grad():
+            output = backend(check_batch)
+        difference = float((output - reference).abs().max())
+        top1_match = bool((output.argmax(1) == reference.argmax(1)).all())
+        failed = failed or not top1_match
+        print(f"{name:<14}{difference:>12.2e}{str(top1_match):>14}{time_per_batch(backend, check_batch):>11.1f}")
+
+    if failed:
+        print("\n✗ An export does not match the eager model")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Local fake of the Gemini generateContent REST API
+Used to test the solution client and to stub Gemini in load tests:
+
+    python fake_gemini_server.py --port 8081 --delay 0.5
+    GEMINI_API_BASE=http://localhost:8081/v1beta python app.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from disease_solutions import offline_solution
+
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+
+        with server.lock:
+            server.requests += 1
+            server.api_keys.add(self.headers.get('x-goog-api-key'))
+            fail = server.fail_next > 0 or random.random() < server.failure_rate
+            if server.fail_next > 0:
+                server.fail_next -= 1
+
+        if server.delay:
+            time.sleep(server.delay)
+
+        if fail:
+            self._send_json(503, {'error': {'code': 503, 'message': 'The model is overloaded'}})
+            return
+
+        prompt = body['contents'][0]['parts'][0]['text']
+        if ':streamGenerateContent' in self.path:
+            self._send_stream(offline_solution(prompt))
+            return
+
+        self._send_json(200, {
+            'candidates': [{'content': {'parts': [{'text': offline_solution(prompt)}], 'role': 'model'}}]
+        })
+
+    def _send_stream(self, text):
+        # One SSE event per line of the answer, sent as HTTP chunks
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        for line in text.splitlines(keepends=True):
+            payload = {'candidates': [{'content': {'parts': [{'text': line}], 'role': 'model'}}]}
+            data = f'data: {json.dumps(payload)}\r\n\r\n'.encode()
+            self.wfile.write(f'{len(data):x}\r\n'.encode() + data + b'\r\n')
+            self.wfile.flush()
+            if self.server.stream_delay:
+                time.sleep(self.server.stream_delay)
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_fake_gemini_server(port=0, delay=0.0, failure_rate=0.0):
+    """
+    Start the fake server on a background thread
+
+    Args:
+        port: Port to bind on localhost (0 picks a free one)
+        delay: Seconds to wait before answering each request
+        failure_rate: Fraction of requests answered with HTTP 503
+
+    Returns:
+        ThreadingHTTPServer: Running server; base_url points at its /v1beta root
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), FakeGeminiHandler)
+    server.daemon_threads = True
+    server.delay = delay
+    server.stream_delay = 0.0
+    server.failure_rate = failure_rate
+    server.fail_next = 0
+    server.requests = 0
+    server.api_keys = set()
+    server.lock = threading.Lock()
+    server.base_url = f'http://127.0.0.1:{server.server_address[1]}/v1beta'
+    threading.Thread(target=server.serve_forever, name='fake-gemini', daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local fake Gemini API')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--delay', type=float, default=0.0, help='Seconds before each answer')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Fraction of requests answered with 503')
+    args = parser.parse_args()
+
+    server = start_fake_gemini_server(args.port, args.delay, args.failure_rate)
+    print(f"✓ Fake Gemini API listening on {server.base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,327 @@
+"""
+Flattened random forest predictor for the crop and fertilizer models
+Copies every tree of a fitted RandomForestClassifier into contiguous NumPy
+arrays and walks all trees for a whole batch at once, reproducing
+model.predict exactly without sklearn's per-call validation and joblib
+dispatch
+
+The arrays can be saved as plain .npy files and opened memory-mapped, so
+every worker process of a pre-fork server shares one page-cache copy
+"""
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+
+
+# Rows walked together; keeps the (trees, rows) working set in cache
+FLAT_FOREST_BLOCK_ROWS = int(os.getenv('FLAT_FOREST_BLOCK_ROWS', '256'))
+
+# Larger batches go to sklearn, whose compiled tree walk wins once its
+# fixed per-call overhead is amortised
+FLAT_FOREST_MAX_ROWS = int(os.getenv('FLAT_FOREST_MAX_ROWS', '512'))
+
+
+def _ordered_keys(values):
+    # Map float64 values to int64 keys with the same ordering
+    bits = values.view(np.int64)
+    return np.where(bits < 0, np.int64(-0x8000000000000000) - bits - 1, bits)
+
+
+def _from_ordered_keys(keys):
+    bits = np.where(keys < 0, np.int64(-0x8000000000000000) - keys - 1, keys)
+    return bits.view(np.float64)
+
+
+def fold_scaler_thresholds(thresholds, mean, scale):
+    """
+    Move split thresholds from scaled space back to raw feature space
+
+    The forest tests float32((x - mean) / scale) <= t. That expression is
+    monotonic in x, so the test is equivalent to x <= x_max for the largest
+    float64 x_max that still passes; x_max is found by bisection over the
+    ordered float64 bit patterns, which keeps the folded split bit-exact.
+
+    Args:
+        thresholds: Split thresholds of the scaled model
+        mean: Scaler mean for each threshold's feature
+        scale: Scaler scale for each threshold's feature
+
+    Returns:
+        np.ndarray: Raw-space thresholds (float64)
+    """
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+
+    def passes(x):
+        with np.errstate(over='ignore', invalid='ignore'):
+            scaled = ((x - mean) / scale).astype(np.float32)
+        return scaled.astype(np.float64) <= thresholds
+
+    max_finite = np.finfo(np.float64).max
+    low = _ordered_keys(np.full(thresholds.shape, -max_finite))
+    high = _ordered_keys(np.full(thresholds.shape, max_finite))
+
+    always = passes(_from_ordered_keys(high))
+    never = ~passes(_from_ordered_keys(low))
+
+    # Invariant: low passes, high fails
+    while True:
+        open_intervals = (high - 1 > low) & ~always & ~never
+        if not open_intervals.any():
+            break
+        # Overflow-free floor((low + high) / 2)
+        middle = (low >> 1) + (high >> 1) + (low & high & 1)
+        middle_passes = passes(_from_ordered_keys(middle))
+        low = np.where(open_intervals & middle_passes, middle, low)
+        high = np.where(open_intervals & ~middle_passes, middle, high)
+
+    folded = _from_ordered_keys(low)
+    folded = np.where(always, np.inf, folded)
+    return np.where(never, -np.inf, folded)
+
+
+# Arrays written by FlatForestClassifier.save, one .npy file each
+FLAT_FOREST_ARRAYS = ('feature', 'threshold', 'left', 'right', 'children', 'value', 'roots', 'classes')
+
+
+class FlatForestClassifier:
+    """
+    Array form of a fitted RandomForestClassifier
+
+    Nodes of all trees are concatenated into one set of arrays. Leaves point
+    to themselves, so a batch is evaluated with max_depth vectorized steps
+    over a (trees, rows) matrix of node indices.
+
+    Args:
+        model: Fitted sklearn RandomForestClassifier (single output)
+        scaler: Optional fitted StandardScaler applied before the forest;
+            its transform is folded into the split thresholds
+        block_rows: Rows walked together
+        max_rows: Batches larger than this are handed to model.predict
+    """
+
+    def __init__(self, model, scaler=None, block_rows=FLAT_FOREST_BLOCK_ROWS, max_rows=FLAT_FOREST_MAX_ROWS):
+        if getattr(model, 'n_outputs_', 1) != 1:
+            raise ValueError('Only single-output forests are supported')
+
+        self._model = model
+        self._scaler = scaler
+        self._model_loader = None
+        self._model_lock = threading.Lock()
+        self.scaler_folded = scaler is not None
+        self.memory_mapped = False
+        self.block_rows = max(1, int(block_rows))
+        self.max_rows = int(max_rows)
+        self.classes = np.asarray(model.classes_)
+        self.n_trees = len(model.estimators_)
+        self.n_features = model.n_features_in_
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            node_count = tree.node_count
+            node_ids = np.arange(offset, offset + node_count)
+            is_leaf = tree.children_left < 0
+
+            roots.append(offset)
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset))
+            rights.append(np.where(is_leaf, node_ids, tree.children_right + offset))
+
+            # Leaf class probabilities, normalised the way DecisionTreeClassifier.predict_proba does
+            value = tree.value[:, 0, :len(self.classes)].astype(np.float64)
+            normalizer = value.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(value / normalizer)
+
+            max_depth = max(max_depth, tree.max_depth)
+            offset += node_count
+
+        self.feature = np.concatenate(features).astype(np.intp)
+        self.threshold = np.concatenate(thresholds).astype(np.float64)
+        self.left = np.concatenate(lefts).astype(np.intp)
+        self.right = np.concatenate(rights).astype(np.intp)
+        # children[2 * node] is the left child, children[2 * node + 1] the right one
+        self.children = np.stack([self.left, self.right], axis=1).ravel()
+        self.value = np.ascontiguousarray(np.concatenate(values))
+        self.roots = np.asarray(roots, dtype=np.intp)
+        self.max_depth = max_depth
+
+        if scaler is not None:
+            internal = self.left != np.arange(offset)
+            mean = scaler.mean_ if scaler.with_mean else np.zeros(self.n_features)
+            scale = scaler.scale_ if scaler.with_std else np.ones(self.n_features)
+            self.threshold[internal] = fold_scaler_thresholds(
+                self.threshold[internal],
+                mean[self.feature[internal]],
+                scale[self.feature[internal]]
+            )
+
+    def save(self, directory):
+        """
+        Write the arrays as uncompressed .npy files plus a meta.json
+        The directory is written under a temporary name and renamed into
+        place, so readers never see a partial artifact. An existing
+        directory is left untouched: artifacts are immutable once written,
+        which keeps files that workers have memory-mapped from changing
+        under them.
+
+        Args:
+            directory: Target directory; should be unique per source model
+        """
+        if os.path.isdir(directory):
+            return
+
+        temp_directory = f'{directory}.tmp-{os.getpid()}'
+        os.makedirs(temp_directory, exist_ok=True)
+        try:
+            for name in FLAT_FOREST_ARRAYS:
+                np.save(os.path.join(temp_directory, f'{name}.npy'), np.ascontiguousarray(getattr(self, name)))
+            with open(os.path.join(temp_directory, 'meta.json'), 'w') as f:
+                json.dump({
+                    'n_trees': self.n_trees,
+                    'n_features': self.n_features,
+                    'max_depth': self.max_depth,
+                    'scaler_folded': self.scaler_folded
+                }, f)
+            os.rename(temp_directory, directory)
+        except OSError:
+            shutil.rmtree(temp_directory, ignore_errors=True)
+            # Another process finished the same artifact first
+            if not os.path.isdir(directory):
+                raise
+
+    @classmethod
+    def load(cls, directory, model_loader, mmap_mode='r', block_rows=FLAT_FOREST_BLOCK_ROWS,
+             max_rows=FLAT_FOREST_MAX_ROWS):
+        """
+        Open arrays written by save()
+
+        Args:
+            directory: Artifact directory
+            model_loader: Callable returning (sklearn model, scaler or None); only
+                called if a batch has to be handed to sklearn
+            mmap_mode: np.load mmap_mode; 'r' shares the pages between processes
+
+        Returns:
+            FlatForestClassifier
+        """
+        flat_forest = cls.__new__(cls)
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        for name in FLAT_FOREST_ARRAYS:
+            array = np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode)
+            # Plain ndarray views of the map; np.memmap results carry per-call overhead
+            setattr(flat_forest, name, array.view(np.ndarray))
+
+        flat_forest._model = None
+        flat_forest._scaler = None
+        flat_forest._model_loader = model_loader
+        flat_forest._model_lock = threading.Lock()
+        flat_forest.scaler_folded = meta['scaler_folded']
+        flat_forest.memory_mapped = mmap_mode is not None
+        flat_forest.n_trees = meta['n_trees']
+        flat_forest.n_features = meta['n_features']
+        flat_forest.max_depth = meta['max_depth']
+        flat_forest.block_rows = max(1, int(block_rows))
+        flat_forest.max_rows = int(max_rows)
+        return flat_forest
+
+    def _ensure_model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model, self._scaler = self._model_loader()
+
+    @property
+    def model(self):
+        """The source sklearn model, loaded on first use for memory-mapped forests"""
+        self._ensure_model()
+        return self._model
+
+    @property
+    def scaler(self):
+        """The folded StandardScaler, or None"""
+        if not self.scaler_folded:
+            return None
+        self._ensure_model()
+        return self._scaler
+
+    @property
+    def node_count(self):
+        return len(self.feature)
+
+    def _prepare(self, rows):
+        if self.scaler_folded:
+            # Folded thresholds are exact for float64 inputs
+            return np.asarray(rows, dtype=np.float64)
+        # sklearn trees compare float32 inputs against float64 thresholds
+        return np.asarray(rows, dtype=np.float32).astype(np.float64)
+
+    def predict_proba(self, rows):
+        """
+        Class probabilities for a batch
+
+        Args:
+            rows: Array-like of shape (n_samples, n_features)
+
+        Returns:
+            np.ndarray: (n_samples, n_classes) mean of the per-tree leaf probabilities
+        """
+        features = self._prepare(rows)
+        if features.ndim != 2 or features.shape[1] != self.n_features:
+            raise ValueError(f'Expected rows with {self.n_features} features, got shape {features.shape}')
+
+        proba = np.empty((len(features), len(self.classes)))
+        for start in range(0, len(features), self.block_rows):
+            block = features[start:start + self.block_rows]
+            proba[start:start + len(block)] = self._sum_leaf_proba(block)
+        proba /= self.n_trees
+        return proba
+
+    def _sum_leaf_proba(self, block):
+        flat = block.ravel()
+        row_offsets = np.arange(len(block)) * self.n_features
+        nodes = np.repeat(self.roots[:, np.newaxis], len(block), axis=1)
+
+        for _ in range(self.max_depth):
+            values = flat.take(row_offsets + self.feature.take(nodes))
+            go_right = values > self.threshold.take(nodes)
+            nodes = self.children.take(2 * nodes + go_right)
+
+        # Summing over the tree axis adds trees in estimator order, like
+        # RandomForestClassifier.predict_proba does
+        return np.add.reduce(self.value.take(nodes, axis=0), axis=0)
+
+    def predict(self, rows):
+        """
+        Predict class labels for a batch, identical to model.predict
+
+        Rows containing NaN or infinity are handed to the sklearn model,
+        which owns the missing-value semantics, as are batches above max_rows
+
+        Returns:
+            np.ndarray: Predicted labels
+        """
+        features = self._prepare(rows)
+        if len(features) > self.max_rows or not np.isfinite(features).all():
+            if self.scaler_folded:
+                return self.model.predict(self.scaler.transform(features))
+            return self.model.predict(features)
+        return self.classes.take(np.argmax(self.predict_proba(features), axis=1), axis=0)
+
+    def info(self):
+        return {
+            'trees': self.n_trees,
+            'nodes': self.node_count,
+            'max_depth': self.max_depth,
+            'max_rows': self.max_rows,
+            'scaler_folded': self.scaler_folded,
+            'memory_mapped': self.memory_mapped
+        }
@@ -0,0 +1,311 @@
+"""
+Gemini REST client for solution generation
+Pools HTTP connections per API key and protects the Flask workers with a
+bounded executor, admission control, deadlines and retries with backoff
+"""
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import requests
+
+
+GEMINI_API_BASE = os.getenv('GEMINI_API_BASE', 'https://generativelanguage.googleapis.com/v1beta')
+
+# Upstream calls running at once; further callers wait up to
+# GEMINI_QUEUE_TIMEOUT_SECONDS for a slot and are then rejected
+GEMINI_MAX_CONCURRENCY = int(os.getenv('GEMINI_MAX_CONCURRENCY', '8'))
+GEMINI_QUEUE_TIMEOUT_SECONDS = float(os.getenv('GEMINI_QUEUE_TIMEOUT_SECONDS', '1'))
+
+# Per-attempt HTTP timeout, overall deadline per call, and retry policy
+GEMINI_TIMEOUT_SECONDS = float(os.getenv('GEMINI_TIMEOUT_SECONDS', '15'))
+GEMINI_DEADLINE_SECONDS = float(os.getenv('GEMINI_DEADLINE_SECONDS', '30'))
+GEMINI_MAX_RETRIES = int(os.getenv('GEMINI_MAX_RETRIES', '2'))
+GEMINI_BACKOFF_SECONDS = float(os.getenv('GEMINI_BACKOFF_SECONDS', '0.5'))
+
+# Pooled sessions kept for distinct API keys; the least recently used one is
+# closed beyond this, since callers choose the key
+GEMINI_MAX_SESSIONS = int(os.getenv('GEMINI_MAX_SESSIONS', '64'))
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class GeminiError(Exception):
+    """Upstream call failed"""
+
+
+class GeminiBusyError(GeminiError):
+    """All upstream slots are taken; the caller should retry later"""
+
+
+class GeminiTimeoutError(GeminiError):
+    """The call did not finish within its deadline"""
+
+
+class GeminiClient:
+    """
+    Thread-safe client for the generateContent REST endpoint
+
+    One requests.Session (and so one keep-alive connection pool) is kept per
+    API key, so callers with different keys never race on global SDK state.
+    Calls run on a bounded thread pool; callers block for at most the
+    deadline and are rejected quickly when the pool is saturated.
+    """
+
+    def __init__(self, base_url=GEMINI_API_BASE, max_concurrency=GEMINI_MAX_CONCURRENCY,
+                 queue_timeout=GEMINI_QUEUE_TIMEOUT_SECONDS, timeout=GEMINI_TIMEOUT_SECONDS,
+                 deadline=GEMINI_DEADLINE_SECONDS, max_retries=GEMINI_MAX_RETRIES,
+                 backoff=GEMINI_BACKOFF_SECONDS, max_sessions=GEMINI_MAX_SESSIONS):
+        self.base_url = base_url.rstrip('/')
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.queue_timeout = queue_timeout
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_retries = max(0, int(max_retries))
+        self.backoff = backoff
+        self.max_sessions = max(1, int(max_sessions))
+        self._sessions = OrderedDict()
+        self._sessions_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='gemini')
+        self.requests_sent = 0
+        self.retries = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _session(self, api_key):
+        evicted = None
+        with self._sessions_lock:
+            session = self._sessions.get(api_key)
+            if session is not None:
+                self._sessions.move_to_end(api_key)
+                return session
+
+            session = requests.Session()
+            session.headers.update({
+                'x-goog-api-key': api_key,
+                'Content-Type': 'application/json'
+            })
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=self.max_concurrency)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._sessions[api_key] = session
+            if len(self._sessions) > self.max_sessions:
+                _, evicted = self._sessions.popitem(last=False)
+
+        if evicted is not None:
+            # Closes idle connections; ones still in use close when released
+            evicted.close()
+        return session
+
+    def _count(self, counter, amount=1):
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def submit(self, function, *args):
+        """
+        Run function(*args, deadline) on the upstream pool
+
+        Returns:
+            Future: Completes with the function result
+
+        Raises:
+            GeminiBusyError: No slot became free within queue_timeout
+        """
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self._reject()
+        return self._start(function, *args)
+
+    async def submit_async(self, function, *args):
+        """
+        submit() for asyncio callers: waits for a slot without blocking the
+        event loop, by polling the semaphore shared with the threaded callers
+
+        Returns:
+            Future: Completes with the function result
+
+        Raises:
+            GeminiBusyError: No slot became free within queue_timeout
+        """
+        give_up = time.monotonic() + self.queue_timeout
+        delay = 0.001
+        while not self._slots.acquire(blocking=False):
+            if time.monotonic() >= give_up:
+                self._reject()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.02)
+        return self._start(function, *args)
+
+    def _reject(self):
+        self._count('rejected')
+        raise GeminiBusyError('Solution service is busy, please retry shortly')
+
+    def _start(self, function, *args):
+        # Runs with a slot held; the slot is released when the call finishes
+        deadline = time.monotonic() + self.deadline
+        try:
+            future = self._executor.submit(function, *args, deadline)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def generate(self, prompt, api_key, model_name):
+        """
+        Generate text for a prompt, blocking the caller for at most the deadline
+
+        Returns:
+            str: Generated text
+        """
+        future = self.submit(self._generate, prompt, api_key, model_name)
+        try:
+            return future.result(timeout=self.deadline)
+        except FutureTimeoutError:
+            self._count('timeouts')
+            raise GeminiTimeoutError(f'Gemini did not answer within {self.deadline:.0f}s')
+
+    async def generate_async(self, prompt, api_key, model_name):
+        """Awaitable variant of generate() for asyncio servers"""
+        future = await self.submit_async(self._generate, prompt, api_key, model_name)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.deadline)
+        except asyncio.TimeoutError:
+            self._count('timeouts')
+            raise GeminiTimeoutError(f'Gemini did not answer within {self.deadline:.0f}s')
+
+    def stream(self, prompt, api_key, model_name):
+        """
+        Yield text chunks as Gemini produces them (streamGenerateContent over SSE)
+        Runs on the calling thread and holds one upstream slot until the
+        generator is exhausted or closed; retries only happen before the
+        first chunk
+
+        Yields:
+            str: Text chunk
+        """
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self._reject()
+
+        try:
+            deadline = time.monotonic() + self.deadline
+            response = self.request(
+                f'models/{model_name}:streamGenerateContent?alt=sse',
+                api_key,
+                {'contents': [{'parts': [{'text': prompt}]}]},
+                deadline,
+                stream=True
+            )
+            with response:
+                # chunk_size=None hands lines over as soon as they arrive
+                for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                    if time.monotonic() > deadline:
+                        self._count('timeouts')
+                        raise GeminiTimeoutError(f'Gemini did not finish within {self.deadline:.0f}s')
+                    if not line or not line.startswith('data:'):
+                        continue
+                    payload = json.loads(line[len('data:'):])
+                    if payload.get('candidates'):
+                        text = extract_text(payload)
+                        if text:
+                            yield text
+        finally:
+            self._slots.release()
+
+    def request(self, method_path, api_key, body, deadline, stream=False):
+        """
+        POST to a model method with retries and exponential backoff
+        Retries connection errors, timeouts and 408/429/5xx answers until the
+        retry budget or the deadline runs out
+
+        Args:
+            method_path: e.g. "models/gemini-2.5-flash-lite:generateContent"
+            api_key: Gemini API key
+            body: JSON request body
+            deadline: time.monotonic() value after which no attempt is started
+            stream: Keep the response open for incremental reading
+
+        Returns:
+            requests.Response: Successful response
+        """
+        session = self._session(api_key)
+        url = f'{self.base_url}/{method_path}'
+        attempt = 0
+
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._count('timeouts')
+                raise GeminiTimeoutError(f'Gemini did not answer within {self.deadline:.0f}s')
+
+            error = None
+            try:
+                self._count('requests_sent')
+                response = session.post(url, json=body, timeout=min(self.timeout, remaining), stream=stream)
+                if response.status_code < 400:
+                    return response
+                error = GeminiError(_error_message(response))
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    raise error
+                response.close()
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = GeminiError(f'Gemini request failed: {e}')
+
+            if attempt >= self.max_retries:
+                raise error
+
+            # Full jitter keeps many workers from retrying in lockstep
+            delay = random.uniform(0, self.backoff * (2 ** attempt))
+            if time.monotonic() + delay >= deadline:
+                raise error
+            attempt += 1
+            self._count('retries')
+            time.sleep(delay)
+
+    def _generate(self, prompt, api_key, model_name, deadline):
+        response = self.request(
+            f'models/{model_name}:generateContent',
+            api_key,
+            {'contents': [{'parts': [{'text': prompt}]}]},
+            deadline
+        )
+        return extract_text(response.json())
+
+    def stats(self):
+        """Upstream request counters"""
+        with self._sessions_lock:
+            pooled_api_keys = len(self._sessions)
+        with self._stats_lock:
+            return {
+                'max_concurrency': self.max_concurrency,
+                'pooled_api_keys': pooled_api_keys,
+                'max_sessions': self.max_sessions,
+                'requests_sent': self.requests_sent,
+                'retries': self.retries,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts
+            }
+
+
+def extract_text(payload):
+    """Concatenate the text parts of the first candidate in a generateContent response"""
+    candidates = payload.get('candidates') or []
+    if not candidates:
+        reason = (payload.get('promptFeedback') or {}).get('blockReason')
+        raise GeminiError(f'Gemini returned no answer{f" (blocked: {reason})" if reason else ""}')
+    parts = (candidates[0].get('content') or {}).get('parts') or []
+    return ''.join(part.get('text', '') for part in parts)
+
+
+def _error_message(response):
+    try:
+        message = response.json()['error']['message']
+    except (ValueError, KeyError, TypeError):
+        message = response.text[:200]
+    return f'Gemini returned HTTP {response.status_code}: {message}'
@@ -0,0 +1,136 @@
+"""
+Fast image decode and preprocessing for disease detection
+Produces the same (3, H, W) float tensor in [0, 1] as
+transforms.Compose([Resize((H, W)), ToTensor()]) while doing far less work
+on large phone photos
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import numpy as np
+import torch
+from PIL import Image
+
+
+# Side length of the square model input
+DISEASE_IMAGE_SIZE = int(os.getenv('DISEASE_IMAGE_SIZE', '256'))
+
+# Threads decoding uploads; PIL releases the GIL while decoding and resizing,
+# so these run in parallel with each other and with inference
+DISEASE_PREPROCESS_WORKERS = int(os.getenv('DISEASE_PREPROCESS_WORKERS', str(min(4, os.cpu_count() or 1))))
+
+# Images are first shrunk by an integer factor (JPEG DCT scaling or
+# Image.reduce) to at least this many times the target size, then resampled
+# with the same bilinear filter torchvision uses
+DISEASE_REDUCING_GAP = float(os.getenv('DISEASE_REDUCING_GAP', '2.0'))
+
+
+class ImagePreprocessor:
+    """
+    Decodes uploaded images straight to model-sized float tensors
+
+    - JPEGs are decoded with draft(), so libjpeg only decompresses at 1/2, 1/4
+      or 1/8 scale instead of producing the full 12 MP bitmap
+    - Other formats are shrunk with reduce-on-load (resize reducing_gap)
+    - The resized image is pasted into a preallocated per-thread uint8 buffer
+      that is shared with NumPy and torch, then converted to float in one pass
+    """
+
+    def __init__(self, size=DISEASE_IMAGE_SIZE, max_workers=DISEASE_PREPROCESS_WORKERS,
+                 reducing_gap=DISEASE_REDUCING_GAP):
+        self.size = (int(size), int(size)) if isinstance(size, (int, float)) else tuple(size)
+        self.max_workers = max(1, int(max_workers))
+        self.reducing_gap = reducing_gap
+        self._local = threading.local()
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _buffer(self):
+        # RGBA is one of the PIL modes whose storage can alias a NumPy array,
+        # so pasting into the image writes directly into the buffer
+        buffers = getattr(self._local, 'buffers', None)
+        if buffers is None:
+            width, height = self.size
+            array = np.zeros((height, width, 4), dtype=np.uint8)
+            image = Image.frombuffer('RGBA', self.size, array, 'raw', 'RGBA', 0, 1)
+            image.readonly = 0
+            buffers = self._local.buffers = (array, image)
+        return buffers
+
+    def decode(self, image_bytes):
+        """
+        Decode and resize an image to the model input size
+
+        Args:
+            image_bytes: Encoded image file bytes
+
+        Returns:
+            PIL.Image.Image: RGB image of exactly self.size
+        """
+        image = Image.open(BytesIO(image_bytes))
+
+        if image.format == 'JPEG':
+            # Picks the largest DCT scale that keeps the image >= size * gap
+            width, height = self.size
+            image.draft('RGB', (int(width * self.reducing_gap), int(height * self.reducing_gap)))
+
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        if image.size == self.size:
+            return image
+        return image.resize(self.size, Image.BILINEAR, reducing_gap=self.reducing_gap)
+
+    def preprocess(self, image_bytes, out=None):
+        """
+        Turn image bytes into a model input tensor
+
+        Args:
+            image_bytes: Encoded image file bytes
+            out: Optional (3, H, W) float tensor to write into, e.g. a
+                shared-memory slot of the inference pool
+
+        Returns:
+            torch.Tensor: Float tensor of shape (3, H, W) scaled to [0, 1]
+        """
+        array, canvas = self._buffer()
+        canvas.paste(self.decode(image_bytes))
+
+        # HWC uint8 view -> CHW float without an intermediate float copy
+        pixels = torch.from_numpy(array[:, :, :3]).permute(2, 0, 1)
+        width, height = self.size
+        img_tensor = out if out is not None else torch.empty((3, height, width), dtype=torch.float32)
+        img_tensor.copy_(pixels)
+        return img_tensor.div_(255.0)
+
+    def _ensure_executor(self):
+        # Threads do not survive fork, so a forked worker process starts its own pool
+        if self._executor is not None and self._pid == os.getpid():
+            return self._executor
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix='disease-preprocess'
+                )
+                self._pid = os.getpid()
+        return self._executor
+
+    def submit(self, image_bytes, out=None):
+        """
+        Preprocess on the decode thread pool
+
+        Returns:
+            Future: Resolves to the tensor returned by preprocess()
+        """
+        return self._ensure_executor().submit(self.preprocess, image_bytes, out)
+
+    def shutdown(self, wait=True):
+        """Stop this process's decode pool after the queued images are done"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None and self._pid == os.getpid():
+            executor.shutdown(wait=wait)
@@ -0,0 +1,512 @@
+"""
+Load generator for a running ML API (app.py, serve.py or asgi_app.py)
+Replays a weighted endpoint mix, mostly /predict_crop and /predict_price with
+periodic bursts of /predict_disease photo uploads, and steps the offered
+load to find where latency breaks down:
+
+    python load_test.py --spawn-server --server-args "--workers 2" --rates 25,50,100,200,400
+    python load_test.py --url http://127.0.0.1:5000 --mode closed --users 1,4,16,64
+
+Open mode (default) sends Poisson arrivals at each rate in --rates; latency
+is measured from the scheduled arrival, so a slow server cannot hide its
+queueing by slowing the client down. Closed mode runs --users clients, each
+sending its next request after the previous answer and an exponential think time.
+
+Disease uploads come from the images in --images (JPEG/PNG), or from seeded
+synthetic leaf photos. Gemini is always a local fake: with --spawn-server it
+is started here and the server is pointed at it; for a server started by hand,
+--fake-gemini-port starts it and prints the GEMINI_API_BASE to use.
+
+Every step reports achieved throughput, p50/p95/p99 overall and per endpoint
+and errors; the saturation point is the first step where an endpoint's p99
+exceeds its --slo-ms, throughput falls below 90% of the offered rate, or
+the error rate exceeds 1%.
+"""
+import argparse
+import json
+import os
+import shlex
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(BASE_DIR)
+
+from benchmark import FERTILIZER_CSV, crop_rows, leaf_images
+from fake_gemini_server import start_fake_gemini_server
+
+DEFAULT_MIX = 'crop=0.45,price=0.35,fertilizer=0.1,disease=0.08,solution=0.02'
+
+# p99 latency per endpoint beyond which a step counts as saturated
+DEFAULT_SLOS = 'crop=200,price=200,fertilizer=200,disease=3000,solution=5000'
+
+# Used when the price encoder cannot be read
+FALLBACK_COMMODITIES = ['Tomato Big(Nepali)', 'Potato Red', 'Onion Dry (Indian)', 'Cauli Local', 'Cabbage(Local)']
+
+SOLUTION_DISEASES = [
+    'Tomato___Late_blight', 'Potato___Early_blight', 'Apple___Apple_scab',
+    'Corn_(maize)___Common_rust_', 'Grape___Black_rot', 'Tomato___healthy'
+]
+
+
+def parse_mix(text):
+    """
+    Parse "crop=0.5,price=0.3,..." into normalized endpoint weights
+
+    Returns:
+        dict: Endpoint name -> probability
+    """
+    weights = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f'Unknown endpoint "{name}". Valid values: {", ".join(ENDPOINTS)}')
+        weights[name] = float(weight)
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError('Mix weights must add up to more than 0')
+    return {name: weight / total for name, weight in weights.items() if weight > 0}
+
+
+def parse_slos(text):
+    """
+    Parse "crop=200,disease=3000,..." (or one number for every endpoint) into p99 limits in ms
+
+    Returns:
+        dict: Endpoint name -> milliseconds
+    """
+    if '=' not in text:
+        return {name: float(text) for name in ENDPOINTS}
+    slos = {}
+    for part in text.split(','):
+        name, _, milliseconds = part.partition('=')
+        if name.strip() not in ENDPOINTS:
+            raise ValueError(f'Unknown endpoint "{name.strip()}". Valid values: {", ".join(ENDPOINTS)}')
+        slos[name.strip()] = float(milliseconds)
+    return slos
+
+
+def load_images(directory, count, seed):
+    """Image bytes from a sample folder, or seeded synthetic leaf photos"""
+    if directory:
+        paths = sorted(
+            os.path.join(root, name)
+            for root, _, names in os.walk(directory)
+            for name in names if name.lower().endswith(('.jpg', '.jpeg', '.png'))
+        )
+        if not paths:
+            raise ValueError(f'No JPEG or PNG images found in {directory}')
+        images = []
+        for path in paths[:count]:
+            with open(path, 'rb') as f:
+                images.append((os.path.basename(path), f.read()))
+        return images
+    return [(f'leaf-{index}.jpg', image) for index, image in enumerate(leaf_images(count, seed))]
+
+
+def fertilizer_requests():
+    """Fertilizer request bodies straight from the CSV, soil and crop types as names"""
+    import pandas as pd
+
+    frame = pd.read_csv(FERTILIZER_CSV)
+    frame.columns = [column.strip() for column in frame.columns]
+    return [
+        {
+            'temp': record['Temparature'], 'humidity': record['Humidity'], 'moisture': record['Moisture'],
+            'soil_type': record['Soil Type'], 'crop_type': record['Crop Type'],
+            'nitrogen': record['Nitrogen'], 'potassium': record['Potassium'], 'phosphorus': record['Phosphorous']
+        }
+        for record in frame.to_dict('records')
+    ]
+
+
+def price_commodities():
+    try:
+        import joblib
+        from price_forecast import known_commodities
+
+        encoder = joblib.load(os.path.join(BASE_DIR, 'models', 'commodity_target_encoder_updated.pkl'))
+        return known_commodities(encoder)
+    except Exception as e:
+        print(f"✗ Could not read commodities from the price encoder ({e}); using a fixed list")
+        return FALLBACK_COMMODITIES
+
+
+class Payloads:
+    """Seeded request payloads for every endpoint in the mix"""
+
+    def __init__(self, images, seed):
+        self.rng = np.random.default_rng(seed)
+        self.crop = crop_rows(5000, seed)
+        self.fertilizer = fertilizer_requests()
+        self.commodities = price_commodities()
+        self.images = images
+        self.lock = threading.Lock()
+
+    def pick(self, items):
+        with self.lock:
+            return items[int(self.rng.integers(len(items)))]
+
+    def price(self):
+        with self.lock:
+            year = int(self.rng.integers(2024, 2030))
+            month = int(self.rng.integers(1, 13))
+        return {'commodity': self.pick(self.commodities), 'date': f'{year}-{month:02d}-15'}
+
+
+def _send_crop(session, url, payloads):
+    return session.post(f'{url}/predict_crop', json=payloads.pick(payloads.crop), timeout=60)
+
+
+def _send_price(session, url, payloads):
+    return session.post(f'{url}/predict_price', json=payloads.price(), timeout=60)
+
+
+def _send_fertilizer(session, url, payloads):
+    return session.post(f'{url}/predict_fertilizer', json=payloads.pick(payloads.fertilizer), timeout=60)
+
+
+def _send_disease(session, url, payloads):
+    filename, image = payloads.pick(payloads.images)
+    return session.post(f'{url}/predict_disease', files={'image': (filename, image, 'image/jpeg')}, timeout=60)
+
+
+def _send_solution(session, url, payloads):
+    body = {'disease_name': payloads.pick(SOLUTION_DISEASES), 'api_key': 'load-test'}
+    return session.post(f'{url}/get_disease_solution', json=body, timeout=60)
+
+
+ENDPOINTS = {
+    'crop': _send_crop,
+    'price': _send_price,
+    'fertilizer': _send_fertilizer,
+    'disease': _send_disease,
+    'solution': _send_solution,
+}
+
+
+class Recorder:
+    """Thread-safe (endpoint, status, latency) records for one load step"""
+
+    def __init__(self):
+        self.records = []
+        self.lock = threading.Lock()
+
+    def add(self, endpoint, status, seconds):
+        with self.lock:
+            self.records.append((endpoint, status, seconds))
+
+    def summary(self, elapsed, offered_rate=None, slos=None):
+        """
+        Latency percentiles, throughput and errors for the step
+
+        Returns:
+            dict: Overall and per-endpoint statistics
+        """
+        with self.lock:
+            records = list(self.records)
+
+        def stats(selected):
+            latencies = np.asarray([seconds for _, status, seconds in selected if status == 200]) * 1000
+            errors = {}
+            for _, status, _ in selected:
+                if status != 200:
+                    errors[str(status)] = errors.get(str(status), 0) + 1
+            result = {
+                'requests': len(selected),
+                'ok': int(len(latencies)),
+                'errors': errors,
+                'throughput_per_s': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+            }
+            if len(latencies):
+                result.update({
+                    'p50_ms': round(float(np.percentile(latencies, 50)), 2),
+                    'p95_ms': round(float(np.percentile(latencies, 95)), 2),
+                    'p99_ms': round(float(np.percentile(latencies, 99)), 2),
+                })
+            return result
+
+        summary = stats(records)
+        summary['endpoints'] = {
+            endpoint: stats([record for record in records if record[0] == endpoint])
+            for endpoint in sorted({record[0] for record in records})
+        }
+
+        reasons = []
+        for endpoint, stats in summary['endpoints'].items():
+            limit = (slos or {}).get(endpoint)
+            if limit is not None and stats.get('p99_ms', float('inf')) > limit:
+                reasons.append(f'{endpoint} p99 above {limit:g} ms')
+        if offered_rate and summary['throughput_per_s'] < 0.9 * offered_rate:
+            reasons.append('throughput below 90% of offered load')
+        if summary['requests'] and sum(summary['errors'].values()) / summary['requests'] > 0.01:
+            reasons.append('error rate above 1%')
+        summary['saturated'] = reasons
+        return summary
+
+
+def _sender(url, payloads, recorder):
+    local = threading.local()
+
+    def send(endpoint, scheduled_at):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        try:
+            status = ENDPOINTS[endpoint](session, url, payloads).status_code
+        except requests.RequestException as e:
+            status = type(e).__name__
+        recorder.add(endpoint, status, time.perf_counter() - scheduled_at)
+
+    return send
+
+
+def arrival_schedule(rate, seconds, mix, rng, burst_every=0.0, burst_size=0):
+    """
+    Poisson arrivals for one open-loop step, plus disease upload bursts
+
+    Returns:
+        list: (offset in seconds, endpoint) sorted by offset
+    """
+    names = list(mix)
+    probabilities = [mix[name] for name in names]
+    arrivals = []
+    offset = rng.exponential(1.0 / rate)
+    while offset < seconds:
+        arrivals.append((offset, names[rng.choice(len(names), p=probabilities)]))
+        offset += rng.exponential(1.0 / rate)
+    if burst_every > 0 and burst_size > 0:
+        for burst_at in np.arange(burst_every, seconds, burst_every):
+            arrivals.extend((float(burst_at), 'disease') for _ in range(burst_size))
+    return sorted(arrivals)
+
+
+def run_open_step(url, payloads, rate, seconds, mix, rng, max_in_flight, burst_every, burst_size, slos):
+    recorder = Recorder()
+    send = _sender(url, payloads, recorder)
+    slots = threading.BoundedSemaphore(max_in_flight)
+    schedule = arrival_schedule(rate, seconds, mix, rng, burst_every, burst_size)
+    max_lag = 0.0
+
+    def send_and_release(endpoint, scheduled_at):
+        try:
+            send(endpoint, scheduled_at)
+        finally:
+            slots.release()
+
+    with ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='load') as executor:
+        start = time.perf_counter()
+        for offset, endpoint in schedule:
+            scheduled_at = start + offset
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                max_lag = max(max_lag, -delay)
+            # Never queue behind a full client: count it instead
+            if not slots.acquire(blocking=False):
+                recorder.add(endpoint, 'client_overflow', 0.0)
+                continue
+            executor.submit(send_and_release, endpoint, scheduled_at)
+    elapsed = max(seconds, time.perf_counter() - start)
+
+    offered = len(schedule) / seconds
+    summary = recorder.summary(elapsed, offered, slos)
+    summary.update({'offered_rate': round(offered, 2), 'dispatch_lag_ms': round(max_lag * 1000, 2)})
+    if max_lag > 0.05:
+        print(f"✗ The load generator fell {max_lag * 1000:.0f} ms behind its schedule; "
+              "results at this rate are limited by the client")
+    return summary
+
+
+def run_closed_step(url, payloads, users, seconds, mix, seed, think_ms, slos):
+    recorder = Recorder()
+    send = _sender(url, payloads, recorder)
+    names = list(mix)
+    probabilities = [mix[name] for name in names]
+    stop_at = time.perf_counter() + seconds
+
+    def user(index):
+        rng = np.random.default_rng([seed, index])
+        while time.perf_counter() < stop_at:
+            send(names[rng.choice(len(names), p=probabilities)], time.perf_counter())
+            if think_ms > 0:
+                time.sleep(rng.exponential(think_ms / 1000.0))
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=user, args=(index,)) for index in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    summary = recorder.summary(time.perf_counter() - start, None, slos)
+    summary['users'] = users
+    return summary
+
+
+def warm_up(url, payloads, mix, requests_per_endpoint=5):
+    """A few unrecorded requests per endpoint, so lazy loads do not land in the first step"""
+    session = requests.Session()
+    for endpoint in mix:
+        for _ in range(requests_per_endpoint):
+            try:
+                ENDPOINTS[endpoint](session, url, payloads)
+            except requests.RequestException:
+                pass
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def spawn_server(server_args, gemini_base_url):
+    """Start serve.py on a free local port against the fake Gemini API"""
+    port = free_port()
+    command = [sys.executable, os.path.join(BASE_DIR, 'serve.py'), '--bind', f'127.0.0.1:{port}']
+    command += shlex.split(server_args)
+    env = dict(os.environ, PYTHONWARNINGS='ignore', GEMINI_API_BASE=gemini_base_url, GEMINI_CLIENT='')
+    server = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return server, f'http://127.0.0.1:{port}'
+
+
+def wait_until_ready(url, timeout=180):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f'{url}/ready', timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f'{url} did not become ready within {timeout}s')
+
+
+def print_step(label, summary):
+    errors = sum(summary['errors'].values())
+    line = (f"{label:>10}{summary['throughput_per_s']:>10.1f}{summary.get('p50_ms', float('nan')):>10.1f}"
+            f"{summary.get('p95_ms', float('nan')):>10.1f}{summary.get('p99_ms', float('nan')):>10.1f}{errors:>8}")
+    endpoints = '  '.join(
+        f"{name} p99 {stats.get('p99_ms', float('nan')):.0f}" for name, stats in summary['endpoints'].items()
+    )
+    print(f"{line}  {endpoints}{'  ← ' + ', '.join(summary['saturated']) if summary['saturated'] else ''}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the ML API with a realistic endpoint mix')
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='Base URL of a running server')
+    parser.add_argument('--spawn-server', action='store_true', help='Start serve.py locally against a fake Gemini')
+    parser.add_argument('--server-args', default='', help='Extra serve.py arguments with --spawn-server')
+    parser.add_argument('--fake-gemini-port', type=int, help='Start the fake Gemini API on this port')
+    parser.add_argument('--gemini-delay', type=float, default=0.5, help='Seconds the fake Gemini takes per answer')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Endpoint weights (default: {DEFAULT_MIX})')
+    parser.add_argument('--images', help='Folder of sample leaf photos (default: synthetic)')
+    parser.add_argument('--mode', choices=('open', 'closed'), default='open')
+    parser.add_argument('--rates', default='10,25,50,100,200', help='Open mode: offered requests/s per step')
+    parser.add_argument('--users', default='1,4,16,64', help='Closed mode: concurrent clients per step')
+    parser.add_argument('--think-ms', type=float, default=0.0, help='Closed mode: mean think time between requests')
+    parser.add_argument('--step-seconds', type=float, default=20.0)
+    parser.add_argument('--max-in-flight', type=int, default=256, help='Open mode: client concurrency limit')
+    parser.add_argument('--disease-burst-every', type=float, default=10.0,
+                        help='Open mode: seconds between disease upload bursts (0 disables)')
+    parser.add_argument('--disease-burst-size', type=int, default=16)
+    parser.add_argument('--slo-ms', default=DEFAULT_SLOS,
+                        help=f'p99 limits per endpoint, or one value for all (default: {DEFAULT_SLOS})')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the latency-vs-load curve as JSON')
+    parser.add_argument('--stop-after-saturation', type=int, default=1,
+                        help='Saturated steps to run before stopping (0 runs every step)')
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    slos = parse_slos(args.slo_ms)
+    payloads = Payloads(load_images(args.images, 64, args.seed), args.seed)
+
+    gemini = None
+    server = None
+    url = args.url.rstrip('/')
+    if args.spawn_server:
+        gemini = start_fake_gemini_server(0, args.gemini_delay)
+        server, url = spawn_server(args.server_args, gemini.base_url)
+        print(f"✓ Started serve.py {args.server_args} at {url} (fake Gemini at {gemini.base_url})")
+    elif args.fake_gemini_port:
+        gemini = start_fake_gemini_server(args.fake_gemini_port, args.gemini_delay)
+        print(f"✓ Fake Gemini API on {gemini.base_url}; start the server with GEMINI_API_BASE={gemini.base_url}")
+
+    steps = []
+    try:
+        wait_until_ready(url)
+        warm_up(url, payloads, mix)
+        print(f"Mix: {', '.join(f'{name} {share:.0%}' for name, share in mix.items())}")
+        label = 'offered/s' if args.mode == 'open' else 'users'
+        print(f"{label:>10}{'ok/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+
+        levels = args.rates if args.mode == 'open' else args.users
+        saturated_steps = 0
+        rng = np.random.default_rng(args.seed)
+        for level in (float(value) for value in levels.split(',')):
+            if args.mode == 'open':
+                summary = run_open_step(url, payloads, level, args.step_seconds, mix, rng, args.max_in_flight,
+                                        args.disease_burst_every, args.disease_burst_size, slos)
+                print_step(f'{level:g}', summary)
+            else:
+                summary = run_closed_step(url, payloads, int(level), args.step_seconds, mix, args.seed,
+                                          args.think_ms, slos)
+                print_step(f'{int(level)}', summary)
+            steps.append(summary)
+            if summary['saturated']:
+                saturated_steps += 1
+                if args.stop_after_saturation and saturated_steps >= args.stop_after_saturation:
+                    break
+    finally:
+        if server is not None:
+            server.send_signal(signal.SIGTERM)
+            server.wait(60)
+        if gemini is not None:
+            gemini.shutdown()
+
+    saturation = next((step for step in steps if step['saturated']), None)
+    healthy = [step for step in steps if not step['saturated']]
+    print()
+    if saturation is None:
+        print("✓ Not saturated at any step; raise --rates/--users to find the limit")
+    else:
+        level = saturation.get('offered_rate', saturation.get('users'))
+        print(f"✗ Saturated at {level:g} {'requests/s offered' if args.mode == 'open' else 'users'}: "
+              f"{', '.join(saturation['saturated'])}")
+    if healthy:
+        best = max(healthy, key=lambda step: step['throughput_per_s'])
+        print(f"✓ Highest sustainable throughput: {best['throughput_per_s']:.1f} requests/s "
+              f"(p99 {best.get('p99_ms', float('nan')):.1f} ms)")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'url': url,
+                'mode': args.mode,
+                'mix': mix,
+                'server_args': args.server_args if args.spawn_server else None,
+                'step_seconds': args.step_seconds,
+                'slo_ms': slos,
+                'steps': steps,
+                'saturation': saturation and {
+                    'level': saturation.get('offered_rate', saturation.get('users')),
+                    'reasons': saturation['saturated']
+                },
+                'max_sustainable_throughput': max((step['throughput_per_s'] for step in healthy), default=None)
+            }, f, indent=2)
+        print(f"✓ Curve written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+"""
+Latency histograms and counters in the Prometheus text format
+Hot paths only take a timestamp and bump a bucket; everything else (cache,
+model and queue statistics) is read from its owner when /metrics is scraped
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+
+import structured_logging
+
+
+log = structured_logging.get_logger(__name__)
+
+# METRICS_ENABLED=0 turns every timer into a no-op
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1').lower() in ('1', 'true', 'yes')
+
+# Upper bounds in seconds; single-row tabular predictions take well under a
+# millisecond, disease uploads and Gemini calls up to seconds
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    Monotonic counter with a fixed set of label names
+
+    Args:
+        name: Metric name, ending in _total
+        documentation: HELP text
+        labelnames: Label names; inc() takes the values in the same order
+    """
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            (self.name, tuple(zip(self.labelnames, labelvalues)), value)
+            for labelvalues, value in values
+        ]
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labelvalues', 'start')
+
+    def __init__(self, histogram, labelvalues):
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labelvalues)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Histogram:
+    """
+    Latency histogram with fixed buckets and a fixed set of label names
+    Bucket counts are kept per bucket and only made cumulative on render
+
+    Args:
+        name: Metric name, usually ending in _seconds
+        documentation: HELP text
+        labelnames: Label names; observe() takes the values in the same order
+        buckets: Sorted upper bounds; +Inf is implied
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(float(bound) for bound in buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                # Bucket counts, then the +Inf bucket, then the sum
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def time(self, *labelvalues):
+        """
+        Context manager observing the time spent in its block
+
+        Returns:
+            Timer, or a no-op when METRICS_ENABLED is off
+        """
+        if not METRICS_ENABLED:
+            return _NULL_TIMER
+        return _Timer(self, labelvalues)
+
+    def samples(self):
+        with self._lock:
+            series = sorted((labelvalues, list(values)) for labelvalues, values in self._series.items())
+
+        samples = []
+        for labelvalues, values in series:
+            labels = tuple(zip(self.labelnames, labelvalues))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), values[:-1]):
+                cumulative += count
+                samples.append((f'{self.name}_bucket', labels + (('le', _format_value(bound)),), cumulative))
+            samples.append((f'{self.name}_sum', labels, values[-1]))
+            samples.append((f'{self.name}_count', labels, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """
+    Metrics exposed on /metrics
+    Collectors are callables returning (name, kind, documentation, samples)
+    tuples, with samples as (labels dict, value) pairs; they run only when
+    the registry is rendered
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self):
+        """
+        Render every metric in the Prometheus text exposition format
+
+        Returns:
+            str: Exposition text
+        """
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors)
+
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+
+        for collector in collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                # One failing source must not hide the others
+                log.error('Metrics collector %s failed: %s', getattr(collector, '__name__', collector), e)
+                continue
+            for name, kind, documentation, samples in families:
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples:
+                    if value is None:
+                        continue
+                    lines.append(f'{name}{_format_labels(sorted(labels.items()))} {_format_value(value)}')
+
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+request_latency = registry.histogram(
+    'ml_request_duration_seconds',
+    'Time from request start to response, per endpoint and status',
+    ('endpoint', 'method', 'status')
+)
+stage_latency = registry.histogram(
+    'ml_stage_duration_seconds',
+    'Time per request stage: parse, preprocess, inference, serialize',
+    ('endpoint', 'stage')
+)
+request_errors = registry.counter(
+    'ml_request_errors_total',
+    'Responses with a 4xx or 5xx status',
+    ('endpoint', 'status')
+)
+
+
+def stage(endpoint, name):
+    """
+    Time one stage of a request
+
+        with metrics.stage('/predict_crop', 'inference'):
+            prediction = model.predict(features)
+
+    Args:
+        endpoint: Route the stage belongs to, e.g. '/predict_crop'
+        name: parse, preprocess, inference or serialize
+    """
+    return stage_latency.time(endpoint, name)
+
+
+def observe_request(endpoint, method, status, seconds):
+    """Record one finished request and count it as an error when status >= 400"""
+    if not METRICS_ENABLED:
+        return
+    request_latency.observe(seconds, endpoint, method, str(status))
+    if status >= 400:
+        request_errors.inc(endpoint, str(status))
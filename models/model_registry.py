@@ -0,0 +1,276 @@
+"""
+Thread-safe registry for model artifacts
+Loads each artifact exactly once and hot-swaps it when its files change on disk
+"""
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime
+
+import structured_logging
+
+
+log = structured_logging.get_logger(__name__)
+
+
+class _ModelEntry:
+    """Bookkeeping for one registered model"""
+
+    def __init__(self, name, paths, loader):
+        self.name = name
+        self.paths = list(paths)
+        self.loader = loader
+        self.lock = threading.Lock()
+        self.artifacts = None
+        self.version = 0
+        self.fingerprint = None
+        self.pending_fingerprint = None
+        # Files whose reload failed; not loaded again until they change
+        self.failed_fingerprint = None
+        self.loaded_at = None
+        self.load_seconds = None
+        self.next_check = 0.0
+        self.reloading = False
+        self.last_error = None
+        self.load_failures = 0
+
+
+class ModelRegistry:
+    """
+    Registry of lazily loaded model artifacts
+
+    get() uses double-checked locking so concurrent first requests share a
+    single load. After that, get() cheaply checks the artifact files at most
+    once per check_interval seconds; once they changed and then look the same
+    on the next check, the new version is loaded on a background thread and
+    swapped in atomically while requests keep being served from the old one.
+    Waiting for the files to settle keeps a model whose files are replaced one
+    after another (a classifier and its scaler) from being loaded half updated.
+    """
+
+    def __init__(self, check_interval=5.0):
+        self.check_interval = check_interval
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._swap_listeners = []
+
+    def register(self, name, paths, loader):
+        """
+        Register a model
+
+        Args:
+            name: Registry key, e.g. 'crop'
+            paths: Artifact files that make up the model
+            loader: Callable receiving the paths and returning the loaded artifacts
+        """
+        with self._lock:
+            self._entries[name] = _ModelEntry(name, paths, loader)
+
+    def add_swap_listener(self, callback):
+        """
+        Call callback(name, version) every time a new version of a model is swapped in
+        Used to invalidate anything derived from the old artifacts
+        """
+        with self._lock:
+            self._swap_listeners.append(callback)
+
+    def get(self, name):
+        """
+        Return the loaded artifacts for a model, loading them on first use
+
+        Args:
+            name: Registry key
+
+        Returns:
+            Whatever the model's loader returned
+        """
+        entry = self._entries[name]
+        artifacts = entry.artifacts
+
+        if artifacts is None:
+            with entry.lock:
+                if entry.artifacts is None:
+                    entry.artifacts = self._load(entry)
+                return entry.artifacts
+
+        if self.check_interval > 0 and time.monotonic() >= entry.next_check:
+            self._check_for_update(entry)
+
+        return artifacts
+
+    def reload(self, name, force=False):
+        """
+        Reload a model synchronously if its files changed (or always when forced)
+        The old artifacts keep serving until the new ones are fully loaded
+
+        Returns:
+            bool: True when a new version was swapped in
+        """
+        entry = self._entries[name]
+
+        with entry.lock:
+            if entry.reloading:
+                return False
+            if not force and entry.artifacts is not None and self._fingerprint(entry.paths) == entry.fingerprint:
+                return False
+            entry.reloading = True
+
+        return self._swap(entry)
+
+    def version(self, name):
+        """Return the version of the currently served artifacts (0 when not loaded yet)"""
+        return self._entries[name].version
+
+    def artifact_tag(self, name):
+        """
+        Stable identifier of the artifact files, built from their paths,
+        modification times and sizes, for keying persistent caches
+        Uses the files currently served once the model is loaded, and the
+        files on disk before that, so the model never has to be loaded just
+        to build a cache key (e.g. when inference runs in other processes)
+
+        Returns:
+            str: Tag
+
+        Raises:
+            OSError: The model is not loaded and an artifact file is missing
+        """
+        entry = self._entries[name]
+        fingerprint = entry.fingerprint
+        if fingerprint is None:
+            fingerprint = self._fingerprint(entry.paths)
+        paths = hashlib.blake2b('\0'.join(entry.paths).encode(), digest_size=4).hexdigest()
+        return paths + '-' + '-'.join(f'{mtime_ns}.{size}' for mtime_ns, size in fingerprint)
+
+    def info(self):
+        """
+        Describe every registered model
+
+        Returns:
+            dict: Per-model version, load time and artifact files
+        """
+        with self._lock:
+            entries = list(self._entries.values())
+
+        return {
+            entry.name: {
+                'loaded': entry.artifacts is not None,
+                'version': entry.version,
+                'loaded_at': entry.loaded_at,
+                'load_seconds': entry.load_seconds,
+                'files': [os.path.basename(path) for path in entry.paths],
+                'last_error': entry.last_error,
+                'load_failures': entry.load_failures
+            }
+            for entry in entries
+        }
+
+    @staticmethod
+    def _fingerprint(paths):
+        fingerprint = []
+        for path in paths:
+            stat = os.stat(path)
+            fingerprint.append((stat.st_mtime_ns, stat.st_size))
+        return tuple(fingerprint)
+
+    def _read(self, entry, attempts=3):
+        """
+        Run the entry's loader, again if any artifact file was replaced while
+        it ran, so the files it returns were all on disk together
+
+        Returns:
+            tuple: (artifacts, fingerprint of the files loaded, load seconds)
+        """
+        for _ in range(attempts):
+            fingerprint = self._fingerprint(entry.paths)
+            start = time.perf_counter()
+            artifacts = entry.loader(*entry.paths)
+            load_seconds = round(time.perf_counter() - start, 4)
+            if self._fingerprint(entry.paths) == fingerprint:
+                return artifacts, fingerprint, load_seconds
+        raise RuntimeError(f'{entry.name} model files kept changing while loading')
+
+    def _load(self, entry):
+        try:
+            artifacts, fingerprint, load_seconds = self._read(entry)
+        except Exception:
+            entry.load_failures += 1
+            raise
+
+        entry.fingerprint = fingerprint
+        entry.load_seconds = load_seconds
+        entry.loaded_at = datetime.now().isoformat(timespec='seconds')
+        entry.version += 1
+        entry.last_error = None
+        entry.next_check = time.monotonic() + self.check_interval
+        return artifacts
+
+    def _check_for_update(self, entry):
+        with entry.lock:
+            if entry.reloading or time.monotonic() < entry.next_check:
+                return
+            entry.next_check = time.monotonic() + self.check_interval
+
+            try:
+                fingerprint = self._fingerprint(entry.paths)
+            except OSError:
+                # File is being replaced right now, look again on the next check
+                return
+            if fingerprint == entry.fingerprint or fingerprint == entry.failed_fingerprint:
+                entry.pending_fingerprint = None
+                return
+            if fingerprint != entry.pending_fingerprint:
+                # Still being written, or only some files replaced so far:
+                # swap once the files look the same on the next check
+                entry.pending_fingerprint = fingerprint
+                return
+            entry.pending_fingerprint = None
+            entry.reloading = True
+
+        threading.Thread(
+            target=self._swap,
+            args=(entry,),
+            name=f'model-reload-{entry.name}',
+            daemon=True
+        ).start()
+
+    def _swap(self, entry):
+        attempted = None
+        try:
+            attempted = self._fingerprint(entry.paths)
+            artifacts, fingerprint, load_seconds = self._read(entry)
+        except Exception as e:
+            # Keep serving the previous version; the failed files are only
+            # retried once their fingerprint changes again
+            try:
+                failed_fingerprint = attempted if self._fingerprint(entry.paths) == attempted else None
+            except OSError:
+                failed_fingerprint = None
+            with entry.lock:
+                entry.failed_fingerprint = failed_fingerprint
+                entry.last_error = str(e)
+                entry.load_failures += 1
+                entry.reloading = False
+            log.error('Reloading %s model failed, keeping version %s: %s', entry.name, entry.version, e)
+            return False
+
+        with entry.lock:
+            entry.artifacts = artifacts
+            entry.fingerprint = fingerprint
+            entry.failed_fingerprint = None
+            entry.load_seconds = load_seconds
+            entry.loaded_at = datetime.now().isoformat(timespec='seconds')
+            entry.version += 1
+            entry.last_error = None
+            entry.reloading = False
+
+        log.info('%s model hot-swapped to version %s in %.3fs', entry.name, entry.version, load_seconds,
+                 extra={'model': entry.name, 'version': entry.version, 'load_seconds': load_seconds})
+
+        for callback in list(self._swap_listeners):
+            try:
+                callback(entry.name, entry.version)
+            except Exception:
+                log.exception('Swap listener for %s model failed', entry.name)
+        return True
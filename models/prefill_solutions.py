@@ -0,0 +1,65 @@
+"""
+Pre-fill the persistent disease solution cache for every disease class
+Run once after deploying (or after bumping SOLUTION_PROMPT_VERSION) so no
+farmer waits on a Gemini call:
+
+    python prefill_solutions.py [--api-key KEY] [--refresh] [--workers 4]
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services import DISEASE_CLASS_NAMES, format_disease_name, solution_service
+
+
+def main():
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--api-key', default=os.getenv('GEMINI_API_KEY'), help='Gemini API key (defaults to GEMINI_API_KEY)')
+    parser.add_argument('--refresh', action='store_true', help='Regenerate solutions that are already cached')
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent Gemini requests')
+    args = parser.parse_args()
+
+    diseases = sorted({
+        format_disease_name(name)
+        for name in DISEASE_CLASS_NAMES.values()
+        if 'healthy' not in name.lower()
+    })
+
+    print("=" * 60)
+    print(f" PRE-FILLING SOLUTION CACHE ({len(diseases)} diseases)")
+    print("=" * 60)
+
+    def prefill(disease):
+        if not args.refresh and solution_service.get_cached(disease) is not None:
+            return disease, 'cached', 0.0
+        start_time = time.perf_counter()
+        try:
+            solution_service.get_solution(disease, args.api_key, refresh=args.refresh)
+        except Exception as e:
+            return disease, f'failed: {e}', time.perf_counter() - start_time
+        return disease, 'generated', time.perf_counter() - start_time
+
+    failures = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        for disease, status, elapsed in executor.map(prefill, diseases):
+            failures += status.startswith('failed')
+            marker = '❌' if status.startswith('failed') else '✅'
+            print(f"{marker} {disease}: {status} ({elapsed:.2f}s)")
+
+    print("\n" + "=" * 60)
+    print(f" Done: {len(diseases) - failures} ready, {failures} failed")
+    print("=" * 60)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+"""
+Precomputed price forecast table
+Runs the price model once in bulk for every commodity known to the target
+encoder over a year/month horizon, so single predictions become array lookups
+"""
+import numpy as np
+import pandas as pd
+
+
+def known_commodities(encoder):
+    """
+    List the commodities the target encoder was fitted on
+
+    Args:
+        encoder: Fitted category_encoders TargetEncoder for the Commodity column
+
+    Returns:
+        list: Commodity names in encoder order
+    """
+    mapping = encoder.ordinal_encoder.mapping[0]['mapping']
+    return [commodity for commodity in mapping.index if isinstance(commodity, str)]
+
+
+def commodity_encoding(encoder):
+    """
+    Flatten the fitted target encoder into a plain dict
+
+    Args:
+        encoder: Fitted category_encoders TargetEncoder for the Commodity column
+
+    Returns:
+        tuple: (encoding, unknown_value) where encoding maps Commodity to
+        Commodity_enc and unknown_value is what the encoder yields for
+        unseen commodities
+    """
+    ordinal_mapping = encoder.ordinal_encoder.mapping[0]['mapping']
+    target_mapping = encoder.mapping['Commodity']
+
+    encoding = {
+        commodity: float(target_mapping[ordinal])
+        for commodity, ordinal in ordinal_mapping.items()
+        if isinstance(commodity, str)
+    }
+    return encoding, float(target_mapping[-1])
+
+
+class PricePredictor:
+    """
+    Pandas-free single-row price prediction
+    Encodes the commodity with a dict lookup, builds a float32 feature row
+    and calls the booster directly
+    """
+
+    def __init__(self, model, encoder):
+        self.encoding, self.unknown_value = commodity_encoding(encoder)
+        self.booster = model.get_booster()
+        self.missing = model.missing
+
+        # Same tree range XGBRegressor.predict uses (best_iteration when
+        # trained with early stopping, otherwise every tree)
+        try:
+            best_iteration = model.best_iteration
+        except AttributeError:
+            best_iteration = None
+        self.iteration_range = (0, best_iteration + 1) if best_iteration is not None else (0, 0)
+
+    def encode(self, commodity):
+        """Return Commodity_enc for a commodity name"""
+        try:
+            return self.encoding.get(commodity, self.unknown_value)
+        except TypeError:
+            return self.unknown_value
+
+    def predict_rows(self, features):
+        """
+        Run the booster on a (rows, 3) float32 matrix of year, month, Commodity_enc
+
+        Returns:
+            numpy.ndarray: Rounded expm1 prices as float64
+        """
+        prediction = self.booster.inplace_predict(
+            features,
+            iteration_range=self.iteration_range,
+            missing=self.missing,
+            validate_features=False
+        )
+        return np.round(np.expm1(prediction).astype(np.float64))
+
+    def predict_series(self, commodities, years, months):
+        """
+        Predict every commodity for every (year, month) period in one booster call
+
+        Args:
+            commodities: List of commodity names
+            years: Year of each period
+            months: Month of each period
+
+        Returns:
+            numpy.ndarray: Rounded prices of shape (commodities, periods)
+        """
+        features = self.series_features(commodities, years, months)
+        return self.predict_rows(features).reshape(len(commodities), len(years))
+
+    def series_features(self, commodities, years, months):
+        """
+        Feature matrix for predict_series, commodity-major
+
+        Returns:
+            numpy.ndarray: float32 matrix of shape (commodities * periods, 3)
+        """
+        periods = len(years)
+        features = np.empty((len(commodities) * periods, 3), dtype=np.float32)
+        features[:, 0] = np.tile(years, len(commodities))
+        features[:, 1] = np.tile(months, len(commodities))
+        features[:, 2] = np.repeat([self.encode(commodity) for commodity in commodities], periods)
+        return features
+
+    def predict(self, commodity, year, month):
+        """
+        Predict the price of one commodity for one month
+
+        Returns:
+            float: Rounded price in NPR
+        """
+        return self.predict_rows(self.features(commodity, year, month))[0]
+
+    def features(self, commodity, year, month):
+        """Single (1, 3) float32 feature row for predict_rows"""
+        return np.array([[year, month, self.encode(commodity)]], dtype=np.float32)
+
+
+class PriceForecastTable:
+    """
+    Dense (commodity, month) table of predicted prices
+
+    Prices are stored already expm1-transformed and rounded, exactly as
+    predict_price returns them, in a float32 array of shape
+    (commodities, months in horizon).
+    """
+
+    def __init__(self, commodities, start_year, end_year, prices, model_version=None):
+        self.commodities = list(commodities)
+        self.start_year = start_year
+        self.end_year = end_year
+        self.prices = prices
+        self.model_version = model_version
+        self._index = {commodity: row for row, commodity in enumerate(self.commodities)}
+
+    @classmethod
+    def build(cls, model, encoder, start_year, end_year, model_version=None):
+        """
+        Predict every commodity for every month from January of start_year
+        to December of end_year with a single model.predict call
+
+        Args:
+            model: Fitted XGBoost price model
+            encoder: Fitted commodity target encoder
+            start_year: First year of the horizon
+            end_year: Last year of the horizon (inclusive)
+            model_version: Registry version of the model the table is built from
+
+        Returns:
+            PriceForecastTable
+        """
+        commodities = known_commodities(encoder)
+        encoded = encoder.transform(pd.DataFrame({'Commodity': commodities}))
+        encoded = np.asarray(encoded, dtype=np.float64).ravel()
+
+        years = np.arange(start_year, end_year + 1, dtype=np.int64)
+        months = np.arange(1, 13, dtype=np.int64)
+        periods = len(years) * len(months)
+
+        # Rows are ordered commodity-major so the predictions reshape
+        # straight into (commodity, period)
+        input_data = pd.DataFrame({
+            'year': np.tile(np.repeat(years, len(months)), len(commodities)),
+            'month': np.tile(months, len(years) * len(commodities)),
+            'Commodity_enc': np.repeat(encoded, periods)
+        })
+
+        prediction = model.predict(input_data[['year', 'month', 'Commodity_enc']])
+        prices = np.round(np.expm1(prediction).astype(np.float64)).astype(np.float32)
+
+        return cls(commodities, start_year, end_year, prices.reshape(len(commodities), periods), model_version)
+
+    def lookup(self, commodity, year, month):
+        """
+        Look up a precomputed price
+
+        Returns:
+            float: Predicted price, or None when outside the table
+        """
+        row = self._index.get(commodity)
+        if row is None or not (self.start_year <= year <= self.end_year):
+            return None
+        return float(self.prices[row, (year - self.start_year) * 12 + month - 1])
+
+    def __len__(self):
+        return self.prices.size
+
+    def info(self):
+        """Describe the table size and horizon"""
+        return {
+            'commodities': len(self.commodities),
+            'start_year': self.start_year,
+            'end_year': self.end_year,
+            'entries': len(self),
+            'bytes': int(self.prices.nbytes),
+            'model_version': self.model_version
+        }
@@ -0,0 +1,316 @@
+"""
+Opt-in profiling of single requests
+A request carrying the admin token in an X-Profile header (or ?profile=<token>)
+is profiled on its own thread with a stack sampler or cProfile, together with
+the torch operators it runs, and the result is written to a rotating directory:
+
+    PROFILE_DIR/<time>-<endpoint>-<id>/
+        python.folded     sampled Python stacks (flamegraph.pl, speedscope)
+        python.pstats     cProfile statistics (snakeviz, flameprof, pstats)
+        torch_ops.txt     torch operator table sorted by self CPU time
+        torch_trace.json  torch operator timeline (chrome://tracing, Perfetto)
+        torch.folded      torch operator stacks (flamegraph.pl, speedscope)
+        meta.json         endpoint, status and wall time
+
+With PROFILE_TOKEN unset nothing is registered, so unprofiled requests pay nothing
+"""
+import cProfile
+import hmac
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+import structured_logging
+
+
+log = structured_logging.get_logger(__name__)
+
+# Admin secret; profiling is off unless it is set
+PROFILE_TOKEN = os.getenv('PROFILE_TOKEN', '')
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles'))
+# Newest profiles kept; older ones are deleted when a new one is written
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', '50'))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', '1'))
+PROFILE_TORCH = os.getenv('PROFILE_TORCH', '1').lower() in ('1', 'true', 'yes')
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_MODE_HEADER = 'X-Profile-Mode'
+PROFILE_MODES = ('sample', 'cprofile')
+
+# torch.profiler and the samplers are process-wide, so one request is
+# profiled at a time; concurrent flagged requests run unprofiled
+_profile_lock = threading.Lock()
+_local = threading.local()
+
+
+def enabled():
+    """Whether PROFILE_TOKEN is set"""
+    return bool(PROFILE_TOKEN)
+
+
+def is_active():
+    """Whether the current thread is serving a profiled request"""
+    return getattr(_local, 'active', False)
+
+
+def token_matches(token):
+    """Constant-time comparison of a request's token with PROFILE_TOKEN"""
+    if not PROFILE_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode())
+
+
+class StackSampler:
+    """
+    Samples the Python stack of one thread at a fixed interval and counts
+    identical stacks, which is the folded format flamegraph tools read
+
+    Args:
+        thread_id: threading.get_ident() of the thread to sample
+        interval: Seconds between samples
+    """
+
+    def __init__(self, thread_id, interval=PROFILE_SAMPLE_INTERVAL_MS / 1000.0):
+        self.thread_id = thread_id
+        self.interval = max(0.0001, interval)
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        # The sampler needs the GIL to take a sample; by default a busy thread
+        # only gives it up every 5 ms, so switch at the sampling interval
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self._switch_interval, self.interval))
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            sys.setswitchinterval(self._switch_interval)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.counts[';'.join(reversed(stack))] += 1
+
+    def folded(self):
+        """
+        Returns:
+            str: One "root;...;leaf count" line per distinct stack
+        """
+        return ''.join(f'{stack} {count}\n' for stack, count in self.counts.most_common())
+
+
+class RequestProfile:
+    """
+    Profiles the calling thread from start() to stop()
+
+    Args:
+        endpoint: Route label, used in the profile directory name
+        mode: 'sample' (stack sampler) or 'cprofile'
+        torch_ops: Also record torch operators with torch.profiler
+    """
+
+    def __init__(self, endpoint, mode='sample', torch_ops=PROFILE_TORCH):
+        self.endpoint = endpoint
+        self.mode = mode if mode in PROFILE_MODES else 'sample'
+        self.torch_ops = torch_ops
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{_slug(endpoint)}-{uuid.uuid4().hex[:8]}"
+        self._python = None
+        self._torch = None
+        self._start = None
+        self._wall = None
+
+    def start(self):
+        if self.torch_ops:
+            try:
+                import torch
+                import torch.profiler
+                # export_stacks() only writes stacks recorded in verbose mode
+                self._torch = torch.profiler.profile(
+                    activities=[torch.profiler.ProfilerActivity.CPU],
+                    with_stack=True,
+                    experimental_config=torch._C._profiler._ExperimentalConfig(verbose=True)
+                )
+                self._torch.__enter__()
+            except Exception as e:
+                log.warning('torch.profiler unavailable, profiling Python only: %s', e)
+                self._torch = None
+
+        if self.mode == 'cprofile':
+            self._python = cProfile.Profile()
+            self._python.enable()
+        else:
+            self._python = StackSampler(threading.get_ident())
+            self._python.start()
+
+        _local.active = True
+        self._start = time.perf_counter()
+
+    def stop(self):
+        if self._start is None or self._wall is not None:
+            return
+        self._wall = time.perf_counter() - self._start
+        _local.active = False
+
+        if self.mode == 'cprofile':
+            self._python.disable()
+        else:
+            self._python.stop()
+        if self._torch is not None:
+            self._torch.__exit__(None, None, None)
+
+    def save(self, directory=PROFILE_DIR, **meta):
+        """
+        Write the profile files and delete profiles beyond PROFILE_KEEP
+
+        Args:
+            directory: Parent directory of the profile directories
+            **meta: Extra fields for meta.json, e.g. status
+
+        Returns:
+            str: Path of the profile directory
+        """
+        path = os.path.join(directory, self.id)
+        os.makedirs(path, exist_ok=True)
+
+        if self.mode == 'cprofile':
+            self._python.dump_stats(os.path.join(path, 'python.pstats'))
+        else:
+            with open(os.path.join(path, 'python.folded'), 'w') as f:
+                f.write(self._python.folded())
+
+        # with_stack also records Python frames; only write torch files when operators ran
+        if self._torch is not None and any(not event.is_python_function for event in self._torch.events()):
+            averages = self._torch.key_averages()
+            with open(os.path.join(path, 'torch_ops.txt'), 'w') as f:
+                f.write(averages.table(sort_by='self_cpu_time_total', row_limit=50))
+            self._torch.export_chrome_trace(os.path.join(path, 'torch_trace.json'))
+            self._torch.export_stacks(os.path.join(path, 'torch.folded'), 'self_cpu_time_total')
+
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({
+                'id': self.id,
+                'endpoint': self.endpoint,
+                'mode': self.mode,
+                'wall_ms': self._wall * 1000.0 if self._wall is not None else None,
+                'sample_interval_ms': PROFILE_SAMPLE_INTERVAL_MS if self.mode == 'sample' else None,
+                'torch_ops': self._torch is not None,
+                **meta
+            }, f, indent=2)
+
+        rotate(directory)
+        return path
+
+
+def _slug(endpoint):
+    return endpoint.strip('/').replace('/', '_').replace('<', '').replace('>', '') or 'root'
+
+
+def rotate(directory=PROFILE_DIR, keep=PROFILE_KEEP):
+    """Delete the oldest profile directories so that at most `keep` remain"""
+    try:
+        names = sorted(
+            name for name in os.listdir(directory)
+            if os.path.isdir(os.path.join(directory, name))
+        )
+    except FileNotFoundError:
+        return
+    for name in names[:max(0, len(names) - keep)]:
+        shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+def begin(endpoint, mode='sample'):
+    """
+    Start profiling the current request unless another one is being profiled
+
+    Returns:
+        RequestProfile, or None when a profile is already running
+    """
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    try:
+        profile = RequestProfile(endpoint, mode)
+        profile.start()
+    except Exception:
+        _profile_lock.release()
+        raise
+    return profile
+
+
+def finish(profile, **meta):
+    """
+    Stop a profile started by begin(), write it and let the next one start
+
+    Returns:
+        str: Profile id, or None if writing failed
+    """
+    try:
+        profile.stop()
+        profile.save(**meta)
+        return profile.id
+    except Exception:
+        log.exception('Error writing profile %s', profile.id)
+        return None
+    finally:
+        _profile_lock.release()
+
+
+def install(app, endpoint_label):
+    """
+    Register request hooks on a Flask app when PROFILE_TOKEN is set
+
+    Args:
+        app: Flask application
+        endpoint_label: Callable returning the current route label
+    """
+    if not enabled():
+        return
+
+    from flask import g, request
+
+    @app.before_request
+    def start_request_profile():
+        token = request.headers.get(PROFILE_HEADER)
+        mode = request.headers.get(PROFILE_MODE_HEADER)
+        if token is None and b'profile=' in request.query_string:
+            token = request.args.get('profile')
+            mode = mode or request.args.get('profile_mode')
+        if not token_matches(token):
+            return
+        g.request_profile = begin(endpoint_label(), (mode or 'sample').lower())
+        g.request_profile_busy = g.request_profile is None
+
+    @app.after_request
+    def save_request_profile(response):
+        profile = g.pop('request_profile', None)
+        if profile is not None:
+            profile_id = finish(profile, status=response.status_code, method=request.method)
+            if profile_id is not None:
+                response.headers['X-Profile-Id'] = profile_id
+        elif g.pop('request_profile_busy', False):
+            response.headers['X-Profile-Id'] = 'busy'
+        return response
+
+    @app.teardown_request
+    def release_request_profile(exc):
+        # after_request is skipped when a view raises
+        profile = g.pop('request_profile', None)
+        if profile is not None:
+            finish(profile, error=str(exc) if exc else None)
+
+    log.info('Request profiling enabled, profiles are written to %s', PROFILE_DIR)
@@ -0,0 +1,174 @@
+"""
+Build the INT8 disease model and report its accuracy against fp32
+Calibrates static quantization on a folder of leaf photos, saves the
+quantized graph for DISEASE_BACKEND=int8 and compares fp32, channels_last
+and INT8 on an evaluation folder laid out like the training data
+(one sub-folder per DISEASE_CLASS_NAMES class):
+
+    python quantize_disease_model.py --calibration-dir data/valid --eval-dir data/test
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import torch
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from disease_backends import DISEASE_INT8_MODEL, load_int8, quantize_static, save_int8, to_channels_last
+from services import (
+    DISEASE_CLASS_NAMES, DISEASE_MODEL_PATH, _disease_transform,
+    load_disease_checkpoint, preprocess_disease_image
+)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+def list_images(image_dir):
+    """
+    Find images below image_dir
+
+    Returns:
+        list: (path, class index or None) pairs; the class comes from the parent folder name
+    """
+    class_indices = {name: index for index, name in DISEASE_CLASS_NAMES.items()}
+    images = []
+    for root, _, files in os.walk(image_dir):
+        label = class_indices.get(os.path.basename(root))
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                images.append((os.path.join(root, name), label))
+    return sorted(images)
+
+
+def load_batches(images, batch_size, transform):
+    """Yield (tensor batch, labels) using the serving preprocessing"""
+    for start in range(0, len(images), batch_size):
+        chunk = images[start:start + batch_size]
+        tensors = []
+        for path, _ in chunk:
+            with open(path, 'rb') as f:
+                tensors.append(preprocess_disease_image(f.read(), transform))
+        yield torch.stack(tensors), [label for _, label in chunk]
+
+
+def predict_all(model, batches):
+    predictions = []
+    seconds = 0.0
+    with torch.no_grad():
+        for img_batch, _ in batches:
+            start_time = time.perf_counter()
+            predictions.extend(model(img_batch).argmax(1).tolist())
+            seconds += time.perf_counter() - start_time
+    return predictions, seconds
+
+
+def state_size_mb(model):
+    total = 0
+    for tensor in list(model.state_dict().values()):
+        if isinstance(tensor, torch.Tensor):
+            total += tensor.numel() * tensor.element_size()
+    return total / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Quantize the disease model to INT8')
+    parser.add_argument('--checkpoint', default=DISEASE_MODEL_PATH, help='fp32 model checkpoint')
+    parser.add_argument('--calibration-dir', required=True, help='Folder of representative leaf photos')
+    parser.add_argument('--eval-dir', help='Labelled evaluation folder (default: calibration folder)')
+    parser.add_argument('--calibration-images', type=int, default=512, help='Images sampled for calibration')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--output', default=DISEASE_INT8_MODEL, help='Where to write the INT8 model')
+    parser.add_argument('--report', help='Write the parity report as JSON to this path')
+    args = parser.parse_args()
+
+    transform = _disease_transform()
+    model = load_disease_checkpoint(args.checkpoint)
+
+    calibration_images = list_images(args.calibration_dir)
+    if not calibration_images:
+        print(f"✗ No images found in {args.calibration_dir}")
+        sys.exit(1)
+    random.Random(0).shuffle(calibration_images)
+    calibration_images = calibration_images[:args.calibration_images]
+
+    print(f"Calibrating on {len(calibration_images)} images...")
+    quantized = quantize_static(
+        model,
+        (img_batch for img_batch, _ in load_batches(calibration_images, args.batch_size, transform))
+    )
+    example_batch, _ = next(load_batches(calibration_images[:1], 1, transform))
+    save_int8(quantized, example_batch, args.output)
+    print(f"✓ INT8 model saved to {args.output}")
+
+    eval_images = list_images(args.eval_dir or args.calibration_dir)
+    if not args.eval_dir:
+        print("✗ No --eval-dir given; evaluating on the calibration folder overstates parity")
+    batches = list(load_batches(eval_images, args.batch_size, transform))
+    labels = [label for _, batch_labels in batches for label in batch_labels]
+
+    backends = {
+        'fp32': model,
+        'channels_last': to_channels_last(model),
+        'int8': load_int8(args.output)
+    }
+    results = {name: predict_all(backend, batches) for name, backend in backends.items()}
+    reference, _ = results['fp32']
+
+    report = {
+        'images': len(eval_images),
+        'labelled_images': sum(label is not None for label in labels),
+        'backends': {},
+        'per_class': {}
+    }
+
+    print("\n" + "=" * 72)
+    print(f" PARITY REPORT ({len(eval_images)} images)")
+    print("=" * 72)
+    print(f"{'backend':<16}{'accuracy':>10}{'agreement':>11}{'img/s':>10}{'size MB':>10}")
+
+    for name, (predictions, seconds) in results.items():
+        labelled = [(p, l) for p, l in zip(predictions, labels) if l is not None]
+        accuracy = sum(p == l for p, l in labelled) / len(labelled) if labelled else None
+        agreement = sum(p == r for p, r in zip(predictions, reference)) / len(reference)
+        size_mb = (
+            os.path.getsize(args.output) / 1e6 if name == 'int8' else state_size_mb(backends[name])
+        )
+        report['backends'][name] = {
+            'accuracy': accuracy,
+            'agreement_with_fp32': agreement,
+            'images_per_second': len(predictions) / seconds if seconds else None,
+            'size_mb': round(size_mb, 2)
+        }
+        accuracy_text = f"{accuracy:.4f}" if accuracy is not None else 'n/a'
+        print(f"{name:<16}{accuracy_text:>10}{agreement:>11.4f}{len(predictions) / seconds:>10.1f}{size_mb:>10.1f}")
+
+    # Per-class accuracy on the 38 classes, fp32 vs INT8
+    int8_predictions, _ = results['int8']
+    for index, class_name in DISEASE_CLASS_NAMES.items():
+        rows = [i for i, label in enumerate(labels) if label == index]
+        if not rows:
+            continue
+        report['per_class'][class_name] = {
+            'images': len(rows),
+            'fp32_accuracy': sum(reference[i] == index for i in rows) / len(rows),
+            'int8_accuracy': sum(int8_predictions[i] == index for i in rows) / len(rows)
+        }
+
+    if report['per_class']:
+        print(f"\n{'class':<52}{'n':>6}{'fp32':>8}{'int8':>8}")
+        for class_name, row in report['per_class'].items():
+            print(f"{class_name[:51]:<52}{row['images']:>6}{row['fp32_accuracy']:>8.3f}{row['int8_accuracy']:>8.3f}")
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✓ Report written to {args.report}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+In-memory response cache with LRU eviction and a TTL
+Used in front of the deterministic prediction functions in services.py
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Bounded, thread-safe LRU cache whose entries expire after ttl_seconds
+
+    Hit, miss, eviction and invalidation counters are kept so the cache can be
+    sized from production traffic. A max_entries of 0 disables caching.
+    """
+
+    def __init__(self, name, max_entries=10000, ttl_seconds=3600):
+        self.name = name
+        self.max_entries = max(0, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def generation(self):
+        """Counter bumped by clear(); pass it to put() to drop values computed before a clear"""
+        return self._generation
+
+    def get(self, key):
+        """
+        Look up a key
+
+        Returns:
+            tuple: (found, value)
+        """
+        if not self.max_entries:
+            return False, None
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return False, None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def put(self, key, value, generation=None):
+        """
+        Store a value, evicting the least recently used entries when full
+        Values computed before the last clear() (older generation) are dropped
+        """
+        if not self.max_entries:
+            return
+
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached value for key, or compute and cache it
+
+        Args:
+            key: Hashable cache key
+            compute: Zero-argument callable producing the value on a miss
+
+        Returns:
+            The cached or freshly computed value
+        """
+        found, value = self.get(key)
+        if found:
+            return value
+
+        generation = self.generation
+        value = compute()
+        self.put(key, value, generation)
+        return value
+
+    def clear(self):
+        """Drop every entry, e.g. after the underlying model was swapped"""
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            self.invalidations += 1
+
+    def stats(self):
+        """
+        Snapshot of cache counters
+
+        Returns:
+            dict: Size, limits and hit/miss/eviction counters
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations
+            }
@@ -73,8 +73,13 @@ model_dir = r"C:\Users\isang\Desktop\TBD\models\models"
 model_path = os.path.join(model_dir, "fertilizer_recomendation_model.pkl")
 scaler_path = os.path.join(model_dir, "fertilizer_recomendation_scaler.pkl")
 
-joblib.dump(classifier, model_path)
-joblib.dump(scaler, scaler_path)
+# Write both to temp files first, then rename them back to back, so a running
+# server that hot-reloads models never sees a half-written pickle; it swaps
+# the pair in once both files have settled
+for obj, path in ((scaler, scaler_path), (classifier, model_path)):
+    joblib.dump(obj, path + ".tmp")
+for path in (scaler_path, model_path):
+    os.replace(path + ".tmp", path)
 
 print(f"\n✓ Saved model to: {model_path}")
 print(f"✓ Saved scaler to: {scaler_path}")
@@ -83,4 +88,4 @@ print("\n" + "=" * 60)
 print("✅ Model retraining complete!")
 print("=" * 60)
 print("\nThe new model and scaler are compatible with your current")
-print("scikit-learn version. Restart the Flask server to use them.")
+print("scikit-learn version. A running Flask server picks them up automatically.")
@@ -0,0 +1,165 @@
+"""
+Production entry point for the ML API: a pre-fork gunicorn server
+
+The master process loads every model before forking, so worker processes
+share the model pages copy-on-write (and the memory-mapped artifacts through
+the page cache). Each worker is limited to its share of the CPU cores for
+torch, OpenMP, MKL and OpenBLAS, so N workers do not start N x cores threads:
+
+    python serve.py --workers 4 --threads 4 --bind 0.0.0.0:5000
+
+SIGTERM shuts down gracefully: workers stop accepting connections, finish
+in-flight requests and drain the disease batch queue within
+--graceful-timeout seconds. SIGINT/SIGQUIT stop immediately. Model files
+replaced on disk are still picked up by each worker's model registry.
+
+`python app.py` still runs the single-process development server.
+"""
+import argparse
+import os
+import sys
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Variables read by the native thread pools when the libraries load, so they
+# must be set before torch, NumPy or XGBoost are imported
+THREAD_LIMIT_ENV_VARS = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS')
+
+
+def available_cpus():
+    """CPU cores this process may run on (respects taskset/cgroup cpusets)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def parse_args(argv=None):
+    cpus = available_cpus()
+    parser = argparse.ArgumentParser(description='Serve the ML API with pre-forked gunicorn workers')
+    parser.add_argument('--bind', default=os.getenv('SERVE_BIND', '0.0.0.0:5000'),
+                        help='Address to listen on, host:port or unix:/path')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('SERVE_WORKERS', str(cpus))),
+                        help='Worker processes (default: one per CPU core)')
+    parser.add_argument('--threads', type=int, default=int(os.getenv('SERVE_THREADS', '4')),
+                        help='Request threads per worker')
+    parser.add_argument('--torch-threads', type=int, default=int(os.getenv('SERVE_TORCH_THREADS', '0')),
+                        help='Torch/OpenMP/MKL threads per worker (default: CPU cores / workers)')
+    parser.add_argument('--timeout', type=int, default=int(os.getenv('SERVE_TIMEOUT', '60')),
+                        help='Seconds a silent worker may take before it is restarted')
+    parser.add_argument('--graceful-timeout', type=int, default=int(os.getenv('SERVE_GRACEFUL_TIMEOUT', '30')),
+                        help='Seconds workers get to finish in-flight requests on shutdown')
+    parser.add_argument('--no-preload', action='store_true',
+                        help='Load models in each worker instead of once before fork')
+    args = parser.parse_args(argv)
+
+    args.workers = max(1, args.workers)
+    args.threads = max(1, args.threads)
+    if args.torch_threads <= 0:
+        args.torch_threads = max(1, cpus // args.workers)
+    return args
+
+
+def limit_native_threads(threads):
+    """Cap the OpenMP/MKL/OpenBLAS pools and the exported disease backends at `threads`"""
+    for name in THREAD_LIMIT_ENV_VARS:
+        os.environ[name] = str(threads)
+    os.environ.setdefault('DISEASE_INTRA_OP_THREADS', str(threads))
+
+
+def preload_models():
+    """
+    Load every model in the master process before workers are forked
+    Only unpickling and NumPy work happens here. Forward passes (torch,
+    XGBoost's OpenMP) run in the workers: thread pools started in the master
+    do not survive fork and can hang the children.
+
+    Returns:
+        dict: Model name -> True if loaded, or the error message
+    """
+    from services import (
+        MODEL_WARM_UP_TASKS, DISEASE_POOL_PROCESSES, disease_backend,
+        load_crop_prediction_model, load_fertilizer_model, get_flat_forest, FLAT_FOREST_ENABLED
+    )
+
+    status = {}
+    for name, (loader, _) in MODEL_WARM_UP_TASKS.items():
+        # ONNX Runtime sessions own threads, so they are created after fork;
+        # with the inference pool, its processes load the disease model
+        if name == 'disease' and (disease_backend == 'onnx' or DISEASE_POOL_PROCESSES > 0):
+            continue
+        try:
+            loader()
+            status[name] = True
+        except Exception as e:
+            status[name] = str(e)
+            print(f"✗ Preloading {name} model failed: {e}")
+
+    if FLAT_FOREST_ENABLED:
+        # Build the flattened forests once so the workers share them
+        if status.get('crop') is True:
+            get_flat_forest('crop', load_crop_prediction_model())
+        if status.get('fertilizer') is True:
+            get_flat_forest('fertilizer', *load_fertilizer_model())
+    return status
+
+
+def create_server(args):
+    from gunicorn.app.base import BaseApplication
+
+    class MLServer(BaseApplication):
+        """gunicorn application that serves app.app with the hooks below"""
+
+        def load_config(self):
+            settings = {
+                'bind': args.bind,
+                'workers': args.workers,
+                'threads': args.threads,
+                'worker_class': 'gthread',
+                'timeout': args.timeout,
+                'graceful_timeout': args.graceful_timeout,
+                'preload_app': not args.no_preload,
+                'post_fork': post_fork,
+                'worker_exit': worker_exit,
+            }
+            for key, value in settings.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from app import app
+            if not args.no_preload:
+                loaded = preload_models()
+                print(f"✓ Models loaded before fork: {', '.join(name for name, ok in loaded.items() if ok is True)}")
+            return app
+
+    def post_fork(server, worker):
+        import torch
+        from app import start_model_warm_up
+
+        torch.set_num_threads(args.torch_threads)
+        # Dummy inference per worker; /ready answers 503 until it is done
+        start_model_warm_up()
+        server.log.info(f"Worker {worker.pid} using {args.torch_threads} torch thread(s)")
+
+    def worker_exit(server, worker):
+        from services import shutdown_disease_inference
+
+        if not shutdown_disease_inference(timeout=args.graceful_timeout):
+            server.log.warning(f"Worker {worker.pid} exited with disease images still queued")
+
+    return MLServer()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    limit_native_threads(args.torch_threads)
+    # Warm-up runs per worker after fork (see post_fork), never in the master
+    os.environ['PRELOAD_MODELS'] = '0'
+
+    print(f"✓ Serving on {args.bind}: {args.workers} worker(s) x {args.threads} thread(s), "
+          f"{args.torch_threads} torch thread(s) per worker")
+    create_server(args).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,7 @@
 Services for crop prediction API
 Contains business logic for model loading and predictions
 """
+import atexit
 import joblib
 import os
 import torch
@@ -9,13 +10,79 @@ import torch.nn as nn
 from torchvision import transforms
 from PIL import Image
 from io import BytesIO
-import google.generativeai as genai
 from torch.serialization import add_safe_globals
 import xgboost as xgb
 import pandas as pd
 import category_encoders as ce
 from datetime import datetime
 import numpy as np
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from model_registry import ModelRegistry
+from price_forecast import PriceForecastTable, PricePredictor
+from forest_predictor import FLAT_FOREST_MAX_ROWS, FlatForestClassifier
+from response_cache import TTLCache
+from disk_cache import SQLiteCache
+from image_preprocess import DISEASE_IMAGE_SIZE, ImagePreprocessor
+from disease_backends import (
+    DISEASE_BACKEND, DISEASE_BACKENDS, DISEASE_INTRA_OP_THREADS, EXPORTED_BACKENDS, onnxruntime_available,
+    to_channels_last
+)
+from disease_solutions import create_solution_service, MissingApiKeyError
+from disease_pool import DISEASE_MAX_QUEUE_DEPTH, DISEASE_POOL_PROCESSES, DiseaseInferencePool, DiseaseQueueFullError
+import hashlib
+import metrics
+import profiling
+import structured_logging
+
+
+log = structured_logging.get_logger(__name__)
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+
+# All model artifacts are owned by this registry; files are checked for
+# changes at most every MODEL_RELOAD_CHECK_SECONDS (0 disables hot-swap)
+model_registry = ModelRegistry(
+    check_interval=float(os.getenv('MODEL_RELOAD_CHECK_SECONDS', '5'))
+)
+
+# Response caches for the deterministic tabular predictions, keyed on the
+# normalized inputs; a model's cache is cleared whenever that model is swapped
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '10000'))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv('RESPONSE_CACHE_TTL_SECONDS', '3600'))
+
+response_caches = {
+    name: TTLCache(name, RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL_SECONDS)
+    for name in ('crop', 'fertilizer', 'price')
+}
+
+
+def _invalidate_response_cache(name, version):
+    cache = response_caches.get(name)
+    if cache is not None:
+        cache.clear()
+
+
+model_registry.add_swap_listener(_invalidate_response_cache)
+
+
+def _numeric_cache_key(values):
+    """Normalize numeric inputs into a cache key, or None when they are not numeric"""
+    try:
+        return tuple(float(value) for value in values)
+    except (TypeError, ValueError):
+        return None
+
+
+def get_response_cache_stats():
+    """Return hit/miss counters and sizes of every response cache"""
+    stats = {name: cache.stats() for name, cache in response_caches.items()}
+    if _disease_disk_cache is not None:
+        stats['disease_disk'] = _disease_disk_cache.stats()
+    stats['solutions'] = solution_service.stats()
+    return stats
 
 
 # Crop name mapping
@@ -44,27 +111,108 @@ CROP_MAPPING = {
     21: 'watermelon'
 }
 
-# Global model variable
-_crop_recommendation_model = None
+# Serve the crop and fertilizer forests from flattened NumPy arrays instead of
+# sklearn's predict; set FLAT_FOREST_ENABLED=0 to use model.predict
+FLAT_FOREST_ENABLED = os.getenv('FLAT_FOREST_ENABLED', '1').lower() in ('1', 'true', 'yes')
+
+# Open large model arrays memory-mapped so pre-forked workers share one
+# page-cache copy: flattened forests are written once as .npy files under
+# MMAP_ARTIFACTS_DIR, disease weights are mapped straight from the checkpoint
+MMAP_ARTIFACTS = os.getenv('MMAP_ARTIFACTS', '1').lower() in ('1', 'true', 'yes')
+MMAP_ARTIFACTS_DIR = os.getenv('MMAP_ARTIFACTS_DIR', os.path.join(MODELS_DIR, "mmap"))
+
+
+def _open_mmap_forest(name, source_paths, load_source):
+    """
+    Open the memory-mapped flattened forest for a pickled model, writing it on first use
+    The directory name carries the sources' modification times and sizes, so
+    a replaced pickle gets a fresh artifact and mapped files never change
+
+    Args:
+        name: Artifact name, e.g. 'crop'
+        source_paths: Pickles the forest is built from
+        load_source: Callable returning (sklearn model, scaler or None)
+
+    Returns:
+        FlatForestClassifier: Forest backed by read-only memory maps
+    """
+    stats = [os.stat(path) for path in source_paths]
+    tag = hashlib.blake2b(
+        '-'.join(f'{stat.st_mtime_ns}.{stat.st_size}' for stat in stats).encode(),
+        digest_size=8
+    ).hexdigest()
+    directory = os.path.join(MMAP_ARTIFACTS_DIR, f'{name}-{tag}')
+
+    if not os.path.isdir(directory):
+        os.makedirs(MMAP_ARTIFACTS_DIR, exist_ok=True)
+        FlatForestClassifier(*load_source()).save(directory)
+        log.info('Wrote memory-mapped %s forest to %s', name, directory)
+
+    return FlatForestClassifier.load(directory, load_source)
+
+
+def _load_crop_artifacts(model_path):
+    if FLAT_FOREST_ENABLED and MMAP_ARTIFACTS:
+        # The sklearn pickle is only unpickled if a batch is handed to sklearn
+        model = _open_mmap_forest('crop', [model_path], lambda: (joblib.load(model_path), None))
+        log.info('Crop model memory-mapped from %s', model_path)
+        return model
+
+    model = joblib.load(model_path)
+    log.info('Crop model loaded from %s', model_path)
+    return model
+
+
+model_registry.register(
+    'crop',
+    [os.path.join(MODELS_DIR, "crop_prediction_model.pkl")],
+    _load_crop_artifacts
+)
 
 
 def load_crop_prediction_model():
     """
     Load the crop prediction model from disk
-    Uses lazy loading - only loads once on first call
+    Uses lazy loading through the model registry - only loads once on first call
+    """
+    return model_registry.get('crop')
+
+
+_flat_forests = {}
+_flat_forests_lock = threading.Lock()
+
+
+def get_flat_forest(name, model, scaler=None):
+    """
+    Return the flattened predictor for a loaded forest
+    Rebuilt whenever the model registry swaps in a new version
+
+    Args:
+        name: Registry key, 'crop' or 'fertilizer'
+        model: Fitted RandomForestClassifier from the model registry, or the
+            memory-mapped FlatForestClassifier the registry serves instead
+        scaler: StandardScaler to fold into the thresholds, if any
+
+    Returns:
+        FlatForestClassifier
     """
-    global _crop_recommendation_model
-    if _crop_recommendation_model is None:
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        model_path = os.path.join(base_dir, "models", "crop_prediction_model.pkl")
-        _crop_recommendation_model = joblib.load(model_path)
-        print(f"✓ Model loaded successfully from {model_path}")
-    return _crop_recommendation_model
+    if isinstance(model, FlatForestClassifier):
+        return model
+
+    flat_forest = _flat_forests.get(name)
+    if flat_forest is None or flat_forest.model is not model or flat_forest.scaler is not scaler:
+        with _flat_forests_lock:
+            flat_forest = _flat_forests.get(name)
+            if flat_forest is None or flat_forest.model is not model or flat_forest.scaler is not scaler:
+                flat_forest = FlatForestClassifier(model, scaler)
+                _flat_forests[name] = flat_forest
+    return flat_forest
 
 
 def predict_crop(n, p, k, temp, humidity, ph, rainfall):
     """
     Predict crop based on soil and weather parameters
+    Repeated inputs are answered from the crop response cache
     
     Args:
         n: Nitrogen content ratio in soil
@@ -78,13 +226,25 @@ def predict_crop(n, p, k, temp, humidity, ph, rainfall):
     Returns:
         dict: Contains crop name and index
     """
-    model = load_crop_prediction_model()
+    # Touch the registry first so hot-swap checks still run on cache hits
+    load_crop_prediction_model()
+    features = [n, p, k, temp, humidity, ph, rainfall]
     
-    # Prepare features
-    features = [[n, p, k, temp, humidity, ph, rainfall]]
+    key = _numeric_cache_key(features)
+    if key is None:
+        return _predict_crop_row(features)
+    return dict(response_caches['crop'].get_or_compute(key, lambda: _predict_crop_row(features)))
+
+
+def _predict_crop_row(features):
+    model = load_crop_prediction_model()
     
     # Make prediction
-    prediction = model.predict(features)
+    with metrics.stage('/predict_crop', 'inference'):
+        if FLAT_FOREST_ENABLED:
+            prediction = get_flat_forest('crop', model).predict([features])
+        else:
+            prediction = model.predict([features])
     crop_index = int(prediction[0])
     crop_name = CROP_MAPPING.get(crop_index, f'Unknown crop (index: {crop_index})')
     
@@ -94,88 +254,374 @@ def predict_crop(n, p, k, temp, humidity, ph, rainfall):
     }
 
 
-_price_model = None
-_price_encoder = None
+# Field order must match the column order the crop model was trained on
+CROP_FEATURE_FIELDS = ['n', 'p', 'k', 'temp', 'humidity', 'ph', 'rainfall']
+
+# Rows per model.predict call in predict_crop_batch; larger chunks would skip
+# the flat forest and unpickle the full sklearn forest in every worker
+CROP_BATCH_CHUNK_SIZE = int(os.getenv('CROP_BATCH_CHUNK_SIZE', str(FLAT_FOREST_MAX_ROWS)))
+
+
+def _crop_feature_row(sample):
+    """
+    Convert one batch sample into a numeric feature row
+
+    Args:
+        sample: Dictionary containing the predict_crop input parameters
+
+    Returns:
+        tuple: (feature_row, error_message)
+    """
+    if not isinstance(sample, dict):
+        return None, 'Sample must be a JSON object'
+
+    is_valid, error_message = validate_input_data(sample)
+    if not is_valid:
+        return None, error_message
+
+    row = []
+    for field in CROP_FEATURE_FIELDS:
+        value = sample[field]
+        if isinstance(value, bool):
+            return None, f'Field {field} must be a number'
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return None, f'Field {field} must be a number'
+        if not np.isfinite(value):
+            return None, f'Field {field} must be a finite number'
+        row.append(value)
+
+    return row, None
+
+
+def predict_crop_batch(samples, chunk_size=None):
+    """
+    Predict crops for many samples at once
+    Valid rows are stacked into one matrix and sent through a single
+    model.predict call per chunk, invalid rows are reported individually
+
+    Args:
+        samples: List of dictionaries with the same fields as predict_crop
+        chunk_size: Rows per model.predict call (defaults to CROP_BATCH_CHUNK_SIZE)
+
+    Returns:
+        list: One result per sample in input order. Successful rows contain
+        crop and crop_index, failed rows contain an error message
+    """
+    model = load_crop_prediction_model()
+    predict = get_flat_forest('crop', model).predict if FLAT_FOREST_ENABLED else model.predict
+    chunk_size = max(1, int(chunk_size or CROP_BATCH_CHUNK_SIZE))
+
+    results = [None] * len(samples)
+    rows = []
+    positions = []
+
+    with metrics.stage('/predict_crop/batch', 'preprocess'):
+        for index, sample in enumerate(samples):
+            row, error_message = _crop_feature_row(sample)
+            if error_message:
+                results[index] = {
+                    'success': False,
+                    'error': error_message
+                }
+            else:
+                rows.append(row)
+                positions.append(index)
+
+    if rows:
+        features = np.asarray(rows, dtype=np.float64)
+
+        for start in range(0, len(features), chunk_size):
+            with metrics.stage('/predict_crop/batch', 'inference'):
+                predictions = predict(features[start:start + chunk_size])
+
+            for offset, prediction in enumerate(predictions):
+                crop_index = int(prediction)
+                results[positions[start + offset]] = {
+                    'success': True,
+                    'crop': CROP_MAPPING.get(crop_index, f'Unknown crop (index: {crop_index})'),
+                    'crop_index': crop_index
+                }
+
+    return results
+
+
+def _load_price_artifacts(model_path, encoder_path):
+    try:
+        return joblib.load(model_path), joblib.load(encoder_path)
+    except Exception as e:
+        log.exception('Error loading price model')
+        raise e
+
+
+model_registry.register(
+    'price',
+    [
+        os.path.join(MODELS_DIR, "xgboost_price_model_updated.pkl"),
+        os.path.join(MODELS_DIR, "commodity_target_encoder_updated.pkl")
+    ],
+    _load_price_artifacts
+)
+
 
 def load_price_model():
     """
     Load the price prediction model and encoder from disk
-    Uses lazy loading - only loads once on first call
+    Uses lazy loading through the model registry - only loads once on first call
     """
-    global _price_model, _price_encoder
-    
-    if _price_model is None:
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        model_path = os.path.join(base_dir, "models", "xgboost_price_model_updated.pkl")
-        encoder_path = os.path.join(base_dir, "models", "commodity_target_encoder_updated.pkl")
-        
-        try:
-            _price_model = joblib.load(model_path)
-            _price_encoder = joblib.load(encoder_path)
-        
-        except Exception as e:
-            print(f"Error loading price model: {e}")
-            raise e
-    
-    return _price_model, _price_encoder
+    return model_registry.get('price')
+
+# Year horizon (inclusive) covered by the precomputed price forecast table
+PRICE_TABLE_START_YEAR = int(os.getenv('PRICE_TABLE_START_YEAR', str(datetime.now().year - 2)))
+PRICE_TABLE_END_YEAR = int(os.getenv('PRICE_TABLE_END_YEAR', str(datetime.now().year + 3)))
+PRICE_TABLE_ENABLED = os.getenv('PRICE_TABLE_ENABLED', '1').lower() in ('1', 'true', 'yes')
+
+_price_table = None
+_price_table_lock = threading.Lock()
+_price_predictor = None
+_price_predictor_lock = threading.Lock()
+_price_table_rebuilding = False
+# Price model version whose table build failed; retried once another version is loaded
+_price_table_failed_version = None
+
+
+def _build_price_table():
+    # Read the version between two gets: a swap racing with the build can
+    # only tag the table as older than its model, which triggers a rebuild
+    load_price_model()
+    version = model_registry.version('price')
+    model, encoder = load_price_model()
+    start = time.perf_counter()
+    table = PriceForecastTable.build(model, encoder, PRICE_TABLE_START_YEAR, PRICE_TABLE_END_YEAR, version)
+    build_seconds = round(time.perf_counter() - start, 3)
+    log.info('Price forecast table built: %d entries in %.3fs', len(table), build_seconds,
+             extra={'entries': len(table), 'build_seconds': build_seconds})
+    return table
+
+
+def _rebuild_price_table():
+    global _price_table, _price_table_rebuilding, _price_table_failed_version
+    version = model_registry.version('price')
+    try:
+        _price_table = _build_price_table()
+    except Exception:
+        _price_table_failed_version = version
+        log.exception('Price forecast table rebuild failed, predicting with the live model')
+    finally:
+        _price_table_rebuilding = False
+
+
+def get_price_forecast_table():
+    """
+    Return the precomputed price forecast table
+    Built on first use; when the price model has been hot-swapped the table
+    is rebuilt in the background and None is returned until it is ready,
+    so callers fall back to the live model. They do the same when a build
+    fails, until a new model version is loaded
+
+    Returns:
+        PriceForecastTable or None
+    """
+    global _price_table, _price_table_rebuilding, _price_table_failed_version
+    if not PRICE_TABLE_ENABLED:
+        return None
+
+    if _price_table is None:
+        with _price_table_lock:
+            if _price_table is None and _price_table_failed_version != model_registry.version('price'):
+                try:
+                    _price_table = _build_price_table()
+                except Exception:
+                    _price_table_failed_version = model_registry.version('price')
+                    log.exception('Price forecast table build failed, predicting with the live model')
+        return _price_table
+
+    load_price_model()
+    version = model_registry.version('price')
+    if _price_table.model_version == version:
+        return _price_table
+
+    with _price_table_lock:
+        if not _price_table_rebuilding and _price_table_failed_version != version:
+            _price_table_rebuilding = True
+            threading.Thread(target=_rebuild_price_table, name='price-table-rebuild', daemon=True).start()
+    return None
+
+
+def get_price_predictor():
+    """
+    Return the pandas-free predictor for the currently served price model
+    Rebuilt whenever the model registry swaps in a new version
+
+    Returns:
+        PricePredictor
+    """
+    global _price_predictor
+    model, encoder = load_price_model()
+    predictor = _price_predictor
+
+    if predictor is None or predictor.booster is not model.get_booster():
+        with _price_predictor_lock:
+            if _price_predictor is None or _price_predictor.booster is not model.get_booster():
+                _price_predictor = PricePredictor(model, encoder)
+            predictor = _price_predictor
+
+    return predictor
+
 
 def predict_price(commodity, date_str):
     """
     Predict commodity price based on commodity name and date.
+    Answers from the precomputed forecast table when the request falls
+    inside it, otherwise runs the live model.
     Corrects feature names and types to match model training.
     """
-    model, encoder = load_price_model()
+    date_obj = datetime.strptime(date_str, '%Y-%m-%d')
+    year, month = date_obj.year, date_obj.month
+    load_price_model()
+    
+    if isinstance(commodity, str):
+        predicted_price = response_caches['price'].get_or_compute(
+            (commodity, year, month),
+            lambda: _predict_price_value(commodity, year, month)
+        )
+    else:
+        predicted_price = _predict_price_value(commodity, year, month)
     
+    return {
+        'commodity': commodity,
+        'date': date_str,
+        'predicted_price': predicted_price,
+        'currency': 'NPR'
+    }
+
+
+def _predict_price_value(commodity, year, month):
+    table = get_price_forecast_table()
+    if table is not None:
+        with metrics.stage('/predict_price', 'inference'):
+            predicted_price = table.lookup(commodity, year, month)
+        if predicted_price is not None:
+            if structured_logging.debug_enabled():
+                log.debug('Price from forecast table', extra={
+                    'commodity': commodity, 'year': year, 'month': month, 'price': float(predicted_price)
+                })
+            return predicted_price
+
     try:
-        date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-        month = date_obj.month
-        year = date_obj.year
-        
-        # 2. Encode the commodity
-        # Passing as a DataFrame to avoid "UserWarning: X does not have valid feature names"
-        comm_df = pd.DataFrame({'Commodity': [commodity]})
-        encoded_output = encoder.transform(comm_df[['Commodity']])
-        print(encoded_output)
-        # Convert encoded output to a single numeric value safely
-        if hasattr(encoded_output, "toarray"):
-            # Handles Sparse Matrices (OneHotEncoder)
-            encoded_val = encoded_output.toarray().ravel()[0]
-        elif hasattr(encoded_output, "values"):
-            # Handles Pandas Objects
-            encoded_val = encoded_output.values.ravel()[0]
-        else:
-            # Handles NumPy Arrays
-            encoded_val = encoded_output.ravel()[0]
-
-        # 3. Construct the input DataFrame 
-        # Crucial: Names and Order must match training: ['year', 'month', 'Commodity_enc']
-        input_data = pd.DataFrame([{
-            'year': year,
-            'month': month,
-            'Commodity_enc': encoded_val
-        }])
-
-        # 4. Make prediction
-        # Ensure column order matches exactly what the model expects
-        input_data = input_data[['year', 'month', 'Commodity_enc']]
-        
-        prediction = model.predict(input_data)
-        # print(prediction)
-        predicted_price = float(np.expm1(prediction[0]))
-        predicted_price = np.round(predicted_price)
-        print(predicted_price)
-        return {
-            'commodity': commodity,
-            'date': date_str,
-            'predicted_price': predicted_price,
-            'currency': 'NPR'
-        }
+        predictor = get_price_predictor()
+        with metrics.stage('/predict_price', 'preprocess'):
+            features = predictor.features(commodity, year, month)
+        with metrics.stage('/predict_price', 'inference'):
+            predicted_price = predictor.predict_rows(features)[0]
+        if structured_logging.debug_enabled():
+            log.debug('Price from live model', extra={
+                'commodity': commodity, 'year': year, 'month': month,
+                'features': features[0].tolist(), 'price': float(predicted_price)
+            })
+        return predicted_price
         
     except Exception as e:
-        print(f"Error during price prediction: {e}")
+        log.exception('Error during price prediction', extra={'commodity': commodity, 'year': year, 'month': month})
         raise e
 
 
+# Upper bounds for a single /predict_price/series request
+PRICE_SERIES_MAX_COMMODITIES = int(os.getenv('PRICE_SERIES_MAX_COMMODITIES', '200'))
+PRICE_SERIES_MAX_MONTHS = int(os.getenv('PRICE_SERIES_MAX_MONTHS', '120'))
+
+
+def _parse_month(value):
+    for date_format in ('%Y-%m', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, date_format)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def validate_price_series_input(data):
+    """
+    Validate input data for a price forecast series
+    
+    Args:
+        data: Dictionary with commodities, start_date and end_date
+    
+    Returns:
+        tuple: (is_valid, error_message, converted_data)
+    """
+    if not isinstance(data, dict):
+        return False, 'Request body must be a JSON object', None
+
+    required_fields = ['commodities', 'start_date', 'end_date']
+    for field in required_fields:
+        if field not in data:
+            return False, f'Missing required field: {field}', None
+
+    commodities = data['commodities']
+    if isinstance(commodities, str):
+        commodities = [commodities]
+    if not isinstance(commodities, list) or not commodities:
+        return False, 'commodities must be a non-empty list', None
+    if not all(isinstance(commodity, str) for commodity in commodities):
+        return False, 'commodities must contain only strings', None
+    if len(commodities) > PRICE_SERIES_MAX_COMMODITIES:
+        return False, f'At most {PRICE_SERIES_MAX_COMMODITIES} commodities per request', None
+
+    start = _parse_month(data['start_date'])
+    end = _parse_month(data['end_date'])
+    if start is None or end is None:
+        return False, 'start_date and end_date must be formatted as YYYY-MM or YYYY-MM-DD', None
+
+    months = (end.year - start.year) * 12 + end.month - start.month + 1
+    if months < 1:
+        return False, 'end_date must not be before start_date', None
+    if months > PRICE_SERIES_MAX_MONTHS:
+        return False, f'Date range must not exceed {PRICE_SERIES_MAX_MONTHS} months', None
+
+    return True, None, {
+        'commodities': commodities,
+        'start_year': start.year,
+        'start_month': start.month,
+        'months': months
+    }
+
+
+def predict_price_series(commodities, start_year, start_month, months):
+    """
+    Predict monthly prices for several commodities over a date range
+    The whole commodity-by-month feature matrix goes through one booster call
+    
+    Args:
+        commodities: List of commodity names
+        start_year: Year of the first month
+        start_month: First month (1-12)
+        months: Number of consecutive months
+    
+    Returns:
+        dict: Columnar series - one month label list and one price list per commodity
+    """
+    offsets = np.arange(months) + start_month - 1
+    years = start_year + offsets // 12
+    month_numbers = offsets % 12 + 1
+
+    predictor = get_price_predictor()
+    with metrics.stage('/predict_price/series', 'preprocess'):
+        features = predictor.series_features(commodities, years, month_numbers)
+    with metrics.stage('/predict_price/series', 'inference'):
+        prices = predictor.predict_rows(features).reshape(len(commodities), months)
+
+    return {
+        'months': [f'{year}-{month:02d}' for year, month in zip(years.tolist(), month_numbers.tolist())],
+        'prices': {
+            commodity: row
+            for commodity, row in zip(commodities, prices.tolist())
+        },
+        'currency': 'NPR'
+    }
+
+
 SOIL_TYPE_MAPPING = {
     0: 'Sandy',
     1: 'Loamy',
@@ -214,32 +660,45 @@ FERTILIZER_MAPPING = {
 SOIL_TYPE_REVERSE = {v.lower(): k for k, v in SOIL_TYPE_MAPPING.items()}
 CROP_TYPE_REVERSE = {v.lower(): k for k, v in CROP_TYPE_MAPPING.items()}
 
-_fertilizer_model = None
-_fertilizer_scaler = None
+def _load_fertilizer_artifacts(model_path, scaler_path):
+    scaler = joblib.load(scaler_path)
+    if FLAT_FOREST_ENABLED and MMAP_ARTIFACTS:
+        # The scaler is folded into the memory-mapped forest's thresholds
+        model = _open_mmap_forest(
+            'fertilizer',
+            [model_path, scaler_path],
+            lambda: (joblib.load(model_path), joblib.load(scaler_path))
+        )
+        log.info('Fertilizer model memory-mapped from %s', model_path)
+        return model, scaler
+
+    model = joblib.load(model_path)
+    log.info('Fertilizer model and scaler loaded from %s', model_path)
+    return model, scaler
+
+
+model_registry.register(
+    'fertilizer',
+    [
+        os.path.join(MODELS_DIR, "fertilizer_recomendation_model.pkl"),
+        os.path.join(MODELS_DIR, "fertilizer_recomendation_scaler.pkl")
+    ],
+    _load_fertilizer_artifacts
+)
 
 
 def load_fertilizer_model():
     """
     Load the fertilizer recommendation model and scaler from disk
-    Uses lazy loading - only loads once on first call
+    Uses lazy loading through the model registry - only loads once on first call
     """
-    global _fertilizer_model, _fertilizer_scaler
-    
-    if _fertilizer_model is None:
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        model_path = os.path.join(base_dir, "models", "fertilizer_recomendation_model.pkl")
-        scaler_path = os.path.join(base_dir, "models", "fertilizer_recomendation_scaler.pkl")
-        
-        _fertilizer_model = joblib.load(model_path)
-        _fertilizer_scaler = joblib.load(scaler_path)
-        print(f"✓ Fertilizer model and scaler loaded successfully from {model_path}")
-    
-    return _fertilizer_model, _fertilizer_scaler
+    return model_registry.get('fertilizer')
 
 
 def predict_fertilizer(temp, humidity, moisture, soil_type, crop_type, nitrogen, potassium, phosphorus):
     """
     Predict fertilizer based on soil and environmental parameters
+    Repeated inputs are answered from the fertilizer response cache
     
     Args:
         temp: Temperature in degree Celsius
@@ -254,13 +713,27 @@ def predict_fertilizer(temp, humidity, moisture, soil_type, crop_type, nitrogen,
     Returns:
         dict: Contains fertilizer name and index
     """
-    model, scaler = load_fertilizer_model()
-    
-    features = [[temp, humidity, moisture, soil_type, crop_type, nitrogen, potassium, phosphorus]]
+    load_fertilizer_model()
+    features = [temp, humidity, moisture, soil_type, crop_type, nitrogen, potassium, phosphorus]
     
-    features_scaled = scaler.transform(features)
+    key = _numeric_cache_key(features)
+    if key is None:
+        return _predict_fertilizer_row(features)
+    return dict(response_caches['fertilizer'].get_or_compute(key, lambda: _predict_fertilizer_row(features)))
+
+
+def _predict_fertilizer_row(features):
+    model, scaler = load_fertilizer_model()
     
-    prediction = model.predict(features_scaled)
+    if FLAT_FOREST_ENABLED:
+        # The scaler is folded into the flattened forest's thresholds
+        with metrics.stage('/predict_fertilizer', 'inference'):
+            prediction = get_flat_forest('fertilizer', model, scaler).predict([features])
+    else:
+        with metrics.stage('/predict_fertilizer', 'preprocess'):
+            features_scaled = scaler.transform([features])
+        with metrics.stage('/predict_fertilizer', 'inference'):
+            prediction = model.predict(features_scaled)
     fertilizer_index = int(prediction[0])
     fertilizer_name = FERTILIZER_MAPPING.get(fertilizer_index, f'Unknown fertilizer (index: {fertilizer_index})')
     
@@ -457,57 +930,495 @@ DISEASE_CLASS_NAMES = {
 }
 
 
-_disease_model = None
-_disease_transform = None
+DISEASE_MODEL_PATH = os.getenv(
+    'DISEASE_MODEL_PATH',
+    os.path.join(MODELS_DIR, "plant-disease-model-complete.pth")
+)
 
 
-def load_disease_model():
-    """Load the plant disease detection model"""
-    global _disease_model, _disease_transform
-    
-    if _disease_model is None:
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        model_path = os.path.join(base_dir, "models", "plant-disease-model-complete.pth")
-        
-        _disease_model = torch.load(
+def load_disease_checkpoint(model_path=DISEASE_MODEL_PATH):
+    """
+    Load the fp32 eager-mode disease model from its pickled checkpoint
+    With MMAP_ARTIFACTS the weights stay memory-mapped from the file, so
+    pre-forked workers share them instead of each holding a copy
+    """
+    try:
+        model = torch.load(
+            model_path,
+            map_location="cpu",
+            weights_only=False,
+            mmap=MMAP_ARTIFACTS
+        )
+    except RuntimeError as e:
+        # Checkpoints in the legacy (pre-zipfile) format cannot be mapped
+        if not MMAP_ARTIFACTS or 'mmap' not in str(e):
+            raise
+        model = torch.load(
             model_path,
             map_location="cpu",
             weights_only=False
         )
-        _disease_model.eval()
-        
-        _disease_transform = transforms.Compose([
-            transforms.Resize((256, 256)),
-            transforms.ToTensor()
-        ])
-        
-        print(f"✓ Disease detection model loaded successfully from {model_path}")
+    model.eval()
+    return model
+
+
+def _disease_transform():
+    return transforms.Compose([
+        transforms.Resize((DISEASE_IMAGE_SIZE, DISEASE_IMAGE_SIZE)),
+        transforms.ToTensor()
+    ])
+
+
+def _load_disease_artifacts(model_path):
+    model = load_disease_checkpoint(model_path)
+    if disease_backend == 'channels_last':
+        model = to_channels_last(model)
+    
+    log.info('Disease model loaded from %s (%s backend)', model_path, disease_backend)
+    return model, _disease_transform()
+
+
+def _load_exported_disease_artifacts(model_path):
+    _, loader = EXPORTED_BACKENDS[disease_backend]
+    try:
+        model = loader(model_path)
+    except Exception as e:
+        # The eager checkpoint stays the fallback for a broken export
+        log.error('Error loading %s disease model from %s: %s. Using eager', disease_backend, model_path, e)
+        return load_disease_checkpoint(DISEASE_MODEL_PATH), _disease_transform()
     
-    return _disease_model, _disease_transform
+    log.info('Disease model loaded from %s (%s backend)', model_path, disease_backend)
+    return model, _disease_transform()
+
+
+def _select_disease_backend(backend):
+    """
+    Resolve the configured backend to one that can actually be served
+    Exported backends fall back to eager when their artifact is missing
+    """
+    if backend not in DISEASE_BACKENDS:
+        log.warning("Unknown DISEASE_BACKEND '%s', using eager", backend)
+        return 'eager'
+    if backend in EXPORTED_BACKENDS:
+        path, _ = EXPORTED_BACKENDS[backend]
+        if not os.path.exists(path):
+            tool = 'quantize_disease_model.py' if backend == 'int8' else 'export_disease_model.py'
+            log.warning('%s disease model not found at %s; run %s. Using eager', backend, path, tool)
+            return 'eager'
+        if backend == 'onnx' and not onnxruntime_available():
+            log.warning('onnxruntime is not installed, using eager')
+            return 'eager'
+    return backend
+
+
+# Inference backend actually in use
+disease_backend = _select_disease_backend(DISEASE_BACKEND)
+
+# torch.set_num_threads is process-wide, so it is applied once here instead of
+# on every (re)load; serve.py workers and inference processes set their own after this
+if disease_backend in ('int8', 'torchscript') and DISEASE_INTRA_OP_THREADS > 0:
+    torch.set_num_threads(DISEASE_INTRA_OP_THREADS)
+
+if disease_backend in EXPORTED_BACKENDS:
+    model_registry.register('disease', [EXPORTED_BACKENDS[disease_backend][0]], _load_exported_disease_artifacts)
+else:
+    model_registry.register('disease', [DISEASE_MODEL_PATH], _load_disease_artifacts)
+
+
+def load_disease_model():
+    """Load the plant disease detection model through the model registry"""
+    return model_registry.get('disease')
+
+
+# Uploads are decoded on their own thread pool with downscaled JPEG decoding;
+# set DISEASE_FAST_PREPROCESS=0 to fall back to the torchvision transform
+DISEASE_FAST_PREPROCESS = os.getenv('DISEASE_FAST_PREPROCESS', '1').lower() in ('1', 'true', 'yes')
+
+_disease_preprocessor = ImagePreprocessor()
+
+
+def preprocess_disease_image(image_bytes, transform, out=None, inline=False):
+    """
+    Decode image bytes into a (3, H, W) model input tensor
+
+    Args:
+        image_bytes: Image file bytes
+        transform: The model's torchvision transform, used when fast preprocessing is off
+        out: Optional tensor to write the result into
+        inline: Decode on the calling thread instead of the decode pool
+
+    Returns:
+        torch.Tensor: Preprocessed image
+    """
+    with metrics.stage('/predict_disease', 'preprocess'):
+        if DISEASE_FAST_PREPROCESS:
+            if inline:
+                return _disease_preprocessor.preprocess(image_bytes, out)
+            return _disease_preprocessor.submit(image_bytes, out).result()
+        image = Image.open(BytesIO(image_bytes)).convert("RGB")
+        img_tensor = transform(image)
+        if out is not None:
+            return out.copy_(img_tensor)
+        return img_tensor
+
+
+# Micro-batching settings for disease inference
+# A batch is flushed when it reaches DISEASE_BATCH_MAX_SIZE images or when the
+# oldest queued image has waited DISEASE_BATCH_MAX_WAIT_MS milliseconds
+DISEASE_BATCH_MAX_SIZE = int(os.getenv('DISEASE_BATCH_MAX_SIZE', '16'))
+DISEASE_BATCH_MAX_WAIT_MS = float(os.getenv('DISEASE_BATCH_MAX_WAIT_MS', '5'))
+
+
+class DiseaseBatcher:
+    """
+    Background micro-batching engine for ResNet9 inference
+    Callers submit preprocessed image tensors and receive a Future; a single
+    worker thread stacks queued tensors into one batch and runs one forward pass
+    """
+
+    def __init__(self, max_batch_size=DISEASE_BATCH_MAX_SIZE, max_wait_ms=DISEASE_BATCH_MAX_WAIT_MS,
+                 max_queue_depth=DISEASE_MAX_QUEUE_DEPTH):
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.max_queue_depth = max(1, int(max_queue_depth))
+        self._admitted = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+        self._queue = None
+        self._worker = None
+        self._pid = None
+        self._batches = 0
+        self._images = 0
+        self._last_batch_size = 0
+        self._largest_batch_size = 0
+        self._batch_size_counts = {}
+
+    def _ensure_worker(self):
+        # Threads do not survive fork, so a forked worker process starts its own
+        pending = self._queue
+        if self._worker is not None and self._pid == os.getpid() and pending is not None:
+            return pending
+        with self._lock:
+            if self._worker is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._worker = threading.Thread(
+                    target=self._run,
+                    args=(self._queue,),
+                    name='disease-batcher',
+                    daemon=True
+                )
+                self._worker.start()
+            return self._queue
+
+    def admit(self):
+        """
+        Reserve room for one image, from before decoding until its result
+        Pair with release()
+
+        Raises:
+            DiseaseQueueFullError: max_queue_depth images are already admitted
+        """
+        with self._lock:
+            if self._admitted >= self.max_queue_depth:
+                self._rejected += 1
+                raise DiseaseQueueFullError()
+            self._admitted += 1
+
+    def release(self):
+        with self._lock:
+            self._admitted -= 1
+
+    def submit(self, img_tensor):
+        """
+        Queue one preprocessed image tensor of shape (3, H, W)
+
+        Returns:
+            Future: Resolves to the predicted class index
+        """
+        future = Future()
+        if self.max_batch_size == 1:
+            self._run_batch([(img_tensor, future)])
+            return future
+
+        self._ensure_worker().put((img_tensor, future))
+        return future
+
+    def shutdown(self, timeout=None):
+        """
+        Stop the batching thread once every image queued so far has been answered
+        Later submits start a new thread
+
+        Args:
+            timeout: Seconds to wait for the queue to drain (None waits until done)
+
+        Returns:
+            bool: True if the thread finished within the timeout
+        """
+        with self._lock:
+            worker, pending = self._worker, self._queue
+            if worker is None or self._pid != os.getpid():
+                return True
+            self._worker = None
+            self._queue = None
+
+        pending.put(None)
+        worker.join(timeout)
+        if worker.is_alive():
+            return False
+
+        # Images a racing submit queued behind the stop marker
+        leftovers = []
+        while True:
+            try:
+                leftovers.append(pending.get_nowait())
+            except queue.Empty:
+                break
+        for start in range(0, len(leftovers), self.max_batch_size):
+            self._run_batch(leftovers[start:start + self.max_batch_size])
+        return True
+
+    def _run(self, pending):
+        # None in the queue asks the thread to stop after the images ahead of it
+        stopping = False
+        while not stopping:
+            item = pending.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        item = pending.get(timeout=remaining)
+                    else:
+                        item = pending.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        try:
+            model, _ = load_disease_model()
+            img_batch = torch.stack([img_tensor for img_tensor, _ in batch])
+
+            with torch.no_grad():
+                output = model(img_batch)
+                _, predicted = torch.max(output, 1)
+
+            for (_, future), disease_index in zip(batch, predicted.tolist()):
+                future.set_result(disease_index)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+
+        with self._lock:
+            batch_size = len(batch)
+            self._batches += 1
+            self._images += batch_size
+            self._last_batch_size = batch_size
+            self._largest_batch_size = max(self._largest_batch_size, batch_size)
+            self._batch_size_counts[batch_size] = self._batch_size_counts.get(batch_size, 0) + 1
+
+    def metrics(self):
+        """
+        Snapshot of batching metrics
+
+        Returns:
+            dict: Queue depth, batch counts and batch size statistics
+        """
+        with self._lock:
+            return {
+                'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+                'admitted': self._admitted,
+                'max_queue_depth': self.max_queue_depth,
+                'rejected': self._rejected,
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'batches': self._batches,
+                'images': self._images,
+                'last_batch_size': self._last_batch_size,
+                'largest_batch_size': self._largest_batch_size,
+                'mean_batch_size': self._images / self._batches if self._batches else 0.0,
+                'batch_size_counts': dict(sorted(self._batch_size_counts.items()))
+            }
+
+
+_disease_batcher = DiseaseBatcher()
+
+# With DISEASE_POOL_PROCESSES > 0 inference runs in dedicated processes
+# (disease_pool.py) instead of on the batcher thread
+_disease_pool = DiseaseInferencePool(
+    DISEASE_POOL_PROCESSES,
+    DISEASE_IMAGE_SIZE,
+    max_batch_size=DISEASE_BATCH_MAX_SIZE,
+    max_wait_ms=DISEASE_BATCH_MAX_WAIT_MS
+) if DISEASE_POOL_PROCESSES > 0 else None
+
+
+def get_disease_batching_metrics():
+    """Return queue depth and batch size metrics of the disease batcher"""
+    return _disease_batcher.metrics()
+
+
+def get_disease_pool_metrics():
+    """Return inference pool metrics, or None when inference runs in-process"""
+    return _disease_pool.metrics() if _disease_pool is not None else None
+
+
+def _infer_disease_index(image_bytes):
+    """
+    Run one uncached image through the model
+    Both paths admit at most DISEASE_MAX_QUEUE_DEPTH images at once and raise
+    DiseaseQueueFullError beyond that, before the image is decoded
+
+    Returns:
+        int: Predicted class index
+    """
+    if profiling.is_active():
+        return _infer_disease_index_inline(image_bytes)
+
+    # The inference stage is the wait for the result: queueing plus the
+    # image's share of a batched forward pass
+    if _disease_pool is not None:
+        transform = None if DISEASE_FAST_PREPROCESS else _disease_transform()
+        future = _disease_pool.submit(
+            lambda slot: preprocess_disease_image(image_bytes, transform, out=slot)
+        )
+        with metrics.stage('/predict_disease', 'inference'):
+            return future.result()
+
+    _disease_batcher.admit()
+    try:
+        _, transform = load_disease_model()
+        img_tensor = preprocess_disease_image(image_bytes, transform)
+        with metrics.stage('/predict_disease', 'inference'):
+            return _disease_batcher.submit(img_tensor).result()
+    finally:
+        _disease_batcher.release()
+
+
+def _infer_disease_index_inline(image_bytes):
+    """
+    Decode and run one image on the calling thread, for profiled requests:
+    the profile then shows the decode and the forward pass instead of a wait
+    on the batcher or the inference pool. With the pool enabled, the first
+    profiled request loads the model into the server worker
+
+    Returns:
+        int: Predicted class index
+    """
+    _disease_batcher.admit()
+    try:
+        model, transform = load_disease_model()
+        img_tensor = preprocess_disease_image(image_bytes, transform, inline=True)
+        with metrics.stage('/predict_disease', 'inference'), torch.no_grad():
+            output = model(img_tensor.unsqueeze(0))
+            return int(torch.max(output, 1)[1][0])
+    finally:
+        _disease_batcher.release()
+
+
+def shutdown_disease_inference(timeout=None):
+    """
+    Answer every queued disease image, then stop the batching thread and the
+    decode pool of this process. Runs at interpreter exit and from the
+    serving entry point's worker shutdown hook
+
+    Args:
+        timeout: Seconds to wait for queued images (None waits until done)
+
+    Returns:
+        bool: True if the queue drained within the timeout
+    """
+    drained = _disease_batcher.shutdown(timeout)
+    if _disease_pool is not None:
+        drained = _disease_pool.shutdown(timeout) and drained
+    _disease_preprocessor.shutdown(wait=drained)
+    return drained
+
+
+# Stops the batching thread before the interpreter tears torch down; a
+# daemon thread still parked inside torch at exit aborts the process
+atexit.register(shutdown_disease_inference)
+
+
+# Results for already seen images, keyed by a hash of the raw upload bytes.
+# Entries are a few hundred bytes, so the entry limit bounds memory; the
+# optional SQLite tier (DISEASE_CACHE_DB) survives restarts
+DISEASE_CACHE_MAX_ENTRIES = int(os.getenv('DISEASE_CACHE_MAX_ENTRIES', '20000'))
+DISEASE_CACHE_TTL_SECONDS = float(os.getenv('DISEASE_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+DISEASE_CACHE_DB = os.getenv('DISEASE_CACHE_DB', '')
+# Rows kept in the SQLite tier; every unique upload adds one
+DISEASE_CACHE_DB_MAX_ROWS = int(os.getenv('DISEASE_CACHE_DB_MAX_ROWS', '200000'))
+
+response_caches['disease'] = TTLCache('disease', DISEASE_CACHE_MAX_ENTRIES, DISEASE_CACHE_TTL_SECONDS)
+_disease_disk_cache = SQLiteCache(
+    DISEASE_CACHE_DB, 'disease_results', DISEASE_CACHE_TTL_SECONDS, DISEASE_CACHE_DB_MAX_ROWS
+) if DISEASE_CACHE_DB else None
+
+
+def _disease_cache_key(image_bytes):
+    # The model's artifact tag is part of the key so persisted results from
+    # an older checkpoint are never served; it is read from the checkpoint
+    # file, so it is valid before the model loads and in pool mode
+    digest = hashlib.blake2b(image_bytes, digest_size=16).hexdigest()
+    return f"{model_registry.artifact_tag('disease')}:{digest}"
 
 
 def predict_disease(image_bytes):
     """
     Predict plant disease from image bytes
+    Images seen before are answered from the content-hash cache without
+    decoding; new images go through the shared micro-batcher (or the
+    inference process pool), so concurrent requests are answered from a
+    single forward pass
     
     Args:
         image_bytes: Image file bytes
     
     Returns:
         dict: Contains disease name and formatted display name
+
+    Raises:
+        DiseaseQueueFullError: Too many images are already queued
     """
-    model, transform = load_disease_model()
+    memory_cache = response_caches['disease']
+    key = _disease_cache_key(image_bytes)
     
-    # Open and preprocess image
-    image = Image.open(BytesIO(image_bytes)).convert("RGB")
-    img_tensor = transform(image).unsqueeze(0)
+    found, disease_index = memory_cache.get(key)
+    if not found and _disease_disk_cache is not None:
+        disease_index = _disease_disk_cache.get(key)
+        if disease_index is not None:
+            found = True
+            memory_cache.put(key, disease_index)
     
-    # Make prediction
-    with torch.no_grad():
-        output = model(img_tensor)
-        _, predicted = torch.max(output, 1)
+    if not found:
+        generation = memory_cache.generation
+        
+        # Make prediction
+        disease_index = _infer_disease_index(image_bytes)
+        
+        memory_cache.put(key, disease_index, generation)
+        if _disease_disk_cache is not None:
+            _disease_disk_cache.put(key, disease_index)
     
-    disease_index = predicted.item()
+    if structured_logging.debug_enabled():
+        log.debug('Disease prediction', extra={
+            'image_bytes': len(image_bytes), 'cached': found, 'disease_index': disease_index
+        })
+
     disease_name = DISEASE_CLASS_NAMES.get(disease_index, f'Unknown disease (index: {disease_index})')
     
     display_name = disease_name.replace('___', ' - ').replace('_', ' ')
@@ -519,9 +1430,19 @@ def predict_disease(image_bytes):
     }
 
 
+solution_service = create_solution_service()
+
+
+def format_disease_name(disease_name):
+    """Turn a class name like Tomato___Late_blight into Tomato - Late blight"""
+    return disease_name.replace('___', ' - ').replace('_', ' ')
+
+
 def get_disease_solution(disease_name, api_key=None):
     """
     Get treatment solution for a plant disease using Google Gemini
+    Solutions are cached persistently per disease, prompt version and model,
+    so only the first request for a disease calls Gemini
     
     Args:
         disease_name: Name of the disease
@@ -535,50 +1456,254 @@ def get_disease_solution(disease_name, api_key=None):
         return {
             'success': True,
             'solution': '',
-            'disease': disease_name.replace('___', ' - ').replace('_', ' ')
+            'disease': format_disease_name(disease_name)
         }
     
     if not api_key:
         api_key = os.getenv('GEMINI_API_KEY')
     
-    if not api_key:
-        return {
-            'success': False,
-            'error': 'Google Gemini API key not provided. Please set GEMINI_API_KEY environment variable.'
-        }
+    formatted_disease = format_disease_name(disease_name)
     
     try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-2.5-flash-lite')
-        
-        formatted_disease = disease_name.replace('___', ' - ').replace('_', ' ')
-        
-        prompt = f"""You are an agricultural expert. A farmer's plant has: {formatted_disease}
-
-Provide ONLY actionable steps in this exact format:
+        solution = solution_service.get_solution(formatted_disease, api_key)
+    except Exception as e:
+        return _solution_error(e)
 
-What to do now:
-• [Step 1]
-• [Step 2]
-• [Step 3]
+    return {
+        'success': True,
+        'solution': solution,
+        'disease': formatted_disease
+    }
 
-Prevention:
-• [Prevention tip 1]
-• [Prevention tip 2]
 
-Keep it brief, practical, and farmer-friendly. Use bullet points only."""
-        
-        response = model.generate_content(prompt)
-        
+async def get_disease_solution_async(disease_name, api_key=None):
+    """
+    Awaitable get_disease_solution() for the ASGI app
+    Same result dicts; the Gemini call is awaited instead of blocking a thread
+    """
+    if 'healthy' in disease_name.lower():
         return {
             'success': True,
-            'solution': response.text,
-            'disease': formatted_disease
+            'solution': '',
+            'disease': format_disease_name(disease_name)
         }
-    
+
+    if not api_key:
+        api_key = os.getenv('GEMINI_API_KEY')
+
+    formatted_disease = format_disease_name(disease_name)
+
+    try:
+        solution = await solution_service.get_solution_async(formatted_disease, api_key)
     except Exception as e:
+        return _solution_error(e)
+
+    return {
+        'success': True,
+        'solution': solution,
+        'disease': formatted_disease
+    }
+
+
+def _solution_error(error):
+    if isinstance(error, MissingApiKeyError):
         return {
             'success': False,
-            'error': f'Error generating solution: {str(e)}'
+            'error': str(error)
         }
+    return {
+        'success': False,
+        'error': f'Error generating solution: {str(error)}'
+    }
+
+
+def stream_disease_solution(disease_name, api_key=None):
+    """
+    Stream the treatment solution for a plant disease as it is generated
+    Cached solutions are replayed immediately as a single chunk
+
+    Args:
+        disease_name: Name of the disease
+        api_key: Google Gemini API key
+
+    Returns:
+        tuple: (formatted disease name, iterator of text chunks)
+        The iterator raises MissingApiKeyError or the upstream error on failure
+    """
+    formatted_disease = format_disease_name(disease_name)
+
+    # Healthy plants need no solution
+    if 'healthy' in disease_name.lower():
+        return formatted_disease, iter(())
+
+    if not api_key:
+        api_key = os.getenv('GEMINI_API_KEY')
+
+    return formatted_disease, solution_service.stream_solution(formatted_disease, api_key)
+
+
+def _warm_up_crop_model(model):
+    if FLAT_FOREST_ENABLED:
+        get_flat_forest('crop', model).predict(np.zeros((1, len(CROP_FEATURE_FIELDS))))
+    else:
+        model.predict(np.zeros((1, len(CROP_FEATURE_FIELDS))))
+
+
+def _warm_up_fertilizer_model(artifacts):
+    model, scaler = artifacts
+    if FLAT_FOREST_ENABLED:
+        get_flat_forest('fertilizer', model, scaler).predict(np.zeros((1, 8)))
+    else:
+        model.predict(scaler.transform(np.zeros((1, 8))))
+
+
+def _warm_up_price_model(artifacts):
+    model, encoder = artifacts
+    get_price_forecast_table()
+    encoded_output = encoder.transform(pd.DataFrame({'Commodity': ['warm-up']}))
+    model.predict(pd.DataFrame({
+        'year': [datetime.now().year],
+        'month': [datetime.now().month],
+        'Commodity_enc': [float(np.asarray(encoded_output).ravel()[0])]
+    }))
+
+
+def _warm_up_disease_model(artifacts):
+    model, transform = artifacts
+    img_tensor = transform(Image.new('RGB', (DISEASE_IMAGE_SIZE, DISEASE_IMAGE_SIZE))).unsqueeze(0)
+    with torch.no_grad():
+        model(img_tensor)
+
+
+def _start_disease_pool():
+    _disease_pool.start()
+    return _disease_pool
+
+
+def _warm_up_disease_pool(pool):
+    # Waits for an inference process to load the model and run one blank image
+    pool.submit(lambda slot: slot.zero_()).result()
+
+
+# Model name -> (loader, dummy inference run on the loaded artifacts)
+MODEL_WARM_UP_TASKS = {
+    'crop': (load_crop_prediction_model, _warm_up_crop_model),
+    'fertilizer': (load_fertilizer_model, _warm_up_fertilizer_model),
+    'price': (load_price_model, _warm_up_price_model),
+    'disease': (
+        (_start_disease_pool, _warm_up_disease_pool) if _disease_pool is not None
+        else (load_disease_model, _warm_up_disease_model)
+    ),
+}
+
+
+def warm_up_models(names=None, max_workers=None):
+    """
+    Load models in parallel and run one dummy inference through each
+    Used at startup so the first real request does not pay for unpickling
+    and allocator warm-up
+    
+    Args:
+        names: Model names from MODEL_WARM_UP_TASKS (defaults to all)
+        max_workers: Thread pool size (defaults to one thread per model)
+    
+    Returns:
+        dict: Per-model status with load and warm-up times in seconds,
+        plus the error message for models that failed
+    """
+    names = list(names or MODEL_WARM_UP_TASKS)
+
+    def warm_up(name):
+        loader, dummy_inference = MODEL_WARM_UP_TASKS[name]
+        status = {'ready': False, 'load_seconds': None, 'warm_up_seconds': None}
+        start = time.perf_counter()
+        try:
+            artifacts = loader()
+            status['load_seconds'] = round(time.perf_counter() - start, 4)
+
+            start = time.perf_counter()
+            dummy_inference(artifacts)
+            status['warm_up_seconds'] = round(time.perf_counter() - start, 4)
+            status['ready'] = True
+            log.info('%s model ready (load %.3fs, warm-up %.3fs)', name,
+                     status['load_seconds'], status['warm_up_seconds'],
+                     extra={'model': name, 'load_seconds': status['load_seconds'],
+                            'warm_up_seconds': status['warm_up_seconds']})
+        except Exception as e:
+            status['error'] = str(e)
+            log.error('%s model warm-up failed: %s', name, e, extra={'model': name})
+        return name, status
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(names), thread_name_prefix='warm-up') as executor:
+        return dict(executor.map(warm_up, names))
+
+
+def _collect_service_metrics():
+    """
+    Cache, model registry and disease queue statistics for /metrics
+    Read from their owners at scrape time, so serving requests pays nothing for them
+    """
+    caches = {name: cache.stats() for name, cache in response_caches.items()}
+    caches['solutions'] = solution_service.memory_cache.stats()
+    disk_caches = {}
+    if _disease_disk_cache is not None:
+        disk_caches['disease'] = _disease_disk_cache.stats()
+    if solution_service.disk_cache is not None:
+        disk_caches['solutions'] = solution_service.disk_cache.stats()
+    models = model_registry.info()
+    batching = _disease_batcher.metrics()
+    pool = get_disease_pool_metrics()
+    solutions = solution_service.stats()
+
+    families = [
+        ('ml_cache_hits_total', 'counter', 'Response cache hits',
+         [({'cache': name}, stats['hits']) for name, stats in caches.items()]),
+        ('ml_cache_misses_total', 'counter', 'Response cache misses',
+         [({'cache': name}, stats['misses']) for name, stats in caches.items()]),
+        ('ml_cache_evictions_total', 'counter', 'Entries evicted to stay within max_entries',
+         [({'cache': name}, stats['evictions']) for name, stats in caches.items()]),
+        ('ml_cache_entries', 'gauge', 'Entries currently cached',
+         [({'cache': name}, stats['size']) for name, stats in caches.items()]),
+        ('ml_disk_cache_hits_total', 'counter', 'SQLite cache hits',
+         [({'cache': name}, stats['hits']) for name, stats in disk_caches.items()]),
+        ('ml_disk_cache_misses_total', 'counter', 'SQLite cache misses',
+         [({'cache': name}, stats['misses']) for name, stats in disk_caches.items()]),
+        ('ml_disk_cache_pruned_total', 'counter', 'SQLite cache rows deleted because they expired or exceeded max_rows',
+         [({'cache': name, 'reason': 'expired'}, stats['expirations']) for name, stats in disk_caches.items()]
+         + [({'cache': name, 'reason': 'max_rows'}, stats['evictions']) for name, stats in disk_caches.items()]),
+        ('ml_disk_cache_entries', 'gauge', 'Rows currently in the SQLite cache',
+         [({'cache': name}, stats['size']) for name, stats in disk_caches.items()]),
+        ('ml_model_loads_total', 'counter', 'Model versions loaded, including hot-swaps',
+         [({'model': name}, info['version']) for name, info in models.items()]),
+        ('ml_model_load_failures_total', 'counter', 'Failed model loads and reloads',
+         [({'model': name}, info['load_failures']) for name, info in models.items()]),
+        ('ml_model_load_seconds', 'gauge', 'Load time of the served model version',
+         [({'model': name}, info['load_seconds']) for name, info in models.items()]),
+        ('ml_disease_queue_depth', 'gauge', 'Disease images admitted and not yet answered',
+         [({'path': 'batcher'}, batching['admitted'])]
+         + ([({'path': 'pool'}, pool['queue_depth'])] if pool else [])),
+        ('ml_disease_rejected_total', 'counter', 'Disease images shed with 503',
+         [({'path': 'batcher'}, batching['rejected'])]
+         + ([({'path': 'pool'}, pool['rejected'])] if pool else [])),
+        ('ml_disease_batches_total', 'counter', 'Batched disease forward passes on the batcher thread',
+         [({}, batching['batches'])]),
+        ('ml_disease_batched_images_total', 'counter', 'Images in those forward passes',
+         [({}, batching['images'])]),
+        ('ml_solution_upstream_calls_total', 'counter', 'Gemini calls made for uncached solutions',
+         [({}, solutions['upstream_calls'])]),
+        ('ml_solution_coalesced_total', 'counter', 'Solution requests that joined an in-flight Gemini call',
+         [({}, solutions['coalesced'])]),
+    ]
+    if pool:
+        families.append(('ml_disease_pool_restarts_total', 'counter', 'Crashed inference processes replaced',
+                         [({}, pool['restarts'])]))
+    families += [
+        ('ml_log_records_dropped_total', 'counter', 'Log records dropped because the log queue was full',
+         [({}, structured_logging.dropped_records())]),
+        ('ml_log_queue_depth', 'gauge', 'Log records waiting for the writer thread',
+         [({}, structured_logging.queue_depth())]),
+    ]
+    return families
+
 
+metrics.registry.add_collector(_collect_service_metrics)
@@ -0,0 +1,240 @@
+"""
+Structured logging for the models service
+Records are put on a bounded in-memory queue and written by one background
+thread, so request threads never wait on stderr; when the queue is full the
+record is dropped and counted instead. Each record carries the ID of the
+request that logged it, and debug records are kept only for a sampled
+fraction of requests so a sampled request logs all of its debug lines
+
+    log = structured_logging.get_logger(__name__)
+    log.info('Model loaded from %s', path)
+    if structured_logging.debug_enabled():
+        log.debug('Price from live model', extra={'commodity': commodity, 'price': price})
+"""
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+from logging.handlers import QueueHandler, QueueListener
+
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+# Level for third-party loggers (werkzeug, httpx, PIL, ...)
+LOG_LIBRARY_LEVEL = os.getenv('LOG_LIBRARY_LEVEL', 'WARNING').upper()
+# json for log shippers, text for reading a terminal
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json').lower()
+# Fraction of requests whose debug records are kept (0 disables debug logging)
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv('LOG_DEBUG_SAMPLE_RATE', '0.01'))
+# Records waiting for the writer thread; more are dropped
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+ROOT_LOGGER = 'ml'
+
+
+def _level_number(name, default):
+    level = logging.getLevelName(name)
+    return level if isinstance(level, int) else default
+
+
+_level = _level_number(LOG_LEVEL, logging.INFO)
+
+_request_id = contextvars.ContextVar('request_id', default=None)
+_debug_sampled = contextvars.ContextVar('debug_sampled', default=False)
+
+# Attributes every LogRecord has; anything else came in through extra=
+_RECORD_ATTRIBUTES = set(logging.makeLogRecord({}).__dict__) | {'message', 'asctime', 'request_id'}
+
+_lock = threading.Lock()
+_handler = None
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, request ID and extra fields"""
+
+    def format(self, record):
+        entry = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created))
+                    + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'pid': record.process,
+            'thread': record.threadName,
+        }
+        request_id = getattr(record, 'request_id', None)
+        if request_id is not None:
+            entry['request_id'] = request_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s')
+
+    def format(self, record):
+        if getattr(record, 'request_id', None) is None:
+            record.request_id = '-'
+        return super().format(record)
+
+
+class _RequestContextFilter(logging.Filter):
+    """
+    Runs on the calling thread: tags the record with the current request ID
+    and drops records below LOG_LEVEL, except service records of sampled requests
+    """
+
+    def filter(self, record):
+        if record.levelno < _level and not (_debug_sampled.get() and record.name.startswith(ROOT_LOGGER + '.')):
+            return False
+        if not hasattr(record, 'request_id'):
+            record.request_id = _request_id.get()
+        return True
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of blocking or raising when the queue is full"""
+
+    def __init__(self, log_queue, target):
+        super().__init__(log_queue)
+        self.target = target
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Resolve the message and traceback here: args and exc_info may hold
+        # objects that change or die before the writer thread gets to them
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with _lock:
+                self.dropped += 1
+
+    def emit(self, record):
+        if _listener is None:
+            # Writer stopped at interpreter exit: write directly
+            self.target.handle(self.prepare(record))
+            return
+        super().emit(record)
+
+
+def _start_listener():
+    global _listener
+    _handler.queue = queue.Queue(max(1, LOG_QUEUE_SIZE))
+    _listener = QueueListener(_handler.queue, _handler.target, respect_handler_level=True)
+    _listener.start()
+
+
+def _stop_listener():
+    global _listener
+    listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+
+
+def configure():
+    """
+    Route the service loggers, and any library logging through the root
+    logger, to the queue-backed handler. Safe to call more than once
+    """
+    global _handler
+    with _lock:
+        if _handler is not None:
+            return
+
+        target = logging.StreamHandler(sys.stderr)
+        target.setFormatter(TextFormatter() if LOG_FORMAT == 'text' else JsonFormatter())
+
+        _handler = _NonBlockingQueueHandler(None, target)
+        _handler.addFilter(_RequestContextFilter())
+        _start_listener()
+
+        root = logging.getLogger()
+        root.addHandler(_handler)
+        root.setLevel(_level_number(LOG_LIBRARY_LEVEL, logging.WARNING))
+        # Only the service's own loggers create debug records for sampling
+        service_root = logging.getLogger(ROOT_LOGGER)
+        service_root.setLevel(logging.DEBUG if LOG_DEBUG_SAMPLE_RATE > 0 else _level)
+
+        atexit.register(_stop_listener)
+        # The writer thread does not survive fork: a pre-forked worker starts its own
+        os.register_at_fork(after_in_child=_start_listener)
+
+
+def get_logger(name):
+    """
+    Logger under the service's namespace, e.g. get_logger('services') -> ml.services
+
+    Args:
+        name: Usually the module's __name__
+    """
+    configure()
+    return logging.getLogger(f'{ROOT_LOGGER}.{name}')
+
+
+def begin_request(request_id=None):
+    """
+    Tag the current context with a request ID and decide whether its debug
+    records are kept
+
+    Args:
+        request_id: Caller supplied ID (the X-Request-ID header); a new one
+            is generated when it is missing or unreasonable
+
+    Returns:
+        tuple: (request ID, token for end_request())
+    """
+    if not request_id or len(request_id) > 128 or not request_id.isprintable():
+        request_id = uuid.uuid4().hex
+    sampled = LOG_DEBUG_SAMPLE_RATE > 0 and random.random() < LOG_DEBUG_SAMPLE_RATE
+    return request_id, (_request_id.set(request_id), _debug_sampled.set(sampled))
+
+
+def end_request(token):
+    """Restore the context saved by begin_request()"""
+    request_token, sampled_token = token
+    _request_id.reset(request_token)
+    _debug_sampled.reset(sampled_token)
+
+
+def current_request_id():
+    return _request_id.get()
+
+
+def debug_enabled():
+    """
+    Whether debug records of the current request are kept
+    Check it before building debug messages on hot paths
+    """
+    return _debug_sampled.get() or _level <= logging.DEBUG
+
+
+def dropped_records():
+    """Records dropped because the queue was full"""
+    return _handler.dropped if _handler is not None else 0
+
+
+
+def queue_depth():
+    """Records waiting for the writer thread"""
+    return _handler.queue.qsize() if _handler is not None else 0
@@ -0,0 +1,187 @@
+"""
+Check that the ASGI app (asgi_app.py) answers like the Flask app (app.py)
+Every case is sent to both apps; status codes, JSON bodies and streamed
+events must match. Gemini is replaced by the offline stub client.
+
+    python verify_asgi_compat.py [--disease-checkpoint models/plant-disease-model-complete.pth]
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+CROP_SAMPLE = {'n': 90, 'p': 42, 'k': 43, 'temp': 20.8, 'humidity': 82, 'ph': 6.5, 'rainfall': 202.9}
+FERTILIZER_SAMPLE = {
+    'temp': 26, 'humidity': 52, 'moisture': 38, 'soil_type': 'sandy', 'crop_type': 'maize',
+    'nitrogen': 37, 'potassium': 0, 'phosphorus': 0
+}
+
+
+def make_jpeg(seed, size=(256, 256)):
+    rng = np.random.default_rng(seed)
+    image = Image.fromarray(rng.integers(0, 255, (size[1], size[0], 3), dtype=np.uint8))
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def build_cases():
+    """(name, method, path, request kwargs) tuples; kwargs use the common test-client arguments"""
+    image = make_jpeg(0)
+    ndjson = '\n'.join([
+        '{"n": 90, "p": 42, "k": 43, "temp": 20.8, "humidity": 82, "ph": 6.5, "rainfall": 202.9}',
+        '',
+        '{"n": 90, "p": 42,',
+        '{"n": 20, "p": 60, "k": 20, "temp": 25.0, "humidity": 60, "ph": 6.8, "rainfall": 80.0}'
+    ])
+    return [
+        ('health', 'GET', '/', {}),
+        ('ready', 'GET', '/ready', {}),
+        ('models', 'GET', '/models', {}),
+        ('cache stats', 'GET', '/cache/stats', {}),
+        ('crop', 'POST', '/predict_crop', {'json': CROP_SAMPLE}),
+        ('crop missing field', 'POST', '/predict_crop', {'json': {'n': 90}}),
+        ('crop bad JSON', 'POST', '/predict_crop',
+         {'data': b'{"n": 90,', 'headers': {'Content-Type': 'application/json'}}),
+        ('crop wrong content type', 'POST', '/predict_crop',
+         {'data': b'n=90', 'headers': {'Content-Type': 'text/plain'}}),
+        ('crop batch array', 'POST', '/predict_crop/batch', {'json': [CROP_SAMPLE, {'n': 1}]}),
+        ('crop batch object', 'POST', '/predict_crop/batch', {'json': {'samples': [CROP_SAMPLE]}}),
+        ('crop batch NDJSON', 'POST', '/predict_crop/batch',
+         {'data': ndjson.encode(), 'headers': {'Content-Type': 'application/x-ndjson'}}),
+        ('crop batch invalid', 'POST', '/predict_crop/batch', {'json': {'rows': []}}),
+        ('fertilizer', 'POST', '/predict_fertilizer', {'json': FERTILIZER_SAMPLE}),
+        ('fertilizer invalid', 'POST', '/predict_fertilizer', {'json': dict(FERTILIZER_SAMPLE, soil_type='lunar')}),
+        ('disease no file', 'POST', '/predict_disease', {'files': {}}),
+        ('disease empty filename', 'POST', '/predict_disease', {'files': {'image': ('', b'')}}),
+        ('disease image', 'POST', '/predict_disease', {'files': {'image': ('leaf.jpg', image)}}),
+        ('disease metrics', 'GET', '/predict_disease/metrics', {}),
+        ('solution missing name', 'POST', '/get_disease_solution', {'json': {}}),
+        ('solution healthy', 'POST', '/get_disease_solution', {'json': {'disease_name': 'Apple___healthy'}}),
+        ('solution with key', 'POST', '/get_disease_solution',
+         {'json': {'disease_name': 'Tomato___Late_blight', 'api_key': 'test-key'}}),
+        ('solution key header', 'POST', '/get_disease_solution',
+         {'json': {'disease_name': 'Potato___Early_blight'}, 'headers': {'X-Gemini-API-Key': 'test-key'}}),
+        ('solution no key', 'POST', '/get_disease_solution', {'json': {'disease_name': 'Corn___Common_rust'}}),
+        ('solution stream', 'POST', '/get_disease_solution?stream=1',
+         {'json': {'disease_name': 'Grape___Black_rot', 'api_key': 'test-key'}}),
+        ('solution stream Accept', 'POST', '/get_disease_solution',
+         {'json': {'disease_name': 'Grape___Esca', 'api_key': 'test-key'}, 'headers': {'Accept': 'text/event-stream'}}),
+        ('price', 'POST', '/predict_price', {'json': {'commodity': 'Wheat', 'date': '2025-06-01'}}),
+        ('price missing field', 'POST', '/predict_price', {'json': {'commodity': 'Wheat'}}),
+        ('price series', 'POST', '/predict_price/series',
+         {'json': {'commodities': ['Wheat', 'Rice'], 'start_date': '2025-01', 'end_date': '2025-03'}}),
+        ('price series invalid', 'POST', '/predict_price/series',
+         {'json': {'commodities': ['Wheat'], 'start_date': 'soon', 'end_date': '2025-03'}}),
+    ]
+
+
+def flask_request(client, method, path, kwargs):
+    kwargs = dict(kwargs)
+    if 'files' in kwargs:
+        kwargs['data'] = {name: (io.BytesIO(content), filename) for name, (filename, content) in kwargs.pop('files').items()}
+        kwargs['content_type'] = 'multipart/form-data'
+    response = client.open(path, method=method, **kwargs)
+    return response.status_code, response.headers, response.get_data(as_text=True)
+
+
+def multipart_body(files, boundary='verify-asgi-compat'):
+    """
+    Encode uploads as Flask's test client does; httpx drops an empty
+    filename, which would turn the part into a plain form field
+    """
+    body = b''
+    for name, (filename, content) in files.items():
+        body += (f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                 f'Content-Type: application/octet-stream\r\n\r\n').encode() + content + b'\r\n'
+    return body + f'--{boundary}--\r\n'.encode(), f'multipart/form-data; boundary={boundary}'
+
+
+def asgi_request(client, method, path, kwargs):
+    kwargs = dict(kwargs)
+    if 'data' in kwargs:
+        kwargs['content'] = kwargs.pop('data')
+    if 'files' in kwargs:
+        kwargs['content'], content_type = multipart_body(kwargs.pop('files'))
+        kwargs['headers'] = {'Content-Type': content_type}
+    response = client.request(method, path, **kwargs)
+    return response.status_code, response.headers, response.text
+
+
+def comparable(headers, body):
+    """
+    Decoded body: JSON for JSON responses; for event streams the event
+    names and the joined text, since chunking differs once the answer is cached
+    """
+    content_type = headers.get('Content-Type', '')
+    if content_type.startswith('application/json'):
+        return json.loads(body)
+    if content_type.startswith('text/event-stream'):
+        events = []
+        text = ''
+        for block in body.strip().split('\n\n'):
+            fields = dict(line.split(': ', 1) for line in block.splitlines())
+            data = json.loads(fields['data'])
+            if 'event' in fields:
+                events.append((fields['event'], data))
+            else:
+                text += data['text']
+        return events, text
+    return body
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the Flask and ASGI apps')
+    parser.add_argument('--disease-checkpoint', help='Disease checkpoint (default: DISEASE_MODEL_PATH)')
+    args = parser.parse_args()
+
+    # Offline, isolated solution cache so both apps start from the same state
+    os.environ['GEMINI_CLIENT'] = 'stub'
+    os.environ['SOLUTION_CACHE_DB'] = os.path.join(tempfile.mkdtemp(), 'solutions.db')
+    os.environ['PRELOAD_MODELS'] = '0'
+    if args.disease_checkpoint:
+        os.environ['DISEASE_MODEL_PATH'] = os.path.abspath(args.disease_checkpoint)
+
+    from starlette.testclient import TestClient
+    from app import app as flask_app
+    from asgi_app import app as asgi_app
+
+    flask_client = flask_app.test_client()
+    failures = 0
+    with TestClient(asgi_app) as asgi_client:
+        for name, method, path, kwargs in build_cases():
+            flask_status, flask_headers, flask_body = flask_request(flask_client, method, path, kwargs)
+            asgi_status, asgi_headers, asgi_body = asgi_request(asgi_client, method, path, kwargs)
+
+            problems = []
+            if flask_status != asgi_status:
+                problems.append(f'status {flask_status} != {asgi_status}')
+            if comparable(flask_headers, flask_body) != comparable(asgi_headers, asgi_body):
+                problems.append(f'body\n    flask: {flask_body[:300]!r}\n    asgi:  {asgi_body[:300]!r}')
+            for header in ('Retry-After', 'Cache-Control', 'X-Accel-Buffering'):
+                if flask_headers.get(header) != asgi_headers.get(header):
+                    problems.append(f'{header} {flask_headers.get(header)!r} != {asgi_headers.get(header)!r}')
+
+            if problems:
+                failures += 1
+                print(f"✗ {name}: {'; '.join(problems)}")
+            else:
+                print(f"✓ {name} ({flask_status})")
+
+    print()
+    if failures:
+        print(f"✗ {failures} case(s) differ between the Flask and ASGI apps")
+        sys.exit(1)
+    print("✓ The ASGI app matches the Flask app on every case")
+
+
+if __name__ == '__main__':
+    main()
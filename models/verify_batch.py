@@ -0,0 +1,131 @@
+"""
+Check the /predict_crop/batch endpoint
+- JSON array, {"samples": [...]} object and NDJSON bodies give the same
+  results as /predict_crop, row by row and in input order
+- Invalid samples and unparsable NDJSON lines fail individually
+- Bodies that are not a batch, or exceed MAX_BATCH_ROWS, are rejected
+- Batches larger than a chunk stay on the memory-mapped flat forest
+  instead of loading the sklearn forest
+
+    python verify_batch.py
+"""
+import json
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CROP_DATASET = os.path.join(BASE_DIR, "Crop Recomendation", "Crop_recommendation.csv")
+MAX_ROWS = 2000
+
+os.environ.update({
+    'PRELOAD_MODELS': '0',
+    'MAX_BATCH_ROWS': str(MAX_ROWS),
+    'MMAP_ARTIFACTS': '1',
+    'MMAP_ARTIFACTS_DIR': tempfile.mkdtemp(),
+})
+
+try:
+    from app import app
+    from services import CROP_BATCH_CHUNK_SIZE, FLAT_FOREST_MAX_ROWS, load_crop_prediction_model
+except ImportError as e:
+    print(f"Error importing app: {e}")
+    sys.exit(1)
+
+
+def load_samples(count):
+    df = pd.read_csv(CROP_DATASET).sample(count, replace=True, random_state=0)
+    columns = {'N': 'n', 'P': 'p', 'K': 'k', 'temperature': 'temp', 'humidity': 'humidity', 'ph': 'ph',
+               'rainfall': 'rainfall'}
+    return df[list(columns)].rename(columns=columns).to_dict(orient='records')
+
+
+def check(name, condition, detail=''):
+    print(f"{'✓' if condition else '✗'} {name}{f' ({detail})' if detail else ''}")
+    return condition
+
+
+def crops(response):
+    return [result.get('crop') if result['success'] else result['error'] for result in response.get_json()['results']]
+
+
+def main():
+    print("=" * 60)
+    print(" /predict_crop/batch")
+    print("=" * 60)
+
+    client = app.test_client()
+    samples = load_samples(60)
+    expected = [client.post('/predict_crop', json=sample).get_json()['crop'] for sample in samples]
+    ndjson = ''.join(json.dumps(sample) + '\n' for sample in samples)
+
+    ok = True
+    for name, kwargs in (
+        ('JSON array', {'json': samples}),
+        ('JSON object with samples', {'json': {'samples': samples}}),
+        ('NDJSON stream', {'data': ndjson, 'content_type': 'application/x-ndjson'}),
+    ):
+        response = client.post('/predict_crop/batch', **kwargs)
+        body = response.get_json()
+        ok = check(
+            f"{name} matches /predict_crop row by row",
+            response.status_code == 200 and body['count'] == len(samples) and body['failed'] == 0
+            and crops(response) == expected,
+            f"{body.get('count')} rows, {body.get('failed')} failed"
+        ) and ok
+
+    bad_sample = dict(samples[1], ph='acidic')
+    lines = [json.dumps(samples[0]), '{"n": 90,', '', json.dumps(bad_sample), json.dumps(samples[2])]
+    response = client.post('/predict_crop/batch', data='\n'.join(lines) + '\n', content_type='application/x-ndjson')
+    results = response.get_json()['results']
+    ok = check(
+        "NDJSON reports bad lines and invalid samples in place",
+        response.status_code == 200 and len(results) == 4
+        and results[0]['crop'] == expected[0] and results[1]['error'] == 'Invalid JSON on line 2'
+        and not results[2]['success'] and results[3]['crop'] == expected[2],
+        f"{response.get_json()['failed']} of {len(results)} failed"
+    ) and ok
+
+    response = client.post('/predict_crop/batch', json=[samples[0], 'not a sample', {'n': 1}])
+    results = response.get_json()['results']
+    ok = check(
+        "JSON batches report invalid samples in place",
+        response.status_code == 200 and results[0]['crop'] == expected[0]
+        and results[1]['error'] == 'Sample must be a JSON object' and not results[2]['success']
+    ) and ok
+
+    statuses = [
+        client.post('/predict_crop/batch', json={'rows': samples}).status_code,
+        client.post('/predict_crop/batch', data='not json', content_type='application/json').status_code,
+        client.post('/predict_crop/batch', json=[samples[0]] * (MAX_ROWS + 1)).status_code,
+        client.post('/predict_crop/batch', data=ndjson * (MAX_ROWS // len(samples) + 1),
+                    content_type='application/x-ndjson').status_code,
+    ]
+    ok = check(
+        "Non-batch bodies and batches over MAX_BATCH_ROWS are rejected",
+        statuses == [400, 400, 400, 400],
+        f"statuses {statuses}"
+    ) and ok
+
+    large = load_samples(3 * FLAT_FOREST_MAX_ROWS + 7)
+    response = client.post('/predict_crop/batch', json=large)
+    model = load_crop_prediction_model()
+    ok = check(
+        "Large batches are chunked for the flat forest",
+        response.status_code == 200 and response.get_json()['failed'] == 0
+        and CROP_BATCH_CHUNK_SIZE <= FLAT_FOREST_MAX_ROWS and getattr(model, '_model', True) is None,
+        f"{len(large)} rows in chunks of {CROP_BATCH_CHUNK_SIZE}, sklearn forest "
+        f"{'not loaded' if getattr(model, '_model', True) is None else 'loaded'}"
+    ) and ok
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
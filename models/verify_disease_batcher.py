@@ -0,0 +1,217 @@
+"""
+Check the disease micro-batcher (services.DiseaseBatcher)
+- Images submitted while a batch is running are stacked into the next
+  batches of at most max_batch_size, and every caller gets its own result
+- A lone image is flushed after max_wait_ms instead of waiting for a full batch
+- admit() raises DiseaseQueueFullError beyond max_queue_depth
+- A failing forward pass fails every image of its batch, and the batcher
+  keeps serving later batches
+- shutdown() answers every queued image
+
+A probe model stands in for ResNet9: it predicts the value each image
+tensor is filled with, and records the batch sizes it sees
+
+    python verify_disease_batcher.py
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    from services import DiseaseBatcher, DiseaseQueueFullError, model_registry
+except ImportError as e:
+    print(f"Error importing services: {e}")
+    sys.exit(1)
+
+
+NUM_CLASSES = 38
+
+
+class ProbeModel(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.batch_sizes = []
+        # Cleared to hold the batcher inside a forward pass while more images queue up
+        self.gate = threading.Event()
+        self.gate.set()
+        self.entered = threading.Event()
+
+    def forward(self, images):
+        self.batch_sizes.append(len(images))
+        self.entered.set()
+        self.gate.wait()
+        labels = images[:, 0, 0, 0].long()
+        if (labels < 0).any():
+            raise RuntimeError('probe forward failed')
+        return torch.nn.functional.one_hot(labels, NUM_CLASSES).float()
+
+
+def image(label):
+    return torch.full((3, 8, 8), float(label))
+
+
+def check(name, condition, detail=''):
+    print(f"{'✓' if condition else '✗'} {name}{f' ({detail})' if detail else ''}")
+    return condition
+
+
+def hold(probe, batcher, label=0):
+    """Submit one image and keep the batcher inside its forward pass"""
+    probe.gate.clear()
+    probe.entered.clear()
+    future = batcher.submit(image(label))
+    probe.entered.wait(5)
+    return future
+
+
+def check_batch_formation(probe):
+    batcher = DiseaseBatcher(max_batch_size=16, max_wait_ms=20, max_queue_depth=1000)
+    first = hold(probe, batcher)
+    probe.batch_sizes.clear()
+
+    labels = [index % NUM_CLASSES for index in range(40)]
+    with ThreadPoolExecutor(max_workers=40) as executor:
+        futures = list(executor.map(lambda label: batcher.submit(image(label)), labels))
+    probe.gate.set()
+    results = [future.result(timeout=10) for future in futures]
+    first.result(timeout=10)
+
+    ok = check(
+        "Images queued behind a running batch are stacked into full batches",
+        probe.batch_sizes == [16, 16, 8],
+        f"40 images from 40 threads in batches of {probe.batch_sizes}"
+    )
+    ok = check("Every caller gets the result for its own image", results == labels) and ok
+
+    # Without a held batch, concurrent callers still share forward passes
+    probe.batch_sizes.clear()
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        results = list(executor.map(lambda label: batcher.submit(image(label)).result(timeout=10), labels * 4))
+    ok = check(
+        "Concurrent callers share forward passes",
+        results == labels * 4 and max(probe.batch_sizes) <= 16 and len(probe.batch_sizes) < len(results),
+        f"{len(results)} images in {len(probe.batch_sizes)} forward passes"
+    ) and ok
+    batcher.shutdown(5)
+    return ok
+
+
+def check_max_wait_flush(probe):
+    ok = True
+    for max_wait_ms in (50, 200):
+        batcher = DiseaseBatcher(max_batch_size=16, max_wait_ms=max_wait_ms)
+        batcher.submit(image(1)).result(timeout=5)
+        probe.batch_sizes.clear()
+
+        start = time.perf_counter()
+        result = batcher.submit(image(7)).result(timeout=5)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        ok = check(
+            f"A lone image is flushed after max_wait_ms={max_wait_ms}",
+            result == 7 and probe.batch_sizes == [1] and max_wait_ms * 0.8 <= elapsed_ms < max_wait_ms + 150,
+            f"answered after {elapsed_ms:.0f} ms"
+        ) and ok
+        batcher.shutdown(5)
+    return ok
+
+
+def check_queue_full():
+    batcher = DiseaseBatcher(max_batch_size=4, max_wait_ms=5, max_queue_depth=3)
+    for _ in range(3):
+        batcher.admit()
+    try:
+        batcher.admit()
+        rejected = False
+    except DiseaseQueueFullError:
+        rejected = True
+
+    batcher.release()
+    try:
+        batcher.admit()
+        readmitted = True
+    except DiseaseQueueFullError:
+        readmitted = False
+
+    metrics = batcher.metrics()
+    return check(
+        "admit() rejects beyond max_queue_depth and admits again after release()",
+        rejected and readmitted and metrics['rejected'] == 1 and metrics['admitted'] == 3,
+        f"admitted {metrics['admitted']}, rejected {metrics['rejected']}"
+    )
+
+
+def check_error_propagation(probe):
+    batcher = DiseaseBatcher(max_batch_size=8, max_wait_ms=20)
+    first = hold(probe, batcher)
+    probe.batch_sizes.clear()
+
+    # One bad image poisons the whole forward pass of its batch
+    failing = [batcher.submit(image(-1 if index == 3 else index)) for index in range(8)]
+    probe.gate.set()
+    first.result(timeout=5)
+
+    errors = []
+    for future in failing:
+        try:
+            future.result(timeout=5)
+            errors.append(None)
+        except RuntimeError as e:
+            errors.append(e)
+    ok = check(
+        "A failed forward pass fails every image of its batch",
+        probe.batch_sizes[:1] == [8] and all(error is not None and 'probe forward failed' in str(error)
+                                             for error in errors),
+        f"{sum(error is not None for error in errors)} of {len(failing)} callers got the error"
+    )
+
+    ok = check(
+        "The batcher keeps serving after a failed batch",
+        [batcher.submit(image(label)).result(timeout=5) for label in (4, 5)] == [4, 5]
+    ) and ok
+    batcher.shutdown(5)
+    return ok
+
+
+def check_shutdown_drains(probe):
+    batcher = DiseaseBatcher(max_batch_size=4, max_wait_ms=20)
+    first = hold(probe, batcher)
+    queued = [batcher.submit(image(index)) for index in range(10)]
+    threading.Timer(0.1, probe.gate.set).start()
+    finished = batcher.shutdown(10)
+    first.result(timeout=5)
+    return check(
+        "shutdown() answers every queued image",
+        finished and all(future.done() for future in queued)
+        and [future.result() for future in queued] == list(range(10))
+    )
+
+
+def main():
+    print("=" * 60)
+    print(" DISEASE MICRO-BATCHER")
+    print("=" * 60)
+
+    probe = ProbeModel().eval()
+    with tempfile.NamedTemporaryFile(suffix='.pth') as checkpoint:
+        model_registry.register('disease', [checkpoint.name], lambda path: (probe, None))
+
+        ok = check_batch_formation(probe)
+        ok = check_max_wait_flush(probe) and ok
+        ok = check_queue_full() and ok
+        ok = check_error_propagation(probe) and ok
+        ok = check_shutdown_drains(probe) and ok
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
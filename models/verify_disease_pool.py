@@ -0,0 +1,169 @@
+"""
+Check the disease inference process pool (DISEASE_POOL_PROCESSES)
+- /predict_crop latency while disease uploads spike, with inference on the
+  in-process batcher thread and in the process pool
+- Every upload is either answered with a prediction or, in a burst beyond
+  DISEASE_MAX_QUEUE_DEPTH, shed with 503 + Retry-After; anything else fails
+
+    python verify_disease_pool.py --checkpoint models/plant-disease-model-complete.pth --processes 2
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+CROP_SAMPLE = {'n': 90, 'p': 42, 'k': 43, 'temp': 20.8, 'humidity': 82, 'ph': 6.5, 'rainfall': 202.9}
+
+
+def make_jpeg(seed, size=(1600, 1200)):
+    rng = np.random.default_rng(seed)
+    image = Image.fromarray(rng.integers(0, 255, (size[1], size[0], 3), dtype=np.uint8))
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else float('nan')
+
+
+def run_mode(uploaders, seconds):
+    """Runs in a child process configured through the environment"""
+    from app import app
+    from services import DISEASE_CLASS_NAMES, warm_up_models
+
+    warm_up_models(['crop', 'disease'])
+    images = [make_jpeg(seed) for seed in range(64)]
+    stop_at = time.monotonic() + seconds
+    crop_latencies = []
+    crop_failures = []
+    statuses = {}
+    outcomes = {'predicted': 0, 'shed': 0, 'unexpected': 0}
+    unexpected = []
+    lock = threading.Lock()
+
+    def outcome(response):
+        body = response.get_json(silent=True) or {}
+        if response.status_code == 200:
+            if body.get('success') is True and body.get('disease') in DISEASE_CLASS_NAMES.values() \
+                    and body.get('display_name') and body.get('disease_index') in DISEASE_CLASS_NAMES:
+                return 'predicted'
+        elif response.status_code == 503:
+            if body.get('success') is False and response.headers.get('Retry-After'):
+                return 'shed'
+        return 'unexpected'
+
+    def upload(index):
+        client = app.test_client()
+        count = 0
+        while time.monotonic() < stop_at:
+            # Distinct bytes per request so the result cache never answers
+            image = images[(index * 7 + count) % len(images)] + str((index, count)).encode()
+            count += 1
+            response = client.post('/predict_disease', data={'image': (io.BytesIO(image), 'leaf.jpg')})
+            kind = outcome(response)
+            with lock:
+                key = f"{response.status_code} Retry-After={response.headers.get('Retry-After')}"
+                statuses[key] = statuses.get(key, 0) + 1
+                outcomes[kind] += 1
+                if kind == 'unexpected' and len(unexpected) < 3:
+                    unexpected.append(f'{response.status_code} {response.get_data(as_text=True)[:200]}')
+
+    def predict_crops():
+        client = app.test_client()
+        while time.monotonic() < stop_at:
+            start_time = time.perf_counter()
+            response = client.post('/predict_crop', json=CROP_SAMPLE)
+            crop_latencies.append(time.perf_counter() - start_time)
+            if response.status_code != 200:
+                crop_failures.append(response.status_code)
+            time.sleep(0.005)
+
+    threads = [threading.Thread(target=upload, args=(index,)) for index in range(uploaders)]
+    threads.append(threading.Thread(target=predict_crops))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(json.dumps({
+        'crop_p50_ms': percentile(crop_latencies, 50),
+        'crop_p99_ms': percentile(crop_latencies, 99),
+        'crop_requests': len(crop_latencies),
+        'crop_failures': len(crop_failures),
+        'disease_statuses': statuses,
+        'disease_outcomes': outcomes,
+        'unexpected': unexpected
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Verify the disease inference pool')
+    parser.add_argument('--checkpoint', help='Disease checkpoint (default: DISEASE_MODEL_PATH)')
+    parser.add_argument('--processes', type=int, default=2)
+    parser.add_argument('--uploaders', type=int, default=16, help='Concurrent disease upload clients')
+    parser.add_argument('--queue-depth', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--mode', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.uploaders, args.seconds)
+        return
+
+    print("=" * 72)
+    print(f" /predict_crop LATENCY DURING A DISEASE BURST ({args.uploaders} uploaders)")
+    print("=" * 72)
+    ok = True
+    for label, processes in (('in-process', 0), (f'pool x{args.processes}', args.processes)):
+        env = dict(
+            os.environ,
+            PYTHONWARNINGS='ignore',
+            DISEASE_POOL_PROCESSES=str(processes),
+            DISEASE_MAX_QUEUE_DEPTH=str(args.queue_depth),
+            DISEASE_CACHE_MAX_ENTRIES='0'
+        )
+        if args.checkpoint:
+            env['DISEASE_MODEL_PATH'] = os.path.abspath(args.checkpoint)
+        child = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--mode', label,
+             '--uploaders', str(args.uploaders), '--seconds', str(args.seconds)],
+            env=env, capture_output=True, text=True
+        )
+        if child.returncode != 0:
+            print(f"✗ {label}: child exited with {child.returncode}")
+            print(child.stderr.rstrip()[-2000:])
+            ok = False
+            continue
+
+        result = json.loads(child.stdout.strip().splitlines()[-1])
+        outcomes = result['disease_outcomes']
+        print(f"{label:<12} crop p50 {result['crop_p50_ms']:7.2f} ms  p99 {result['crop_p99_ms']:7.2f} ms  "
+              f"({result['crop_requests']} requests)  disease {result['disease_statuses']}")
+
+        if outcomes['predicted'] == 0 or outcomes['unexpected'] or result['crop_failures']:
+            print(f"✗ {label}: {outcomes['predicted']} predictions, {outcomes['unexpected']} unexpected "
+                  f"disease responses, {result['crop_failures']} failed crop requests {result['unexpected']}")
+            ok = False
+        elif args.uploaders > args.queue_depth and outcomes['shed'] == 0:
+            print(f"✗ {label}: {args.uploaders} uploaders against a queue of {args.queue_depth} shed nothing")
+            ok = False
+        else:
+            print(f"✓ {label}: {outcomes['predicted']} predictions, {outcomes['shed']} shed with 503 + Retry-After")
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
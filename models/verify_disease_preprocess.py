@@ -0,0 +1,131 @@
+"""
+Benchmark the fast disease image preprocessing against the torchvision transform
+Reports per-image latency, multi-threaded throughput, tensor differences and,
+when the disease checkpoint is available, prediction agreement:
+
+    python verify_disease_preprocess.py [--images DIR] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import numpy as np
+import torch
+from PIL import Image
+from torchvision import transforms
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from image_preprocess import DISEASE_IMAGE_SIZE, ImagePreprocessor
+
+
+def synthetic_photo(width, height, seed=0):
+    """Smooth gradients plus sensor-like noise, closer to a photo than pure noise"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    pixels = np.stack([(x / 16) % 256, (y / 12) % 256, ((x + y) / 20) % 256], axis=-1)
+    pixels = pixels + rng.normal(0, 6, pixels.shape)
+    return Image.fromarray(pixels.clip(0, 255).astype(np.uint8))
+
+
+def encode(image, format, **options):
+    buffer = BytesIO()
+    image.save(buffer, format, **options)
+    return buffer.getvalue()
+
+
+def load_samples(image_dir):
+    if image_dir:
+        samples = []
+        for name in sorted(os.listdir(image_dir)):
+            path = os.path.join(image_dir, name)
+            if os.path.isfile(path):
+                with open(path, 'rb') as f:
+                    samples.append((name, f.read()))
+        return samples
+
+    photo = synthetic_photo(4000, 3000)
+    return [
+        ('12MP JPEG', encode(photo, 'JPEG', quality=90)),
+        ('3MP JPEG', encode(photo.resize((2000, 1500)), 'JPEG', quality=90)),
+        ('640x480 JPEG', encode(photo.resize((640, 480)), 'JPEG', quality=90)),
+        ('1.5MP PNG', encode(photo.resize((1500, 1000)), 'PNG')),
+    ]
+
+
+def time_per_call(function, repeat):
+    function()
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start_time) / repeat * 1000
+
+
+def throughput(function, samples, threads, repeat):
+    work = [image_bytes for _, image_bytes in samples] * repeat
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(function, work))
+    return len(work) / (time.perf_counter() - start_time)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Disease preprocessing benchmark')
+    parser.add_argument('--images', help='Directory of real leaf photos (default: synthetic images)')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+
+    # Same transform _load_disease_artifacts builds for the model
+    disease_transform = transforms.Compose([
+        transforms.Resize((DISEASE_IMAGE_SIZE, DISEASE_IMAGE_SIZE)),
+        transforms.ToTensor()
+    ])
+    preprocessor = ImagePreprocessor()
+
+    def baseline(image_bytes):
+        return disease_transform(Image.open(BytesIO(image_bytes)).convert("RGB"))
+
+    samples = load_samples(args.images)
+
+    print("=" * 72)
+    print(f" DISEASE PREPROCESSING BENCHMARK ({DISEASE_IMAGE_SIZE}x{DISEASE_IMAGE_SIZE})")
+    print("=" * 72)
+    print(f"{'image':<16}{'transform ms':>14}{'fast ms':>10}{'speedup':>10}{'max diff':>11}{'mean diff':>11}")
+
+    for name, image_bytes in samples:
+        reference = baseline(image_bytes)
+        fast = preprocessor.preprocess(image_bytes)
+        difference = (reference - fast).abs()
+        baseline_ms = time_per_call(lambda: baseline(image_bytes), args.repeat)
+        fast_ms = time_per_call(lambda: preprocessor.preprocess(image_bytes), args.repeat)
+        print(
+            f"{name[:15]:<16}{baseline_ms:>14.1f}{fast_ms:>10.1f}{baseline_ms / fast_ms:>9.1f}x"
+            f"{float(difference.max()):>11.4f}{float(difference.mean()):>11.5f}"
+        )
+
+    baseline_rate = throughput(baseline, samples, args.threads, args.repeat)
+    fast_rate = throughput(preprocessor.preprocess, samples, args.threads, args.repeat)
+    print(f"\nThroughput with {args.threads} threads: transform {baseline_rate:.1f} img/s, "
+          f"fast {fast_rate:.1f} img/s ({fast_rate / baseline_rate:.1f}x)")
+
+    try:
+        from services import load_disease_model
+        model, _ = load_disease_model()
+    except Exception as e:
+        print(f"\nPrediction agreement skipped: {e}")
+        return
+
+    with torch.no_grad():
+        reference = model(torch.stack([baseline(image_bytes) for _, image_bytes in samples])).argmax(1)
+        fast = model(torch.stack([preprocessor.preprocess(image_bytes) for _, image_bytes in samples])).argmax(1)
+    agree = int((reference == fast).sum())
+    print(f"\nPrediction agreement: {agree}/{len(samples)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+import sys
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    from services import (
+        load_crop_prediction_model, load_fertilizer_model, get_flat_forest,
+        SOIL_TYPE_REVERSE, CROP_TYPE_REVERSE
+    )
+except ImportError as e:
+    print(f"Error importing services: {e}")
+    sys.exit(1)
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CROP_DATASET = os.path.join(BASE_DIR, "Crop Recomendation", "Crop_recommendation.csv")
+FERTILIZER_DATASET = os.path.join(BASE_DIR, "Fertilizer Recomendation", "fertilizer_dataset.csv")
+
+
+def load_crop_rows():
+    df = pd.read_csv(CROP_DATASET)
+    return df[['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']].to_numpy(dtype=np.float64)
+
+
+def load_fertilizer_rows():
+    df = pd.read_csv(FERTILIZER_DATASET)
+    df['Soil Type'] = df['Soil Type'].str.lower().map(SOIL_TYPE_REVERSE)
+    df['Crop Type'] = df['Crop Type'].str.lower().map(CROP_TYPE_REVERSE)
+    return df.iloc[:, :8].to_numpy(dtype=np.float64)
+
+
+def perturbed(rows, count, noise, seed=0):
+    """Dataset rows plus noise, to exercise splits the dataset itself never lands on"""
+    rng = np.random.default_rng(seed)
+    picked = rows[rng.integers(0, len(rows), count)]
+    return picked + rng.normal(0, noise, picked.shape)
+
+
+def time_per_call(function, repeat):
+    function()
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start_time) / repeat
+
+
+def check_model(name, reference_predict, flat_forest, rows, noise):
+    print(f"\n{name}: {flat_forest.info()}")
+    ok = True
+
+    for label, data in (("dataset", rows), ("perturbed", perturbed(rows, 50000, noise))):
+        expected = reference_predict(data)
+        # Walk the flattened trees for every row, bypassing the large-batch handoff to sklearn
+        actual = flat_forest.classes.take(np.argmax(flat_forest.predict_proba(data), axis=1))
+        mismatches = int((expected != actual).sum())
+        ok = ok and mismatches == 0
+        print(f"   {'✅' if mismatches == 0 else '❌'} {label}: {mismatches} mismatches in {len(data)} rows")
+
+    for batch_size, repeat in ((1, 200), (32, 50), (256, 20), (1024, 5), (10000, 3)):
+        batch = perturbed(rows, batch_size, noise, seed=1)
+        reference_seconds = time_per_call(lambda: reference_predict(batch), repeat)
+        flat_seconds = time_per_call(lambda: flat_forest.predict(batch), repeat)
+        handoff = ' (handed to sklearn)' if batch_size > flat_forest.max_rows else ''
+        print(f"   {batch_size:>5} rows: sklearn {reference_seconds * 1e3:8.2f} ms, "
+              f"flat {flat_seconds * 1e3:8.2f} ms ({reference_seconds / flat_seconds:.1f}x){handoff}")
+    return ok
+
+
+def test_parity():
+    print("=" * 60)
+    print(" FLATTENED FOREST PARITY CHECK")
+    print("=" * 60)
+
+    # With MMAP_ARTIFACTS the registry serves the memory-mapped forests;
+    # .model is the sklearn forest they were written from
+    crop_forest = get_flat_forest('crop', load_crop_prediction_model())
+    fertilizer_model, scaler = load_fertilizer_model()
+    fertilizer_forest = get_flat_forest('fertilizer', fertilizer_model, scaler)
+
+    results = [
+        check_model(
+            "Crop model", crop_forest.model.predict,
+            crop_forest, load_crop_rows(), noise=3.0
+        ),
+        check_model(
+            "Fertilizer model (scaler folded in)",
+            lambda rows: fertilizer_forest.model.predict(scaler.transform(rows)),
+            fertilizer_forest, load_fertilizer_rows(), noise=2.0
+        )
+    ]
+
+    print("\n" + "=" * 60)
+    if not all(results):
+        print(" ❌ Flattened forests do not match model.predict")
+        sys.exit(1)
+    print(" ✅ Flattened forests match model.predict exactly")
+
+
+if __name__ == "__main__":
+    test_parity()
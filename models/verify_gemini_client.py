@@ -0,0 +1,184 @@
+import asyncio
+import sys
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    from fake_gemini_server import start_fake_gemini_server
+    from gemini_client import GeminiClient, GeminiBusyError, GeminiTimeoutError
+except ImportError as e:
+    print(f"Error importing gemini client: {e}")
+    sys.exit(1)
+
+
+PROMPT = "You are an agricultural expert. A farmer's plant has: Tomato - Late blight\n"
+MODEL = 'gemini-2.5-flash-lite'
+
+
+def check(name, condition, detail=''):
+    print(f"{'✅' if condition else '❌'} {name}{f' ({detail})' if detail else ''}")
+    return condition
+
+
+def test_gemini_client():
+    print("=" * 60)
+    print(" GEMINI CLIENT VERIFICATION (local fake server)")
+    print("=" * 60)
+
+    server = start_fake_gemini_server()
+    results = []
+
+    # 1. Plain call and connection reuse per API key
+    client = GeminiClient(base_url=server.base_url, backoff=0.05)
+    text = client.generate(PROMPT, 'key-a', MODEL)
+    client.generate(PROMPT, 'key-a', MODEL)
+    client.generate(PROMPT, 'key-b', MODEL)
+    results.append(check("Generates text", 'Tomato - Late blight' in text))
+    results.append(check(
+        "One pooled session per API key",
+        client.stats()['pooled_api_keys'] == 2 and server.api_keys == {'key-a', 'key-b'},
+        f"{client.stats()['pooled_api_keys']} sessions"
+    ))
+
+    # 2. Streaming yields chunks as they arrive
+    server.stream_delay = 0.1
+    start_time = time.perf_counter()
+    chunks = []
+    first_chunk_at = None
+    for chunk in client.stream(PROMPT, 'key-a', MODEL):
+        if first_chunk_at is None:
+            first_chunk_at = time.perf_counter() - start_time
+        chunks.append(chunk)
+    total = time.perf_counter() - start_time
+    server.stream_delay = 0.0
+    results.append(check(
+        "Streams chunks incrementally",
+        len(chunks) > 1 and ''.join(chunks) == text and first_chunk_at < total / 2,
+        f"{len(chunks)} chunks, first after {first_chunk_at:.2f}s of {total:.2f}s"
+    ))
+
+    # 3. Retries with backoff on 503
+    server.fail_next = 2
+    retries_before = client.retries
+    text = client.generate(PROMPT, 'key-a', MODEL)
+    results.append(check("Retries transient 503s", bool(text) and client.retries - retries_before == 2))
+
+    server.fail_next = 5
+    try:
+        client.generate(PROMPT, 'key-a', MODEL)
+        results.append(check("Gives up after max retries", False))
+    except Exception as e:
+        results.append(check("Gives up after max retries", 'HTTP 503' in str(e), str(e)))
+    server.fail_next = 0
+
+    # 4. Deadline bounds a slow upstream
+    server.delay = 2.0
+    slow_client = GeminiClient(base_url=server.base_url, deadline=0.5, timeout=0.5, max_retries=0)
+    start_time = time.perf_counter()
+    try:
+        slow_client.generate(PROMPT, 'key-a', MODEL)
+        results.append(check("Deadline enforced", False))
+    except (GeminiTimeoutError, Exception) as e:
+        elapsed = time.perf_counter() - start_time
+        results.append(check("Deadline enforced", elapsed < 1.0, f"{elapsed:.2f}s, {type(e).__name__}"))
+
+    # 5. Concurrency limit rejects excess callers quickly instead of queueing
+    server.delay = 0.5
+    limited_client = GeminiClient(base_url=server.base_url, max_concurrency=2, queue_timeout=0.1)
+
+    def call(_):
+        start_time = time.perf_counter()
+        try:
+            limited_client.generate(PROMPT, 'key-a', MODEL)
+            return 'ok', time.perf_counter() - start_time
+        except GeminiBusyError:
+            return 'busy', time.perf_counter() - start_time
+
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        outcomes = list(executor.map(call, range(6)))
+    busy = [elapsed for status, elapsed in outcomes if status == 'busy']
+    results.append(check(
+        "Concurrency limit sheds excess callers",
+        len(busy) == 4 and max(busy) < 0.3,
+        f"{6 - len(busy)} served, {len(busy)} rejected"
+    ))
+
+    # 6. Async callers wait for a slot without stalling the event loop
+    async def concurrent_async_calls(async_client, calls):
+        stall = 0.0
+
+        async def ticker():
+            nonlocal stall
+            last = time.perf_counter()
+            while True:
+                await asyncio.sleep(0.005)
+                now = time.perf_counter()
+                stall = max(stall, now - last - 0.005)
+                last = now
+
+        async def call():
+            try:
+                await async_client.generate_async(PROMPT, 'key-a', MODEL)
+                return 'ok'
+            except GeminiBusyError:
+                return 'busy'
+
+        ticking = asyncio.ensure_future(ticker())
+        outcomes = await asyncio.gather(*(call() for _ in range(calls)))
+        ticking.cancel()
+        return outcomes, stall
+
+    server.delay = 0.5
+    queued_client = GeminiClient(base_url=server.base_url, max_concurrency=1, queue_timeout=3.0)
+    outcomes, stall = asyncio.run(concurrent_async_calls(queued_client, 3))
+    results.append(check(
+        "Async callers queue for a slot without blocking the loop",
+        outcomes.count('ok') == 3 and stall < 0.1,
+        f"{outcomes.count('ok')} served, worst loop stall {stall * 1000:.0f} ms"
+    ))
+
+    shedding_client = GeminiClient(base_url=server.base_url, max_concurrency=1, queue_timeout=0.2)
+    outcomes, stall = asyncio.run(concurrent_async_calls(shedding_client, 3))
+    results.append(check(
+        "Async callers are shed after queue_timeout",
+        outcomes.count('busy') == 2 and stall < 0.1,
+        f"{outcomes.count('busy')} rejected, worst loop stall {stall * 1000:.0f} ms"
+    ))
+    server.delay = 0.0
+
+    # 7. Sessions for caller supplied API keys are bounded; evicted ones are closed
+    bounded_client = GeminiClient(base_url=server.base_url, max_sessions=4)
+    first_session = bounded_client._session('key-0')
+    for index in range(1, 50):
+        bounded_client.generate(PROMPT, f'key-{index}', MODEL)
+    results.append(check(
+        "Session pool is bounded and closes evicted sessions",
+        bounded_client.stats()['pooled_api_keys'] == 4 and 'key-0' not in bounded_client._sessions
+        and all(not adapter.poolmanager.pools for adapter in first_session.adapters.values()),
+        f"{bounded_client.stats()['pooled_api_keys']} sessions after 50 keys"
+    ))
+
+    # 8. Counters are exact under concurrent calls
+    counting_client = GeminiClient(base_url=server.base_url, max_concurrency=8, queue_timeout=5.0)
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        list(executor.map(lambda _: counting_client.generate(PROMPT, 'key-a', MODEL), range(400)))
+    results.append(check(
+        "Request counter is exact under concurrency",
+        counting_client.stats()['requests_sent'] == 400,
+        f"{counting_client.stats()['requests_sent']} of 400 counted"
+    ))
+
+    server.shutdown()
+    print("\n" + "=" * 60)
+    if not all(results):
+        print(" ❌ Some checks failed")
+        sys.exit(1)
+    print(" ✅ All checks passed")
+
+
+if __name__ == "__main__":
+    test_gemini_client()
@@ -0,0 +1,150 @@
+"""
+Check the /metrics endpoint
+- Every stage of every prediction endpoint shows up as a histogram series,
+  along with request, error, cache and model load counters
+- Instrumentation overhead: /predict_crop latency with METRICS_ENABLED on and off
+
+    python verify_metrics.py --requests 5000
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+CROP_SAMPLE = {'n': 90, 'p': 42, 'k': 43, 'temp': 20.8, 'humidity': 82, 'ph': 6.5, 'rainfall': 202.9}
+FERTILIZER_SAMPLE = {
+    'temp': 26, 'humidity': 52, 'moisture': 38, 'soil_type': 'sandy', 'crop_type': 'maize',
+    'nitrogen': 37, 'potassium': 0, 'phosphorus': 0
+}
+
+SAMPLE_LINE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{.*\})? (\S+)$')
+
+EXPECTED_STAGES = [
+    ('/predict_crop', 'parse'), ('/predict_crop', 'inference'), ('/predict_crop', 'serialize'),
+    ('/predict_crop/batch', 'parse'), ('/predict_crop/batch', 'preprocess'),
+    ('/predict_crop/batch', 'inference'), ('/predict_crop/batch', 'serialize'),
+    ('/predict_fertilizer', 'parse'), ('/predict_fertilizer', 'inference'),
+    ('/predict_price', 'parse'), ('/predict_price', 'preprocess'), ('/predict_price', 'inference'),
+    ('/predict_price/series', 'preprocess'), ('/predict_price/series', 'inference'),
+]
+
+
+def parse_exposition(text):
+    """Parse the text format into {(name, labels): value}; raises on malformed lines"""
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith('# HELP ') or line.startswith('# TYPE '):
+            continue
+        match = SAMPLE_LINE.match(line)
+        if match is None:
+            raise ValueError(f'Malformed line: {line!r}')
+        name, labels, value = match.groups()
+        samples[(name, labels or '')] = float(value)
+    return samples
+
+
+def measure_overhead(requests):
+    """Runs in a child process configured through the environment"""
+    from app import app
+
+    client = app.test_client()
+    for _ in range(200):
+        client.post('/predict_crop', json=CROP_SAMPLE)
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.post('/predict_crop', json=CROP_SAMPLE)
+    print(json.dumps({'us_per_request': (time.perf_counter() - start) / requests * 1e6}))
+
+
+def check_exposition():
+    from app import app
+
+    client = app.test_client()
+    client.post('/predict_crop', json=CROP_SAMPLE)
+    client.post('/predict_crop', json=CROP_SAMPLE)
+    client.post('/predict_crop', json={'n': 1})
+    client.post('/predict_crop/batch', json=[CROP_SAMPLE, dict(CROP_SAMPLE, n=10)])
+    client.post('/predict_fertilizer', json=FERTILIZER_SAMPLE)
+    # An uncached commodity outside the forecast table goes through the live model
+    client.post('/predict_price', json={'commodity': 'Wheat', 'date': '2099-01-01'})
+    client.post('/predict_price/series', json={'commodities': ['Wheat'], 'start_date': '2025-01', 'end_date': '2025-06'})
+    client.get('/no-such-route')
+
+    response = client.get('/metrics')
+    if response.status_code != 200 or not response.content_type.startswith('text/plain'):
+        print(f"✗ /metrics answered {response.status_code} {response.content_type}")
+        return False
+
+    try:
+        samples = parse_exposition(response.get_data(as_text=True))
+    except ValueError as e:
+        print(f"✗ {e}")
+        return False
+
+    ok = True
+    for endpoint, stage in EXPECTED_STAGES:
+        key = ('ml_stage_duration_seconds_count', f'{{endpoint="{endpoint}",stage="{stage}"}}')
+        if samples.get(key, 0) < 1:
+            print(f"✗ No {stage} observations for {endpoint}")
+            ok = False
+
+    expected = [
+        ('ml_request_duration_seconds_count', '{endpoint="/predict_crop",method="POST",status="200"}', 2),
+        ('ml_request_errors_total', '{endpoint="/predict_crop",status="400"}', 1),
+        ('ml_request_errors_total', '{endpoint="unmatched",status="404"}', 1),
+        ('ml_cache_hits_total', '{cache="crop"}', 1),
+        ('ml_model_loads_total', '{model="crop"}', 1),
+    ]
+    for name, labels, minimum in expected:
+        if samples.get((name, labels), 0) < minimum:
+            print(f"✗ Expected {name}{labels} >= {minimum}, got {samples.get((name, labels))}")
+            ok = False
+
+    if ok:
+        print(f"✓ {len(samples)} samples parsed; every stage, request, error, cache and model series present")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Verify the /metrics endpoint')
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--mode', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        measure_overhead(args.requests)
+        return
+
+    print("=" * 60)
+    print(" /metrics EXPOSITION")
+    print("=" * 60)
+    ok = check_exposition()
+
+    print("\n" + "=" * 60)
+    print(f" INSTRUMENTATION OVERHEAD ({args.requests} /predict_crop requests)")
+    print("=" * 60)
+    results = {}
+    for label, enabled in (('disabled', '0'), ('enabled', '1')):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--mode', label, '--requests', str(args.requests)],
+            env=dict(os.environ, PYTHONWARNINGS='ignore', METRICS_ENABLED=enabled),
+            capture_output=True, text=True, check=True
+        ).stdout
+        results[label] = json.loads(output.strip().splitlines()[-1])['us_per_request']
+        print(f"{label:<10} {results[label]:8.1f} µs per request")
+    overhead = results['enabled'] - results['disabled']
+    print(f"Overhead: {overhead:+.1f} µs per request ({overhead / results['disabled']:+.1%})")
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Compare startup time and per-worker memory with and without memory-mapped
+model artifacts. Starts several worker processes that each load the crop,
+fertilizer (and optionally disease) models the way the server does, once
+with MMAP_ARTIFACTS=1 and once with MMAP_ARTIFACTS=0:
+
+    python verify_mmap_artifacts.py --workers 4 --disease-checkpoint models/plant-disease-model-complete.pth
+
+Private memory is what each worker holds alone; PSS splits shared pages
+between the processes mapping them.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+def memory_mb():
+    """Rss, Pss and private memory of this process from /proc/self/smaps_rollup"""
+    values = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            key, _, rest = line.partition(':')
+            if key in ('Rss', 'Pss', 'Private_Clean', 'Private_Dirty'):
+                values[key] = int(rest.split()[0]) / 1024
+    return {
+        'rss': values['Rss'],
+        'pss': values['Pss'],
+        'private': values['Private_Clean'] + values['Private_Dirty']
+    }
+
+
+def run_worker(disease_checkpoint):
+    import numpy as np
+    import torch
+
+    import services
+
+    baseline = memory_mb()
+    start_time = time.perf_counter()
+
+    model = services.load_crop_prediction_model()
+    services.get_flat_forest('crop', model).predict(np.zeros((1, 7)))
+    fertilizer_model, scaler = services.load_fertilizer_model()
+    services.get_flat_forest('fertilizer', fertilizer_model, scaler).predict(np.zeros((1, 8)))
+
+    if disease_checkpoint:
+        disease_model = services.load_disease_checkpoint(disease_checkpoint)
+        size = services.DISEASE_IMAGE_SIZE
+        with torch.no_grad():
+            disease_model(torch.rand(1, 3, size, size))
+
+    load_seconds = time.perf_counter() - start_time
+
+    # Measure once every worker has loaded, so PSS reflects the sharing
+    print('ready', flush=True)
+    sys.stdin.readline()
+    loaded = memory_mb()
+    print(json.dumps({
+        'load_seconds': load_seconds,
+        **{key: loaded[key] - baseline[key] for key in loaded}
+    }), flush=True)
+
+
+def measure(mmap_enabled, workers, disease_checkpoint):
+    env = dict(os.environ, MMAP_ARTIFACTS='1' if mmap_enabled else '0', PYTHONWARNINGS='ignore')
+    command = [sys.executable, os.path.abspath(__file__), '--worker']
+    if disease_checkpoint:
+        command += ['--disease-checkpoint', disease_checkpoint]
+
+    processes = [
+        subprocess.Popen(command, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        for _ in range(workers)
+    ]
+    for process in processes:
+        for line in process.stdout:
+            if line.strip() == 'ready':
+                break
+    results = []
+    for process in processes:
+        process.stdin.write('\n')
+        process.stdin.flush()
+    for process in processes:
+        results.append(json.loads(process.stdout.readlines()[-1]))
+        process.wait()
+
+    return {
+        key: sum(result[key] for result in results) / len(results)
+        for key in ('load_seconds', 'rss', 'pss', 'private')
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure memory-mapped model artifacts')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--disease-checkpoint', help='Also load this disease checkpoint')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.disease_checkpoint)
+        return
+
+    # Write the memory-mapped artifacts once, outside the timed runs
+    measure(True, 1, None)
+
+    print("=" * 60)
+    print(f" MEMORY-MAPPED ARTIFACTS ({args.workers} workers, MB per worker)")
+    print("=" * 60)
+    print(f"{'mode':<8}{'load s':>10}{'rss':>10}{'pss':>10}{'private':>10}")
+    for mmap_enabled in (False, True):
+        result = measure(mmap_enabled, args.workers, args.disease_checkpoint)
+        print(f"{'mmap' if mmap_enabled else 'copy':<8}{result['load_seconds']:>10.3f}"
+              f"{result['rss']:>10.1f}{result['pss']:>10.1f}{result['private']:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
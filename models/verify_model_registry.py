@@ -0,0 +1,246 @@
+"""
+Check the model registry's loading and hot-swap
+- Concurrent first requests share one load; a failed load is retried
+- A model made of two files (a classifier and its scaler) that are replaced
+  one after the other is swapped in only as a matching pair, while reader
+  threads keep calling get()
+- A load that overlaps a file replacement is redone
+- A replacement file that fails to load is tried once, not on every check,
+  and the next good file is swapped in
+
+    python verify_model_registry.py [--generations 20]
+"""
+import argparse
+import os
+import pickle
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from model_registry import ModelRegistry
+
+
+def write_artifact(path, value):
+    """Write a pickle to a temp file and rename it over path, as the retrain scripts do"""
+    with open(path + '.tmp', 'wb') as f:
+        pickle.dump(value, f)
+    os.replace(path + '.tmp', path)
+
+
+def read_artifact(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def check(name, condition, detail=''):
+    print(f"{'✓' if condition else '✗'} {name}{f' ({detail})' if detail else ''}")
+    return condition
+
+
+def check_first_load(directory):
+    path = os.path.join(directory, 'single.pkl')
+    write_artifact(path, 'v1')
+    loads = []
+
+    def loader(model_path):
+        loads.append(model_path)
+        time.sleep(0.2)
+        return {'value': read_artifact(model_path)}
+
+    registry = ModelRegistry(check_interval=0)
+    registry.register('single', [path], loader)
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        results = list(executor.map(lambda _: registry.get('single'), range(16)))
+    ok = check(
+        "Concurrent first requests share one load",
+        len(loads) == 1 and all(result is results[0] for result in results),
+        f"{len(loads)} loads for 16 requests"
+    )
+
+    attempts = []
+
+    def flaky_loader(model_path):
+        attempts.append(model_path)
+        if len(attempts) == 1:
+            raise ValueError('corrupt pickle')
+        return read_artifact(model_path)
+
+    registry.register('flaky', [path], flaky_loader)
+    try:
+        registry.get('flaky')
+        first_failed = False
+    except ValueError:
+        first_failed = True
+    ok = check(
+        "A failed first load raises and is retried by the next request",
+        first_failed and registry.get('flaky') == 'v1' and registry.info()['flaky']['load_failures'] == 1
+    ) and ok
+    return ok
+
+
+def check_paired_swap(directory, generations, readers):
+    model_path = os.path.join(directory, 'model.pkl')
+    scaler_path = os.path.join(directory, 'scaler.pkl')
+    write_artifact(scaler_path, 0)
+    write_artifact(model_path, 0)
+
+    def loader(model_file, scaler_file):
+        scaler = read_artifact(scaler_file)
+        # Long enough for replacements to land mid-load
+        time.sleep(0.03)
+        return read_artifact(model_file), scaler
+
+    check_interval = 0.2
+    registry = ModelRegistry(check_interval=check_interval)
+    registry.register('paired', [model_path, scaler_path], loader)
+    swaps = []
+    registry.add_swap_listener(lambda name, version: swaps.append(version))
+    registry.get('paired')
+
+    stop = threading.Event()
+    seen = set()
+    lock = threading.Lock()
+    calls = [0]
+
+    def reader():
+        local = set()
+        count = 0
+        while not stop.is_set():
+            local.add(registry.get('paired'))
+            count += 1
+            # Spinning readers would starve the writer of the GIL on small machines
+            time.sleep(0.0002)
+        with lock:
+            seen.update(local)
+            calls[0] += count
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+
+    # The gap between the two renames is well below the check interval, as
+    # with retrain_fertilizer.py, but long enough for checks to land inside it
+    widest_gap = 0.0
+    for generation in range(1, generations + 1):
+        write_artifact(scaler_path, generation)
+        start = time.perf_counter()
+        time.sleep(0.05)
+        write_artifact(model_path, generation)
+        widest_gap = max(widest_gap, time.perf_counter() - start)
+        time.sleep(3 * check_interval)
+
+    deadline = time.monotonic() + 5
+    while registry.get('paired') != (generations, generations) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    mixed = sorted(pair for pair in seen if pair[0] != pair[1])
+    ok = check(
+        "Readers never see a model paired with another generation's scaler",
+        not mixed,
+        f"{calls[0]} get() calls from {readers} threads, {len(seen)} distinct pairs, "
+        f"renames up to {widest_gap * 1000:.0f} ms apart"
+        + (f", mixed: {mixed[:5]}" if mixed else '')
+    )
+    ok = check(
+        "The newest pair is swapped in once it has settled",
+        registry.get('paired') == (generations, generations) and len(swaps) <= generations,
+        f"serving generation {registry.get('paired')[0]} of {generations} after {len(swaps)} swaps"
+    ) and ok
+    return ok
+
+
+def check_load_during_replacement(directory):
+    model_path = os.path.join(directory, 'slow_model.pkl')
+    scaler_path = os.path.join(directory, 'slow_scaler.pkl')
+    write_artifact(scaler_path, 1)
+    write_artifact(model_path, 1)
+    loads = [0]
+
+    def loader(model_file, scaler_file):
+        loads[0] += 1
+        scaler = read_artifact(scaler_file)
+        if loads[0] == 1:
+            # A retrain replaces both files between reading the scaler and the model
+            write_artifact(scaler_path, 2)
+            write_artifact(model_path, 2)
+        return read_artifact(model_file), scaler
+
+    registry = ModelRegistry(check_interval=0)
+    registry.register('slow', [model_path, scaler_path], loader)
+    pair = registry.get('slow')
+    return check(
+        "A load that overlaps a replacement is redone",
+        pair == (2, 2) and loads[0] == 2,
+        f"loaded {pair} in {loads[0]} attempts"
+    )
+
+
+def check_bad_file(directory):
+    path = os.path.join(directory, 'bad.pkl')
+    write_artifact(path, 'v1')
+    failures = [0]
+
+    def loader(model_path):
+        value = read_artifact(model_path)
+        if value == 'corrupt':
+            failures[0] += 1
+            raise ValueError('corrupt pickle')
+        return value
+
+    check_interval = 0.05
+    registry = ModelRegistry(check_interval=check_interval)
+    registry.register('bad', [path], loader)
+    registry.get('bad')
+
+    write_artifact(path, 'corrupt')
+    served = set()
+    deadline = time.monotonic() + 40 * check_interval
+    while time.monotonic() < deadline:
+        served.add(registry.get('bad'))
+        time.sleep(0.005)
+    ok = check(
+        "A file that fails to load is tried once while it stays unchanged",
+        failures[0] == 1 and served == {'v1'} and registry.info()['bad']['load_failures'] == 1,
+        f"{failures[0]} failed loads over {40 * check_interval:.1f}s, serving {sorted(served)}"
+    )
+
+    write_artifact(path, 'v2')
+    deadline = time.monotonic() + 40 * check_interval
+    while registry.get('bad') != 'v2' and time.monotonic() < deadline:
+        time.sleep(0.005)
+    time.sleep(0.1)
+    return check(
+        "The next good file is swapped in after a failed one",
+        registry.get('bad') == 'v2' and registry.info()['bad']['last_error'] is None
+    ) and ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Verify model registry loading and hot-swap')
+    parser.add_argument('--generations', type=int, default=20)
+    parser.add_argument('--readers', type=int, default=8)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(" MODEL REGISTRY")
+    print("=" * 60)
+    with tempfile.TemporaryDirectory() as directory:
+        ok = check_first_load(directory)
+        ok = check_load_during_replacement(directory) and ok
+        ok = check_bad_file(directory) and ok
+        ok = check_paired_swap(directory, args.generations, args.readers) and ok
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+import sys
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    from services import load_price_model, get_price_predictor
+    from price_forecast import known_commodities
+except ImportError as e:
+    print(f"Error importing services: {e}")
+    sys.exit(1)
+
+
+def reference_price(model, encoder, commodity, year, month):
+    """Original pandas-based predict_price path, kept here as the parity reference"""
+    comm_df = pd.DataFrame({'Commodity': [commodity]})
+    encoded_output = encoder.transform(comm_df[['Commodity']])
+    encoded_val = encoded_output.values.ravel()[0]
+
+    input_data = pd.DataFrame([{
+        'year': year,
+        'month': month,
+        'Commodity_enc': encoded_val
+    }])
+    input_data = input_data[['year', 'month', 'Commodity_enc']]
+
+    prediction = model.predict(input_data)
+    return np.round(float(np.expm1(prediction[0])))
+
+
+def test_parity():
+    print("=" * 60)
+    print(" PRICE FAST PATH PARITY CHECK")
+    print("=" * 60)
+
+    model, encoder = load_price_model()
+    predictor = get_price_predictor()
+
+    # Every known commodity plus one the encoder has never seen
+    commodities = known_commodities(encoder) + ["Unknown Commodity"]
+    periods = [(year, month) for year in (2018, 2022, 2024, 2026, 2030) for month in range(1, 13)]
+
+    mismatches = []
+    reference_seconds = 0.0
+    fast_seconds = 0.0
+
+    for commodity in commodities:
+        for year, month in periods:
+            start_time = time.perf_counter()
+            expected = reference_price(model, encoder, commodity, year, month)
+            reference_seconds += time.perf_counter() - start_time
+
+            start_time = time.perf_counter()
+            actual = predictor.predict(commodity, year, month)
+            fast_seconds += time.perf_counter() - start_time
+
+            if actual != expected:
+                mismatches.append((commodity, year, month, expected, actual))
+
+    checks = len(commodities) * len(periods)
+    print(f"\nCommodities: {len(commodities)}, checks: {checks}")
+    print(f"   Reference path: {reference_seconds / checks * 1e6:.1f} us/call")
+    print(f"   Fast path:      {fast_seconds / checks * 1e6:.1f} us/call")
+
+    if mismatches:
+        print(f"❌ {len(mismatches)} mismatches")
+        for commodity, year, month, expected, actual in mismatches[:10]:
+            print(f"   {commodity} {year}-{month:02d}: expected {expected}, got {actual}")
+        sys.exit(1)
+
+    print("✅ Fast path matches the pandas path for every commodity")
+
+
+if __name__ == "__main__":
+    test_parity()
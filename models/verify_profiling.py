@@ -0,0 +1,197 @@
+"""
+Check per-request profiling
+- Without PROFILE_TOKEN no hooks are registered and the header is ignored
+- A wrong token is ignored; the right one writes a sampled or cProfile profile,
+  plus torch operator timings for /predict_disease
+- Old profiles are rotated out beyond PROFILE_KEEP
+- /predict_crop latency with profiling off and with it on but not requested
+
+    python verify_profiling.py [--disease-checkpoint models/plant-disease-model-complete.pth]
+"""
+import argparse
+import io
+import json
+import os
+import pstats
+import subprocess
+import sys
+import tempfile
+import time
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+TOKEN = 'verify-profiling-token'
+CROP_SAMPLE = {'n': 90, 'p': 42, 'k': 43, 'temp': 20.8, 'humidity': 82, 'ph': 6.5, 'rainfall': 202.9}
+
+
+def check_folded(path):
+    """Every line is 'frame;frame;... count'"""
+    with open(path) as f:
+        lines = f.read().splitlines()
+    for line in lines:
+        stack, _, count = line.rpartition(' ')
+        if not stack or not count.isdigit():
+            return False
+    return bool(lines)
+
+
+def check_disabled():
+    from app import app
+
+    hooks = [hook.__name__ for hook in app.before_request_funcs.get(None, [])]
+    response = app.test_client().post('/predict_crop', json=CROP_SAMPLE, headers={'X-Profile': TOKEN})
+    if 'start_request_profile' in hooks or 'X-Profile-Id' in response.headers:
+        print("✗ Profiling hooks active without PROFILE_TOKEN")
+        return False
+    print("✓ No profiling hooks without PROFILE_TOKEN")
+    return True
+
+
+def check_enabled(profile_dir, with_disease):
+    from app import app
+    from benchmark import leaf_images
+
+    client = app.test_client()
+    ok = True
+
+    response = client.post('/predict_price', json={'commodity': 'Wheat', 'date': '2099-01-01'},
+                           headers={'X-Profile': 'wrong'})
+    if 'X-Profile-Id' in response.headers or os.listdir(profile_dir):
+        print("✗ A wrong token produced a profile")
+        ok = False
+    else:
+        print("✓ Wrong token ignored")
+
+    cases = [
+        ('sampled /predict_price', 'post', '/predict_price',
+         {'json': {'commodity': 'Wheat', 'date': '2099-02-01'}, 'headers': {'X-Profile': TOKEN}},
+         ['python.folded', 'meta.json']),
+        ('cProfile /predict_price via query', 'post', f'/predict_price?profile={TOKEN}&profile_mode=cprofile',
+         {'json': {'commodity': 'Wheat', 'date': '2099-03-01'}},
+         ['python.pstats', 'meta.json']),
+    ]
+    if with_disease:
+        cases.append((
+            'sampled /predict_disease', 'post', '/predict_disease',
+            {'data': {'image': (io.BytesIO(leaf_images(1, 7)[0]), 'leaf.jpg')},
+             'headers': {'X-Profile': TOKEN}},
+            ['python.folded', 'torch_ops.txt', 'torch_trace.json', 'torch.folded', 'meta.json']
+        ))
+
+    for name, method, path, kwargs, expected in cases:
+        response = getattr(client, method)(path, **kwargs)
+        profile_id = response.headers.get('X-Profile-Id')
+        if response.status_code != 200 or not profile_id:
+            print(f"✗ {name}: status {response.status_code}, profile id {profile_id!r}")
+            ok = False
+            continue
+
+        profile_path = os.path.join(profile_dir, profile_id)
+        missing = [file for file in expected if not os.path.exists(os.path.join(profile_path, file))]
+        if missing:
+            print(f"✗ {name}: missing {missing}")
+            ok = False
+            continue
+        if 'python.folded' in expected and not check_folded(os.path.join(profile_path, 'python.folded')):
+            print(f"✗ {name}: python.folded is not in folded stack format")
+            ok = False
+            continue
+        if 'python.pstats' in expected:
+            stats = pstats.Stats(os.path.join(profile_path, 'python.pstats'))
+            if not any(function == 'predict_price' for _, _, function in stats.stats):
+                print(f"✗ {name}: predict_price missing from the cProfile stats")
+                ok = False
+                continue
+        if 'torch.folded' in expected and not check_folded(os.path.join(profile_path, 'torch.folded')):
+            print(f"✗ {name}: torch.folded is not in folded stack format")
+            ok = False
+            continue
+
+        with open(os.path.join(profile_path, 'meta.json')) as f:
+            meta = json.load(f)
+        print(f"✓ {name}: {profile_id} ({meta['wall_ms']:.1f} ms, {', '.join(sorted(os.listdir(profile_path)))})")
+
+    for month in range(4, 10):
+        client.post('/predict_price', json={'commodity': 'Wheat', 'date': f'2099-{month:02d}-01'},
+                    headers={'X-Profile': TOKEN})
+    remaining = len(os.listdir(profile_dir))
+    if remaining != int(os.environ['PROFILE_KEEP']):
+        print(f"✗ {remaining} profiles kept, expected {os.environ['PROFILE_KEEP']}")
+        ok = False
+    else:
+        print(f"✓ Rotation keeps the newest {remaining} profiles")
+    return ok
+
+
+def measure_overhead(requests):
+    from app import app
+
+    client = app.test_client()
+    for _ in range(200):
+        client.post('/predict_crop', json=CROP_SAMPLE)
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.post('/predict_crop', json=CROP_SAMPLE)
+    print(json.dumps({'us_per_request': (time.perf_counter() - start) / requests * 1e6}))
+
+
+def run_child(mode, env, args):
+    command = [sys.executable, os.path.abspath(__file__), '--mode', mode, '--requests', str(args.requests)]
+    return subprocess.run(command, env=dict(os.environ, PYTHONWARNINGS='ignore', **env),
+                          capture_output=True, text=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Verify per-request profiling')
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--disease-checkpoint', help='Disease checkpoint (default: DISEASE_MODEL_PATH)')
+    parser.add_argument('--mode', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode == 'disabled':
+        sys.exit(0 if check_disabled() else 1)
+    if args.mode == 'enabled':
+        from services import DISEASE_MODEL_PATH
+        sys.exit(0 if check_enabled(os.environ['PROFILE_DIR'], os.path.exists(DISEASE_MODEL_PATH)) else 1)
+    if args.mode == 'overhead':
+        measure_overhead(args.requests)
+        return
+
+    env = {'PRELOAD_MODELS': '0', 'GEMINI_CLIENT': 'stub', 'SOLUTION_CACHE_DB': ''}
+    if args.disease_checkpoint:
+        env['DISEASE_MODEL_PATH'] = os.path.abspath(args.disease_checkpoint)
+
+    print("=" * 60)
+    print(" PROFILED REQUESTS")
+    print("=" * 60)
+    ok = True
+    for mode, extra in (
+        ('disabled', {'PROFILE_TOKEN': ''}),
+        ('enabled', {'PROFILE_TOKEN': TOKEN, 'PROFILE_DIR': tempfile.mkdtemp(), 'PROFILE_KEEP': '3',
+                     'PROFILE_SAMPLE_INTERVAL_MS': '0.1'}),
+    ):
+        result = run_child(mode, dict(env, **extra), args)
+        print(result.stdout.rstrip())
+        if result.returncode != 0:
+            print(result.stderr.rstrip()[-2000:])
+            ok = False
+
+    print("\n" + "=" * 60)
+    print(f" OVERHEAD WHEN NOT REQUESTED ({args.requests} /predict_crop requests)")
+    print("=" * 60)
+    results = {}
+    for label, token in (('off', ''), ('on', TOKEN)):
+        output = run_child('overhead', dict(env, PROFILE_TOKEN=token, PROFILE_DIR=tempfile.mkdtemp()), args)
+        results[label] = json.loads(output.stdout.strip().splitlines()[-1])['us_per_request']
+        print(f"profiling {label:<4} {results[label]:8.1f} µs per request")
+    overhead = results['on'] - results['off']
+    print(f"Overhead: {overhead:+.1f} µs per request ({overhead / results['off']:+.1%})")
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Check the production entry point (serve.py)
+- Throughput of /predict_crop and /predict_fertilizer with 1, 2, 4 ...
+  workers up to the number of CPU cores; it should grow close to linearly
+- Graceful shutdown: a large batch request in flight when SIGTERM arrives
+  still completes
+
+    python verify_serving.py --seconds 5 --clients 16
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(BASE_DIR)
+
+from serve import available_cpus
+
+CROP_SAMPLE = {'n': 90, 'p': 42, 'k': 43, 'temp': 20.8, 'humidity': 82, 'ph': 6.5, 'rainfall': 202.9}
+FERTILIZER_SAMPLE = {
+    'temp': 26, 'humidity': 52, 'moisture': 38, 'soil_type': 'sandy', 'crop_type': 'maize',
+    'nitrogen': 37, 'potassium': 0, 'phosphorus': 0
+}
+
+
+def start_server(workers, port, graceful_timeout=30):
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(BASE_DIR, 'serve.py'), '--workers', str(workers),
+         '--threads', '4', '--bind', f'127.0.0.1:{port}', '--graceful-timeout', str(graceful_timeout)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        # Only crop and fertilizer are exercised, so a missing disease checkpoint does not keep /ready at 503
+        env=dict(os.environ, PYTHONWARNINGS='ignore', READY_REQUIRED_MODELS='crop,fertilizer')
+    )
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f'{url}/ready', timeout=1).status_code == 200:
+                return server, url
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    server.kill()
+    raise RuntimeError(f'Server with {workers} workers did not become ready')
+
+
+def measure_throughput(url, seconds, clients):
+    """Closed-loop clients alternating crop and fertilizer requests; returns requests per second"""
+    stop_at = time.monotonic() + seconds
+    counts = [0] * clients
+
+    def client(index):
+        session = requests.Session()
+        while time.monotonic() < stop_at:
+            if counts[index] % 2:
+                response = session.post(f'{url}/predict_fertilizer', json=FERTILIZER_SAMPLE)
+            else:
+                response = session.post(f'{url}/predict_crop', json=CROP_SAMPLE)
+            response.raise_for_status()
+            counts[index] += 1
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / seconds
+
+
+def check_graceful_shutdown(port):
+    server, url = start_server(2, port)
+    rows = [dict(CROP_SAMPLE, rainfall=float(i)) for i in range(100000)]
+    result = {}
+
+    def send_batch():
+        response = requests.post(f'{url}/predict_crop/batch', json=rows)
+        result['status'] = response.status_code
+        result['rows'] = len(response.json().get('results', []))
+
+    thread = threading.Thread(target=send_batch)
+    thread.start()
+    time.sleep(1.0)
+    server.send_signal(signal.SIGTERM)
+    thread.join()
+    exit_code = server.wait(60)
+    return result.get('status') == 200 and result.get('rows') == len(rows) and exit_code == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Verify serve.py scaling and shutdown')
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--port', type=int, default=5077)
+    args = parser.parse_args()
+
+    cpus = available_cpus()
+    worker_counts = sorted({1, cpus} | {2 ** i for i in range(1, cpus.bit_length()) if 2 ** i <= cpus})
+
+    print("=" * 60)
+    print(f" SERVING THROUGHPUT ({cpus} CPU cores, {args.clients} clients)")
+    print("=" * 60)
+    print(f"{'workers':>8}{'req/s':>12}{'speedup':>10}{'efficiency':>12}")
+    baseline = None
+    for workers in worker_counts:
+        server, url = start_server(workers, args.port)
+        try:
+            throughput = measure_throughput(url, args.seconds, args.clients)
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(60)
+        baseline = baseline or throughput
+        speedup = throughput / baseline
+        print(f"{workers:>8}{throughput:>12.1f}{speedup:>10.2f}{speedup / workers:>12.0%}")
+
+    print("\nGraceful shutdown with a request in flight...")
+    if not check_graceful_shutdown(args.port):
+        print("✗ In-flight request was not completed before shutdown")
+        sys.exit(1)
+    print("✓ In-flight request completed and the server exited cleanly")
+
+
+if __name__ == '__main__':
+    main()